@@ -1,9 +1,25 @@
 import streamlit as st
 import pandas as pd
-import base64
-import io
-import time
+import functools
 import traceback
+import uuid
+
+from lecture import cache_fichiers, lire_fichier
+from montants import montants_entiers
+from visionneuse import afficher_resultat, nouvelle_relance
+from agregats import agregats
+from appariement import LIBELLES_APPARIEMENT, UN_A_UN
+from artefacts import choisir_entree, deposer_resultats, resume, vider
+from recherche import IndexRecherche
+from cles import BrancheCle, SpecCle
+from dates import convertir_dates
+from execution import AUTO, fusionner, moteur_demande, moteurs_disponibles, utiliser_moteur
+from fenetre import remplir_fenetre
+import etapes
+from incremental import RapprochementIncremental
+from instrumentation import collecter, collecteur_courant, mesurer
+from export import proposer_telechargement
+from taches import ANNULEE, ECHOUEE, EN_ATTENTE, TERMINEE, copie_resultat, gestionnaire
 
 # Définir le style CSS personnalisé
 custom_css = """
@@ -34,6 +50,9 @@ st.markdown(custom_css, unsafe_allow_html=True)
 # Compteur global pour générer des clés uniques
 compteur = 0
 
+# Délai (en secondes) entre deux actualisations de la progression d'une tâche en cours
+INTERVALLE_ACTUALISATION = 1
+
 def get_unique_key(prefix):
     global compteur
     key = f"{prefix}_{compteur}"
@@ -41,65 +60,204 @@ def get_unique_key(prefix):
     return key
 
 
+def afficher(df):
+    # Affichage d'un résultat, mesuré comme une phase à part : le rendu des gros tableaux est coûteux
+    # (une page de lignes seulement pour les gros résultats, voir visionneuse.py)
+    with mesurer('affichage', len(df)):
+        afficher_resultat(df)
+
+
+def tolerance_horaire(cle):
+    # 0 : rapprochement exact sur la date et l'heure ; au-delà, fenêtre de temps (voir fenetre.py)
+    return st.number_input("Tolérance horaire (secondes)", min_value=0, max_value=86400, value=0, step=1, key=cle,
+                           help="Écart maximal toléré entre l'horodatage de l'opérateur et celui du Back Office, à téléphone et montant égaux")
+
+
+def signaler_anomalies(resultats):
+    # Cellules de montant non numériques ou arrondies, écartées ou corrigées par l'étape
+    anomalies = resultats.get('anomalies_montants')
+    if anomalies is not None and not anomalies.empty:
+        st.warning(f"{len(anomalies)} montant(s) non numérique(s) ou arrondi(s) : voir le détail ci-dessous")
+        with st.expander("Montants écartés ou arrondis"):
+            afficher_resultat(anomalies)
+
+
+def signaler_cardinalite(resultats):
+    # Fusion plus volumineuse que le budget de lignes (politique « avertir ») : voir appariement.py
+    cardinalite = resultats.get('cardinalite')
+    if cardinalite is not None and cardinalite['dépassement'].any():
+        ligne = cardinalite.iloc[0]
+        st.warning(f"La fusion {ligne['fusion']} a produit environ {ligne['lignes estimées']} lignes, au-delà du budget de {ligne['budget']} lignes")
+
+
+def signaler_doublons(resultats, fichier, etape):
+    # Transactions en double dans le relevé opérateur ou créditées deux fois au Back Office (voir doublons.py)
+    doublons = resultats.get('doublons')
+    if doublons is None or doublons.empty:
+        return
+    st.warning(f"{doublons['groupe'].nunique()} groupe(s) de transactions en double ({len(doublons)} ligne(s)) : voir le rapport ci-dessous")
+    with st.expander("Transactions en double"):
+        afficher_resultat(doublons)
+        proposer_telechargement(doublons, fichier, "Télécharger le rapport des doublons", f"{etape} doublons")
+
+
+def enregistrer_agregats(operateur, df):
+    # Les jours du relevé alimentent les agrégats journaliers, d'où sont tirés les TCD sur période
+    with mesurer('agrégats journaliers', len(df)):
+        bilan = agregats.mettre_a_jour(operateur, df)
+    st.caption(f"Agrégats journaliers : {bilan['jours_ajoutes']} jour(s) ajouté(s), {bilan['jours_remplaces']} mis à jour, {bilan['jours_total']} jour(s) enregistré(s)")
+
+
+def tcd_periode(operateur):
+    # TCD d'une période quelconque, lu dans les agrégats journaliers sans réimporter de relevé
+    debut, fin = agregats.periode(operateur)
+    if debut is None:
+        st.info("Aucun agrégat journalier enregistré : exécutez d'abord le TCD sur un fichier de transactions succès")
+        return
+    periode = st.date_input("Période", value=(debut, fin), min_value=debut, max_value=fin, key=f"periode_{operateur}")
+    if len(periode) != 2:
+        return
+    with mesurer('TCD sur période'):
+        tcd = agregats.tcd(operateur, *periode)
+    proposer_telechargement(tcd, f'tcd_{operateur.lower()}_{periode[0]}_{periode[1]}.xlsx', "Télécharger le TCD de la période", f"{operateur} TCD_PERIODE tcd", avec_index=True)
+    st.subheader(f"TCD du {periode[0]:%d-%m-%Y} au {periode[1]:%d-%m-%Y}")
+    afficher(tcd)
+
+
+def identifiant_session():
+    return st.session_state.setdefault('identifiant_session', uuid.uuid4().hex)
+
+
+def afficher_tache(tache):
+    # Progression d'une tâche en attente ou en cours, avec le bouton d'annulation
+    if tache.etat == EN_ATTENTE:
+        st.info(f"{tache.libelle} : en attente d'un travailleur ({gestionnaire.position(tache)} tâche(s) avant elle)")
+    else:
+        texte = f"{tache.libelle} : en cours depuis {tache.duree():.0f} s" + (f", phase « {tache.phase} »" if tache.phase else '')
+        progression = tache.progression()
+        if progression is None:
+            st.info(texte)
+        else:
+            st.progress(progression, text=texte)
+    if st.button("Annuler", key=f"annuler_tache_{tache.identifiant}"):
+        tache.annuler()
+
+
+@st.fragment(run_every=INTERVALLE_ACTUALISATION)
+def suivre_tache(identifiant):
+    # Seule la progression est actualisée pendant le calcul ; la page n'est relancée qu'à la fin de la tâche, pour afficher le résultat
+    tache = gestionnaire.tache(identifiant)
+    if tache is None or tache.terminee():
+        st.rerun()
+    afficher_tache(tache)
+
+
+def oublier_tache(cle):
+    identifiant = st.session_state.setdefault('taches', {}).pop(cle, None)
+    if identifiant is not None:
+        gestionnaire.oublier(identifiant)
+
+
+def executer_en_tache(cle, sources, fonction, *args, **parametres):
+    """
+    Exécute `fonction(*args, **parametres)`, en arrière-plan si l'option est cochée : la tâche est soumise
+    une fois par jeu d'entrées (`sources`, paramètres) et retrouvée aux relances suivantes. Tant qu'elle
+    n'est pas terminée, sa progression est affichée et None est retourné ; ensuite, le résultat de la fonction.
+    """
+    if not st.session_state.get('arriere_plan'):
+        return fonction(*args, **parametres)
+    valeurs = [arg for arg in args if not isinstance(arg, pd.DataFrame) and not callable(arg)]
+    signature = (tuple(source.signature() for source in sources), repr(valeurs), repr(sorted(parametres.items())))
+    taches_session = st.session_state.setdefault('taches', {})
+    tache = gestionnaire.tache(taches_session.get(cle))
+    if tache is None or tache.signature != signature:
+        oublier_tache(cle)
+        collecteur = collecteur_courant()
+        tache = gestionnaire.soumettre(cle, fonction, args, parametres, proprietaire=identifiant_session(), signature=signature,
+                                       moteur=moteur_demande(), memoire=collecteur is not None and collecteur.memoire)
+        taches_session[cle] = tache.identifiant
+
+    if tache.etat == TERMINEE:
+        # Les phases mesurées dans la tâche rejoignent l'instrumentation de la page
+        if collecteur_courant() is not None and tache.collecteur is not None:
+            collecteur_courant().mesures.extend(tache.collecteur.mesures)
+        return copie_resultat(tache.resultat)
+    if tache.etat == ECHOUEE:
+        raise tache.exception
+    if tache.etat == ANNULEE:
+        st.warning(f"{tache.libelle} : tâche annulée")
+        if st.button("Relancer", key=f"relancer_tache_{tache.identifiant}"):
+            oublier_tache(cle)
+            st.rerun()
+        return None
+    suivre_tache(tache.identifiant)
+    return None
+
+
+def executer_incremental(rapprochement, fonction, df_operateur, df_back_office, **parametres):
+    # En appariement un à un, les lignes Back Office déjà rapprochées ne sont pas proposées une seconde fois
+    return rapprochement.executer(functools.partial(fonction, **parametres), df_operateur, df_back_office,
+                                  un_a_un=parametres.get('appariement') == UN_A_UN)
+
+
+def executer_nbsi_op(operateur, sources, fonction, df_operateur, df_back_office, **parametres):
+    # En mode incrémental, seules les transactions nouvelles ou modifiées depuis la dernière exécution sont rapprochées
+    if not st.checkbox("Mode incrémental (ne rapprocher que les transactions nouvelles depuis la dernière exécution)", key=f"incremental_{operateur}"):
+        return executer_en_tache(f"{operateur} NBSI_OP", sources, fonction, df_operateur, df_back_office, **parametres)
+    rapprochement = RapprochementIncremental(operateur)
+    if st.button("Réinitialiser l'historique incrémental", key=f"reinitialiser_incremental_{operateur}"):
+        rapprochement.reinitialiser()
+        oublier_tache(f"{operateur} NBSI_OP incrémental")
+    execution = executer_en_tache(f"{operateur} NBSI_OP incrémental", sources, functools.partial(executer_incremental, rapprochement, fonction),
+                                  df_operateur, df_back_office, **parametres)
+    if execution is None:
+        return None
+    resultats, statistiques = execution
+    st.info(f"{statistiques['lignes_traitees']} transaction(s) rapprochée(s), {statistiques['lignes_ignorees']} déjà traitée(s) "
+            f"lors des exécutions précédentes (date la plus récente vue : {statistiques['date_max_vue']})")
+    return resultats
+
+
 def import_and_match_transactions_payin():
     st.header("Importation et Matching des Transactions de Paiement")
 
     # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('MTN_PAYIN', 'NBSI_OP', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
 
     # Charger le fichier des transactions succès dans notre Back Office
-    fichier_back_office = st.file_uploader("Sélectionnez le fichier des transactions succès dans notre Back Office", type=['xlsx', '.csv'], key=get_unique_key("fichier_back_office"))
+    fichier_back_office = choisir_entree('MTN_PAYIN', 'NBSI_OP', 'back_office', "Sélectionnez le fichier des transactions succès dans notre Back Office", get_unique_key("fichier_back_office"))
+
+    # Paiements répétés d'un même téléphone : appariés un à un, ou combinés avec toutes ses transactions
+    appariement = st.selectbox("Appariement des transactions internes", list(LIBELLES_APPARIEMENT), format_func=LIBELLES_APPARIEMENT.get, key="appariement_mtn")
 
     if fichier_operateur is not None and fichier_back_office is not None:
         try:
             # Charger les données des fichiers Excel
-            df_operateur = pd.read_excel(fichier_operateur, engine='openpyxl')
-            df_back_office = pd.read_excel(fichier_back_office, engine='openpyxl')
-
-            # Filtrer dans le fichier opérateur les transactions "Successfully Processed Transaction" uniquement
-            df_operateur = df_operateur[df_operateur['ResponseMessage'] == 'Successfully Processed Transaction']
-
-            # Supprimer les virgules et convertir la colonne 'TransactionId' en entiers
-            df_operateur['TransactionId'] = df_operateur['TransactionId'].str.replace(',', '').astype(int)
-            df_operateur.dropna(subset=['TransactionId'], inplace=True)
-            df_operateur['TransactionId'] = df_operateur['TransactionId'].astype(int)
-
-            # Filtrer dans le fichier Back Office les transactions avec l'état "SUCCES" uniquement
-            df_back_office = df_back_office[df_back_office['ETAT TRANSACTION'] == 'SUCCES']
-
-            # Effectuer le matching entre les colonnes 'MSISDN' du premier DataFrame et 'TELEPHONE' du deuxième DataFrame
-            matched_df = pd.merge(df_operateur, df_back_office, left_on='MSISDN', right_on='TELEPHONE', how='outer', indicator=True)
-
-            # Filtrer les transactions correspondantes
-            internes_df = matched_df[matched_df['_merge'] == 'both']
-
-            # Filtrer les transactions non correspondantes (écarts)
-            ecarts_df = matched_df[matched_df['_merge'] == 'left_only']
+            df_operateur = fichier_operateur.charger()
+            df_back_office = fichier_back_office.charger()
+
+            # Matching des transactions succès (transactions internes et écarts)
+            resultats = executer_nbsi_op('MTN_PAYIN', [fichier_operateur, fichier_back_office], etapes.nbsi_op_mtn_payin, df_operateur, df_back_office, appariement=appariement)
+            if resultats is None:
+                return
+            signaler_cardinalite(resultats)
+            signaler_doublons(resultats, 'doublons_mtn.xlsx', 'MTN_PAYIN NBSI_OP')
+            deposer_resultats('MTN_PAYIN', 'NBSI_OP', resultats, [fichier_operateur, fichier_back_office], appariement=appariement)
+            internes_df = resultats['internes']
+            ecarts_df = resultats['ecarts']
 
             if ecarts_df.empty:
                 # Aucun écart, afficher les transactions internes
                 st.subheader("Aucun écart trouvé, voici les transactions internes :")
-                st.write(internes_df)
+                afficher(internes_df)
             else:
                 # Télécharger le fichier des écarts
                 st.subheader("Télécharger le fichier des écarts")
-                excel_data_ecarts = io.BytesIO()
-                with pd.ExcelWriter(excel_data_ecarts, engine='xlsxwriter') as writer:
-                    ecarts_df.to_excel(writer, index=False)
-                excel_data_ecarts.seek(0)
-                b64_ecarts = base64.b64encode(excel_data_ecarts.read()).decode()
-                href_ecarts = f'<a href="data:application/octet-stream;base64,{b64_ecarts}" download="ecarts_test_mtn.xlsx">Télécharger le fichier des écarts</a>'
-                st.markdown(href_ecarts, unsafe_allow_html=True)
+                proposer_telechargement(ecarts_df, 'ecarts_test_mtn.xlsx', "Télécharger le fichier des écarts", 'MTN_PAYIN NBSI_OP ecarts')
 
                 # Télécharger le fichier du résultat du matching (quel que soit le résultat)
                 st.subheader("Télécharger le fichier des transactions internes")
-                excel_data_internes = io.BytesIO()
-                with pd.ExcelWriter(excel_data_internes, engine='xlsxwriter') as writer:
-                    internes_df.to_excel(writer, index=False)
-                excel_data_internes.seek(0)
-                b64_internes = base64.b64encode(excel_data_internes.read()).decode()
-                href_internes = f'<a href="data:application/octet-stream;base64,{b64_internes}" download="transactions_internes.xlsx">Télécharger le fichier des transactions internes</a>'
-                st.markdown(href_internes, unsafe_allow_html=True)
+                proposer_telechargement(internes_df, 'transactions_internes.xlsx', "Télécharger le fichier des transactions internes", 'MTN_PAYIN NBSI_OP internes')
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
             st.error(traceback.format_exc())
@@ -107,34 +265,14 @@ def import_and_match_transactions_payin():
 
 # ... (le reste du code reste inchangé)
 
-# Fonction pour réaliser le TCD interne
-# Fonction pour vérifier si la valeur est un nombre
-def is_number(value):
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
-
-# Fonction pour fractionner la colonne 'Amount'
-def fractionner_amount(amount):
-    try:
-        amount_str = str(amount)
-        if is_number(amount_str):
-            return amount_str.split('.')[-1]
-        else:
-            return ''
-    except:
-        return ''
-
 # Fonction pour réaliser le TCD interne
 def tcd_interne(df):
     try:
         # Pour extraire uniquement la date de la colonne StartDateTime
-        df['StartDateTime'] = pd.to_datetime(df['StartDateTime']).dt.date
+        df['StartDateTime'] = convertir_dates(df['StartDateTime'], 'MTN_PAYIN').dt.date
 
-        # Appliquer la fonction de fractionnement à la colonne 'Amount'
-        df['Amount'] = df['Amount'].apply(fractionner_amount)
+        # Montants en entiers (unités mineures), analysés en bloc ; les cellules non numériques restent vides
+        df['Amount'] = montants_entiers(df['Amount'])
 
         # Convertir la colonne 'ID PAIEMENT' en nombre entier
         df['ID PAIEMENT'] = df['ID PAIEMENT'].astype(int)
@@ -162,48 +300,29 @@ def tcd_interne(df):
 # Créer une fonction pour importer les fichiers des écarts et des transactions en échec
 def import_ecarts_and_en_echec_payin():
     # Charger le fichier des écarts
-    fichier_ecarts = st.file_uploader("Sélectionnez le fichier des écarts", type=['xlsx', '.csv'], key=get_unique_key("fichier_ecarts"))
+    fichier_ecarts = choisir_entree('MTN_PAYIN', 'NBSI_ECART', 'ecarts', "Sélectionnez le fichier des écarts", get_unique_key("fichier_ecarts"))
     
     # Charger le fichier des transactions en échec
-    fichier_en_echec = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_echec"))
+    fichier_en_echec = choisir_entree('MTN_PAYIN', 'NBSI_ECART', 'en_echec', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_en_echec"))
     
     if fichier_ecarts is not None and fichier_en_echec is not None:
         try:
             # Charger les données des fichiers Excel
-            df_ecarts = pd.read_excel(fichier_ecarts)
-            df_en_echec = pd.read_excel(fichier_en_echec)
+            df_ecarts = fichier_ecarts.charger()
+            df_en_echec = fichier_en_echec.charger()
             
-            # Vérifier si la colonne 'External Transaction Id' est présente dans le fichier des écarts
-            if 'External Transaction Id' not in df_ecarts.columns:
-                # Si la colonne n'existe pas, créer une nouvelle colonne 'External Transaction Id'
-                # en concaténant les colonnes 'StartDateTime' et 'MONTANT' dans le fichier des écarts
-                df_ecarts['External Transaction Id'] = df_ecarts['StartDateTime'].astype(str) + df_ecarts['MONTANT'].astype(str)
-            
-            # Vérifier si la colonne 'External Transaction Id' est présente dans le fichier des transactions en échec
-            if 'External Transaction Id' not in df_en_echec.columns:
-                # Si la colonne n'existe pas, créer une nouvelle colonne 'External Transaction Id'
-                # en concaténant les colonnes 'CREATION', 'MONTANT', et 'TELEPHONE' dans le fichier des transactions en échec
-                df_en_echec['External Transaction Id'] = df_en_echec['CREATION'].astype(str) + df_en_echec['MONTANT'].astype(str) + df_en_echec['TELEPHONE'].astype(str)
-
             # Effectuer le Matching des colonnes
-            matched_df = pd.merge(df_ecarts, df_en_echec, left_on='External Transaction Id', right_on='CUSTOM 6', how='inner')
+            resultats = executer_en_tache('MTN_PAYIN NBSI_ECART', [fichier_ecarts, fichier_en_echec], etapes.nbsi_ecart_mtn_payin, df_ecarts, df_en_echec)
+            if resultats is None:
+                return
+            matched_df = resultats['resultat']
             
             # Enregistrer les écarts dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                matched_df.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts.xlsx">Télécharger le fichier des écarts</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(matched_df, 'ecarts.xlsx', "Télécharger le fichier des écarts", 'MTN_PAYIN NBSI_ECART resultat')
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(matched_df)
+            afficher(matched_df)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -214,49 +333,35 @@ def recherchev():
     
     # Charger le fichier des écarts
     st.subheader("Fichier des écarts")
-    fichier_ecarts = st.file_uploader("Sélectionnez le fichier des écarts", type=['xlsx', '.csv'], key=get_unique_key("fichier_ecarts"))
+    fichier_ecarts = choisir_entree('MTN_PAYIN', 'RECHERCHEV', 'ecarts', "Sélectionnez le fichier des écarts", get_unique_key("fichier_ecarts"))
     
     # Charger le fichier des transactions en échec
     st.subheader("Fichier des transactions en échec")
-    fichier_en_echec = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_echec"))
+    fichier_en_echec = choisir_entree('MTN_PAYIN', 'RECHERCHEV', 'en_echec', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_en_echec"))
     
     # Charger le fichier des transactions en succès chez l'opérateur
     st.subheader("Fichier des transactions en succès chez l'opérateur")
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions en succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('MTN_PAYIN', 'RECHERCHEV', 'operateur', "Sélectionnez le fichier des transactions en succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     if fichier_ecarts is not None and fichier_en_echec is not None and fichier_operateur is not None:
         try:
             # Charger les données des fichiers Excel
-            df_ecarts = pd.read_excel(fichier_ecarts)
-            df_en_echec = pd.read_excel(fichier_en_echec)
-            df_operateur = pd.read_excel(fichier_operateur)
-            
-            # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "CUSTOM 6" des transactions en échec
-            matched_df = pd.merge(df_ecarts, df_en_echec, left_on='External Transaction Id', right_on='External Transaction Id', how='left')
+            df_ecarts = fichier_ecarts.charger()
+            df_en_echec = fichier_en_echec.charger()
+            df_operateur = fichier_operateur.charger()
             
-            # Utiliser la fonction RECHERCHEV pour trouver les éléments "ID TRANSACTION" et "SITE ID" dans les transactions en échec de CinetPay
-            matched_df['ID TRANSACTION'] = matched_df['External Transaction Id'].apply(lambda x: df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x, 'ID TRANSACTION'].values[0] if not pd.isnull(x) and not df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x].empty else '')
-            matched_df['SITE_ID'] = matched_df['External Transaction Id'].apply(lambda x: df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x, 'SITE ID'].values[0] if not pd.isnull(x) and not df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x].empty else '')
-            
-            # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "External Transaction Id" du fichier de l'opérateur en succès
-            matched_df = pd.merge(matched_df, df_operateur[['External Transaction Id', 'Date', 'HEURE']], left_on='External Transaction Id', right_on='External Transaction Id', how='left')
+            # Effectuer la RECHERCHEV des écarts dans les transactions en échec et le fichier de l'opérateur
+            resultats = executer_en_tache('MTN_PAYIN RECHERCHEV', [fichier_ecarts, fichier_en_echec, fichier_operateur], etapes.recherchev_mtn_payin, df_ecarts, df_en_echec, df_operateur)
+            if resultats is None:
+                return
+            matched_df = resultats['resultat']
             
             # Enregistrer les écarts mis à jour dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                matched_df.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_mis_a_jour.xlsx">Télécharger le fichier des écarts mis à jour</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(matched_df, 'ecarts_mis_a_jour.xlsx', "Télécharger le fichier des écarts mis à jour", 'MTN_PAYIN RECHERCHEV resultat')
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(matched_df)
+            afficher(matched_df)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -265,28 +370,24 @@ def recherchev():
 # Créer une fonction pour réaliser le TCD des transactions en succès chez l'opérateur
 def tcd_transactions_success_payin():
     # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('MTN_PAYIN', 'TCD', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     if fichier_operateur is not None:
         try:
             # Charger les données des transactions en succès de l'opérateur dans un DataFrame
-            df_transactions_success = pd.read_excel(fichier_operateur)
-
-            # Convertir la colonne 'Date' en format de date si nécessaire
-            df_transactions_success['Date'] = pd.to_datetime(df_transactions_success['Date'])
+            df_transactions_success = fichier_operateur.charger()
 
-            # Créer le TCD en utilisant la méthode pivot_table()
-            tcd = pd.pivot_table(df_transactions_success, index=['Date'], values=['Montant'], aggfunc={'Montant': ['count', 'sum']}, fill_value=0)
-
-            # Renommer les colonnes du TCD
-            tcd.columns = ['Nombre de Montant', 'Somme de Montant']
-
-            # Calculer la colonne 'Somme des Frais' en soustrayant 'Nombre de Montant' de 'Somme de Montant'
-            tcd['Somme des Frais'] = tcd['Somme de Montant'] - tcd['Nombre de Montant']
+            # Créer le TCD par date
+            resultats = executer_en_tache('MTN_PAYIN TCD', [fichier_operateur], etapes.tcd_mtn_payin, df_transactions_success)
+            if resultats is None:
+                return
+            tcd = resultats['tcd']
+            signaler_anomalies(resultats)
+            enregistrer_agregats('MTN_PAYIN', df_transactions_success)
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(tcd)
+            afficher(tcd)
         except Exception as e:
             st.error(f"Erreur lors du traitement du fichier : {str(e)}")
             
@@ -350,42 +451,31 @@ def tcd_transactions_success_payin():
 
 def import_and_match_transactions_orange_magma_payin():
        # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('ORANGE_MAGMA_PAYIN', 'NBSI_OP', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     # Charger le fichier des transactions succès dans notre Back Office
-    fichier_back_office = st.file_uploader("Sélectionnez le fichier des transactions succès dans notre Back Office", type=['xlsx', '.csv'], key=get_unique_key("fichier_back_office"))
+    fichier_back_office = choisir_entree('ORANGE_MAGMA_PAYIN', 'NBSI_OP', 'back_office', "Sélectionnez le fichier des transactions succès dans notre Back Office", get_unique_key("fichier_back_office"))
     
     if fichier_operateur is not None and fichier_back_office is not None:
         try:
             # Charger les données des fichiers Excel
-            df_operateur = pd.read_excel(fichier_operateur)
-            df_back_office = pd.read_excel(fichier_back_office)
-            
+            df_operateur = fichier_operateur.charger()
+            df_back_office = fichier_back_office.charger()
             
-            # Filtrer la colonne "Traitant" pour ne garder que les transactions en "Orange CI (API MAGMA)"
-            df_back_office = df_back_office[df_back_office['Traitant'] == 'Orange CI (API MAGMA)']
-            
-            # Effectuer le matching entre la colonne "Référence" du premier DataFrame et la colonne "ID PAIEMENT" du deuxième DataFrame
-            matched_df = pd.merge(df_operateur, df_back_office, left_on='TransactionID', right_on='slug', how='left', indicator=True)
             
             # Filtrer les transactions non correspondantes
-            non_matched_df = matched_df[matched_df['_merge'] == 'left_only']
+            resultats = executer_en_tache('ORANGE_MAGMA_PAYIN NBSI_OP', [fichier_operateur, fichier_back_office], etapes.nbsi_op_orange_magma_payin, df_operateur, df_back_office)
+            if resultats is None:
+                return
+            deposer_resultats('ORANGE_MAGMA_PAYIN', 'NBSI_OP', resultats, [fichier_operateur, fichier_back_office])
+            non_matched_df = resultats['ecarts']
+            signaler_doublons(resultats, 'doublons_orange_magma.xlsx', 'ORANGE_MAGMA_PAYIN NBSI_OP')
             
             # Télécharger le fichier des écarts
             st.subheader("Télécharger le fichier des écarts")
-            st.write(non_matched_df)
+            afficher(non_matched_df)
            # Enregistrer les écarts dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                non_matched_df.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_orange_magma.xlsx">Télécharger le fichier des écarts</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(non_matched_df, 'ecarts_orange_magma.xlsx', "Télécharger le fichier des écarts", 'ORANGE_MAGMA_PAYIN NBSI_OP ecarts')
 
             
         except Exception as e:
@@ -400,58 +490,35 @@ def import_and_match_transactions_orange_magma_payin():
 # Créer une fonction pour réaliser le TCD des transactions en succès chez l'opérateur
 import streamlit as st
 import pandas as pd
-import io
-import base64
 import traceback
 
 import streamlit as st
 import pandas as pd
-import io
-import base64
 import traceback
 
 def tcd_transactions_success_magma_payin():
     # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('ORANGE_MAGMA_PAYIN', 'TCD', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     if fichier_operateur is not None:
         try:
             # Charger les données des transactions en succès de l'opérateur dans un DataFrame
-            df_transactions_success = pd.read_excel(fichier_operateur)
-
-            # Convertir la colonne 'Date' en format de date si nécessaire
-            df_transactions_success['Date'] = pd.to_datetime(df_transactions_success['Created At'])
-            
-            # Extraire la date courte (jour-mois-année)
-            df_transactions_success['Date_Courte'] = df_transactions_success['Date'].dt.strftime('%d-%m-%Y')
-
-            # Calculer le count par date
-            count_by_date = df_transactions_success.groupby('Date_Courte')['Amount'].count()
+            df_transactions_success = fichier_operateur.charger()
 
-            # Calculer la somme par date
-            sum_by_date = df_transactions_success.groupby('Date_Courte')['Amount'].sum()
-
-            # Calculer la colonne 'Somme des Frais' en soustrayant le count du sum
-            sum_frais_by_date = sum_by_date - count_by_date
-
-            # Fusionner les résultats dans un DataFrame
-            tcd = pd.DataFrame({'Nombre de Montant': count_by_date, 'Somme de Montant': sum_by_date, 'Somme des Frais': sum_frais_by_date})
+            # Créer le TCD par date courte
+            resultats = executer_en_tache('ORANGE_MAGMA_PAYIN TCD', [fichier_operateur], etapes.tcd_orange_magma_payin, df_transactions_success)
+            if resultats is None:
+                return
+            tcd = resultats['tcd']
+            signaler_anomalies(resultats)
+            enregistrer_agregats('ORANGE_MAGMA_PAYIN', df_transactions_success)
 
             # Enregistrer le TCD dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                tcd.to_excel(writer, index=True)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.getvalue()).decode()
-            href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="tcd_transactions_success.xlsx">Télécharger le TCD des transactions succès</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(tcd, 'tcd_transactions_success.xlsx', "Télécharger le TCD des transactions succès", 'ORANGE_MAGMA_PAYIN TCD tcd', avec_index=True)
 
             # Afficher le TCD
             st.subheader("TCD des transactions succès chez l'opérateur")
-            st.write(tcd)
+            afficher(tcd)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement du fichier : {str(e)}")               
@@ -475,22 +542,21 @@ def get_unique_key(key_name):
 
             
 #----------------------------------------------------------------------------------------------------------------------------------------
-# Fonction pour créer l'External Transaction Id pour le fichier opérateur
-def create_external_transaction_id_operateur(row):
-    if  row['Operator']  in ['Orange_GN', 'Orange_CI', 'Orange_BF', 'Orange_ML', 'Orange_SN']:
-        return f"{row['Receiver']}_{row['Created At']}_{row['Amount']}_{row['Heure']}"
-    else:
-        return f"{row['Receiver']}_{row['Created At']}_{row['Amount']}"
-
-def create_external_transaction_id_cinetpay(row):
-    if row['Opérateur'] not in ['Orange GN', 'Orange CI', 'Orange BF', 'Orange ML', 'Orange SN']:
-        return f"{row['Numéro']}_{row['Date']}_{row['Montant']}"
-    else:
-        return f"{row['Numéro']}_{row['Crée le']}_{row['Montant']}"
-    
-def create_external_transaction_id_échec(row):
-    
-        return f"{row['TELEPHONE']}_{row['CREATION']}_{row['HEURE']}_{row['MONTANT']}"    
+# Clés "External Transaction Id" de l'option EXTERNAL ID de la page ORANGE PAYIN (import_and_match_transactions_orange_payin)
+# Spécification de l'External Transaction Id pour le fichier opérateur
+cle_external_transaction_id_operateur = SpecCle([
+    BrancheCle(['Receiver', 'Created At', 'Amount', 'Heure'], si=('Operator', ['Orange_GN', 'Orange_CI', 'Orange_BF', 'Orange_ML', 'Orange_SN'])),
+    BrancheCle(['Receiver', 'Created At', 'Amount']),
+])
+
+# Spécification de l'External Transaction Id pour le fichier des transactions à succès chez CinetPay
+cle_external_transaction_id_cinetpay = SpecCle([
+    BrancheCle(['Numéro', 'Date', 'Montant'], sauf=('Opérateur', ['Orange GN', 'Orange CI', 'Orange BF', 'Orange ML', 'Orange SN'])),
+    BrancheCle(['Numéro', 'Crée le', 'Montant']),
+])
+
+# Spécification de l'External Transaction Id pour le fichier des transactions en échec
+cle_external_transaction_id_échec = SpecCle(BrancheCle(['TELEPHONE', 'CREATION', 'HEURE', 'MONTANT']))
 
 def import_and_match_transactions_orange_payin():
     # Charger le fichier des transactions succès chez l'opérateur
@@ -502,52 +568,31 @@ def import_and_match_transactions_orange_payin():
     # Charger le fichier des transactions succès chez l'opérateur
     fichier_échec = st.file_uploader("Sélectionnez le fichier des transactions en échec chez cinetpay", type=['xlsx', '.csv'], key=get_unique_key("fichier_échec"))
     
-    if fichier_operateur is not None and fichier_back_office is not None:
+    if fichier_operateur is not None and fichier_back_office is not None and fichier_échec is not None:
         try:
             # Charger les données des fichiers Excel
-            df_operateur = pd.read_excel(fichier_operateur)
-            df_back_office = pd.read_excel(fichier_back_office)
-            fichier_échec= pd.read_excel(fichier_échec)
+            df_operateur = lire_fichier(fichier_operateur, operateur='ORANGE_PAYIN', type_source='operateur')
+            df_back_office = lire_fichier(fichier_back_office, operateur='ORANGE_PAYIN', type_source='back_office')
+            fichier_échec= lire_fichier(fichier_échec, operateur='ORANGE_PAYIN', type_source='en_echec')
             # Créer une colonne "External Transaction Id" dans le fichier opérateur
-            df_operateur['External Transaction Id'] = df_operateur.apply(create_external_transaction_id_operateur, axis=1)
+            df_operateur['External Transaction Id'] = cle_external_transaction_id_operateur.construire(df_operateur)
             
             # Créer une colonne "External Transaction Id" dans le fichier des transactions à succès chez CinetPay
-            df_back_office['External Transaction Id'] = df_back_office.apply(create_external_transaction_id_cinetpay, axis=1)
+            df_back_office['External Transaction Id'] = cle_external_transaction_id_cinetpay.construire(df_back_office)
             
             # Créer une colonne "External Transaction Id" dans le fichier des transactions en échec
-            fichier_échec['External Transaction Id'] = fichier_échec.apply(create_external_transaction_id_échec, axis=1)
+            fichier_échec['External Transaction Id'] = cle_external_transaction_id_échec.construire(fichier_échec)
 
 
-            # Enregistrer les informations du fichier opérateur avec la nouvelle colonne "External Transaction Id" dans un nouveau fichier
-            new_operator_file = df_operateur.copy()
-            excel_data_operator = io.BytesIO()
-            with pd.ExcelWriter(excel_data_operator, engine='xlsxwriter') as writer:
-                new_operator_file.to_excel(writer, index=False)
-            excel_data_operator.seek(0)
-            
-            # Enregistrer les informations du fichier des transactions à succès chez CinetPay avec la nouvelle colonne "External Transaction Id" dans un nouveau fichier
-            new_cinetpay_file = df_back_office.copy()
-            excel_data_cinetpay = io.BytesIO()
-            with pd.ExcelWriter(excel_data_cinetpay, engine='xlsxwriter') as writer:
-                new_cinetpay_file.to_excel(writer, index=False)
-            excel_data_cinetpay.seek(0)
-            
-            # Enregistrer les informations du fichier des transactions en échec chez CinetPay avec la nouvelle colonne "External Transaction Id" dans un nouveau fichier
-            new_échec_file = fichier_échec.copy()
-            excel_data_échec = io.BytesIO()
-            with pd.ExcelWriter(excel_data_échec, engine='xlsxwriter') as writer:
-                new_échec_file.to_excel(writer, index=False)
-            excel_data_échec.seek(0)
-            
-            # Télécharger les nouveaux fichiers
+            # Télécharger les nouveaux fichiers avec la colonne "External Transaction Id" (générés au clic, sans copie des DataFrames)
             st.subheader("Télécharger le fichier des transactions succès chez l'opérateur avec la colonne 'External Transaction Id'")
-            st.download_button("Télécharger", data=excel_data_operator.getvalue(), file_name='new_operator_file.xlsx')
+            proposer_telechargement(df_operateur, 'new_operator_file.xlsx', "Télécharger", 'ORANGE_PAYIN EXTERNAL_ID operateur')
             
             st.subheader("Télécharger le fichier des transactions succès chez CinetPay avec la colonne 'External Transaction Id'")
-            st.download_button("Télécharger", data=excel_data_cinetpay.getvalue(), file_name='new_cinetpay_file.xlsx')
+            proposer_telechargement(df_back_office, 'new_cinetpay_file.xlsx', "Télécharger", 'ORANGE_PAYIN EXTERNAL_ID back_office')
             
             st.subheader("Télécharger le fichier des transactions en échec chez CinetPay avec la colonne 'External Transaction Id'")
-            st.download_button("Télécharger", data=excel_data_échec.getvalue(), file_name='new_échec_file.xlsx')
+            proposer_telechargement(fichier_échec, 'new_échec_file.xlsx', "Télécharger", 'ORANGE_PAYIN EXTERNAL_ID en_echec')
             
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -566,27 +611,20 @@ def NBSI_transactions_orange_payin():
     if fichier_operateur is not None and fichier_back_office is not None:
         try:
             # Charger les données des fichiers Excel
-            df_operateur = pd.read_excel(fichier_operateur)
-            df_back_office = pd.read_excel(fichier_back_office)
+            df_operateur = lire_fichier(fichier_operateur, operateur='ORANGE_PAYIN', type_source='operateur')
+            df_back_office = lire_fichier(fichier_back_office, operateur='ORANGE_PAYIN', type_source='back_office')
             
             # Effectuer le matching entre la colonne "Référence" du premier DataFrame et la colonne "ID PAIEMENT" du deuxième DataFrame
-            matched_df = pd.merge(df_operateur, df_back_office, left_on='TransactionID', right_on='slug', how='left', indicator=True)
+            matched_df = fusionner(df_operateur, df_back_office, left_on='TransactionID', right_on='slug', how='left', indicator=True)
             
             # Filtrer les transactions non correspondantes
             non_matched_df = matched_df[matched_df['_merge'] == 'left_only']
             
             
-             # Enregistrer les informations du fichier opérateur avec la nouvelle colonne "External Transaction Id" dans un nouveau fichier
-            écart_file = non_matched_df.copy()
-            excel_data_écarts = io.BytesIO()
-            with pd.ExcelWriter(excel_data_écarts, engine='xlsxwriter') as writer:
-                 écart_file.to_excel(writer, index=False)
-            excel_data_écarts.seek(0)
-            
             # Télécharger le fichier des écarts
             st.subheader("Télécharger le fichier des écarts")
-            st.write(non_matched_df)
-            st.download_button("Télécharger", data=excel_data_écarts.read(), file_name='ecarts_test_mtn.xlsx')
+            afficher(non_matched_df)
+            proposer_telechargement(non_matched_df, 'ecarts_test_mtn.xlsx', "Télécharger", 'ORANGE_PAYIN NBSI_OP ecarts')
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")            
             
@@ -617,88 +655,59 @@ def import_ecarts_and_en_echec_orange_payin():
 
     # Charger le fichier des transactions succès dans notre Back Office
     fichier_en_échec = st.file_uploader("Sélectionnez le fichier des transactions en échec dans notre Back Office", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_échec"))
+    tolerance_secondes = tolerance_horaire("tolerance_ecarts_orange_payin")
 
     if fichier_operateur is not None and fichier_en_échec is not None:
         try:
             # Charger les données des fichiers Excel
-            fichier_operateur = pd.read_excel(fichier_operateur)
-            fichier_en_échec = pd.read_excel(fichier_en_échec)
-            fichier_écart=pd.read_excel(fichier_écart)
+            fichier_operateur = lire_fichier(fichier_operateur, operateur='ORANGE_PAYIN', type_source='operateur')
+            fichier_en_échec = lire_fichier(fichier_en_échec, operateur='ORANGE_PAYIN', type_source='en_echec')
+            fichier_écart=lire_fichier(fichier_écart, operateur='ORANGE_PAYIN', type_source='ecarts')
 
             # Vérifier s'il y a des écarts (différence de lignes entre les deux fichiers)
             is_ecart = len(fichier_écart) < len(fichier_operateur)
 
-            if is_ecart:
+            if is_ecart and tolerance_secondes:
+                # Même téléphone et même montant, horodatages à au plus `tolerance_secondes` près
+                fichier_écart = remplir_fenetre(fichier_écart, fichier_en_échec, ['Receiver', 'Amount'], ['TELEPHONE', 'MONTANT'],
+                                                ('Created At', None), ('DATE PAIEMENT', None), tolerance_secondes, ['SITE_ID', 'ID TRANSACTION'])
+
+                proposer_telechargement(fichier_écart, 'ecarts.xlsx', "Télécharger le fichier des écarts", 'ORANGE_PAYIN NBSI_ECART resultat')
+                st.subheader("Résultats")
+                afficher(fichier_écart)
+
+            elif is_ecart:
                 # Créer une colonne External Transaction Id dans le fichier des transactions en échec chez l'opérateur
               # Créer une colonne External Transaction Id dans le fichier des transactions en échec chez l'opérateur
-                fichier_écart['External Transaction Id'] = fichier_écart['Receiver'].astype(str) + fichier_écart['Created At'].astype(str) + fichier_écart['Amount'].astype(str)
+                # (montants en entiers : 1000, 1000.0 et '1 000' donnent la même clé)
+                fichier_écart['External Transaction Id'] = fichier_écart['Receiver'].astype(str) + fichier_écart['Created At'].astype(str) + montants_entiers(fichier_écart['Amount']).astype(str)
 
                 # Créer une colonne External Transaction Id dans le fichier des transactions succès chez notre Back Office
-                fichier_en_échec['External Transaction Id'] = fichier_en_échec['TELEPHONE'].astype(str) + fichier_en_échec['DATE PAIEMENT'].astype(str) + fichier_en_échec['MONTANT'].astype(str)
-
-                # Faire le matching des colonnes External Transaction Id
-                #matched_df = pd.merge(fichier_écart, fichier_en_échec[['External Transaction Id', 'ID TRANSACTION', 'SITE_ID']], on='External Transaction Id', how='left')
-                # Créer des listes pour stocker les valeurs de SITE ID et ID TRANSACTION
-                site_ids = []
-                id_transactions = []
-
-                # Parcourir les transactions du fichier des écarts
-                for index, row in fichier_écart.iterrows():
-                    reference = row['External Transaction Id']
-                    
-                    # Rechercher la correspondance dans le fichier des transactions en échec
-                    match = fichier_en_échec[fichier_en_échec['External Transaction Id'] == reference]
-                    
-                    if not match.empty:
-                        site_id = match['SITE_ID'].values[0]
-                        id_transaction = match['ID TRANSACTION'].values[0]
-                    else:
-                        site_id = ''
-                        id_transaction = ''
-                        
-                    
-                    # Ajouter les valeurs dans les listes
-                    site_ids.append(site_id)
-                    id_transactions.append(id_transaction)
+                fichier_en_échec['External Transaction Id'] = fichier_en_échec['TELEPHONE'].astype(str) + fichier_en_échec['DATE PAIEMENT'].astype(str) + montants_entiers(fichier_en_échec['MONTANT']).astype(str)
 
-                # Ajouter les listes de valeurs au DataFrame des écarts
-                fichier_écart['SITE_ID'] = site_ids
-                fichier_écart['ID TRANSACTION'] = id_transactions
+                # Faire le matching des colonnes External Transaction Id : la première transaction en échec
+                # trouvée pour chaque écart fournit SITE_ID et ID TRANSACTION ('' si aucune correspondance)
+                index_en_échec = IndexRecherche(fichier_en_échec, 'External Transaction Id')
+                fichier_écart = index_en_échec.remplir(fichier_écart, 'External Transaction Id', ['SITE_ID', 'ID TRANSACTION'])
 
 
                 # Faire la RECHERCHEV pour compléter les informations manquantes dans les écarts
                 # ...
 
                 # Enregistrer les écarts dans un fichier Excel
-                excel_data_ecarts = io.BytesIO()
-                with pd.ExcelWriter(excel_data_ecarts, engine='xlsxwriter') as writer:
-                    fichier_écart.to_excel(writer, index=False)
-                excel_data_ecarts.seek(0)
-
-                # Générer le lien de téléchargement
-                b64 = base64.b64encode(excel_data_ecarts.read()).decode()
-                href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts.xlsx">Télécharger le fichier des écarts</a>'
-
-                # Afficher le lien de téléchargement
-                st.markdown(href, unsafe_allow_html=True)
+                proposer_telechargement(fichier_écart, 'ecarts.xlsx', "Télécharger le fichier des écarts", 'ORANGE_PAYIN NBSI_ECART resultat')
 
                 # Afficher les résultats
                 st.subheader("Résultats")
-                st.write(fichier_écart)
+                afficher(fichier_écart)
 
             else:
                 # Réaliser le TCD interne car il n'y a pas d'écarts
                 tcd_interne_result = tcd_interne_1(fichier_écart)
 
-                # Enregistrer le TCD interne dans un fichier Excel
-                excel_data_tcd = io.BytesIO()
-                with pd.ExcelWriter(excel_data_tcd, engine='xlsxwriter') as writer:
-                    tcd_interne_result.to_excel(writer)
-                excel_data_tcd.seek(0)
-
                 # Télécharger le fichier du TCD interne
                 st.subheader("Télécharger le fichier du TCD interne")
-                st.download_button("Télécharger", data=excel_data_tcd.getvalue(), file_name='tcd_interne.xlsx')
+                proposer_telechargement(tcd_interne_result, 'tcd_interne.xlsx', "Télécharger", 'ORANGE_PAYIN NBSI_ECART tcd_interne', avec_index=True)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -731,38 +740,30 @@ ICI IL S'AGIT DE CREER LA LOGIQUE POUR ORANGE MONEY PAYIN POUR TOUS LES PAYS
                         
 def import_and_match_transactions_orange_money_payin():
        # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('ORANGE_MONEY_PAYIN', 'NBSI_OP', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     # Charger le fichier des transactions succès dans notre Back Office
-    fichier_back_office = st.file_uploader("Sélectionnez le fichier des transactions succès dans notre Back Office", type=['xlsx', '.csv'], key=get_unique_key("fichier_back_office"))
+    fichier_back_office = choisir_entree('ORANGE_MONEY_PAYIN', 'NBSI_OP', 'back_office', "Sélectionnez le fichier des transactions succès dans notre Back Office", get_unique_key("fichier_back_office"))
     
     if fichier_operateur is not None and fichier_back_office is not None:
         try:
             # Charger les données des fichiers Excel
-            df_operateur = pd.read_excel(fichier_operateur)
-            df_back_office = pd.read_excel(fichier_back_office)
-            
-            # Effectuer le matching entre la colonne "Référence" du premier DataFrame et la colonne "ID PAIEMENT" du deuxième DataFrame
-            matched_df = pd.merge(df_operateur, df_back_office, left_on='Référence', right_on='ID PAIEMENT', how='left', indicator=True)
+            df_operateur = fichier_operateur.charger()
+            df_back_office = fichier_back_office.charger()
             
             # Filtrer les transactions non correspondantes
-            non_matched_df = matched_df[matched_df['_merge'] == 'left_only']
+            resultats = executer_en_tache('ORANGE_MONEY_PAYIN NBSI_OP', [fichier_operateur, fichier_back_office], etapes.nbsi_op_orange_money_payin, df_operateur, df_back_office)
+            if resultats is None:
+                return
+            deposer_resultats('ORANGE_MONEY_PAYIN', 'NBSI_OP', resultats, [fichier_operateur, fichier_back_office])
+            non_matched_df = resultats['ecarts']
+            signaler_doublons(resultats, 'doublons_orange.xlsx', 'ORANGE_MONEY_PAYIN NBSI_OP')
             
             # Télécharger le fichier des écarts
             st.subheader("Télécharger le fichier des écarts")
-            st.write(non_matched_df)
+            afficher(non_matched_df)
            # Enregistrer les écarts dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                non_matched_df.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_orange.xlsx">Télécharger le fichier des écarts</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(non_matched_df, 'ecarts_orange.xlsx', "Télécharger le fichier des écarts", 'ORANGE_MONEY_PAYIN NBSI_OP ecarts')
 
             
         except Exception as e:
@@ -777,11 +778,11 @@ def import_ecarts_and_en_echec_orange_money_payin():
     
     # Charger le fichier des écarts
     st.subheader("Fichier des écarts")
-    fichier_ecarts = st.file_uploader("Sélectionnez le fichier des écarts", type=['xlsx', '.csv'], key=get_unique_key("fichier_ecarts"))
+    fichier_ecarts = choisir_entree('ORANGE_MONEY_PAYIN', 'NBSI_ECART', 'ecarts', "Sélectionnez le fichier des écarts", get_unique_key("fichier_ecarts"))
     
     # Charger le fichier des transactions en échec
     st.subheader("Fichier des transactions en échec")
-    fichier_en_echec = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_echec"))
+    fichier_en_echec = choisir_entree('ORANGE_MONEY_PAYIN', 'NBSI_ECART', 'en_echec', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_en_echec"))
     
     # Charger le fichier des transactions en succès chez l'opérateur
     #st.subheader("Fichier des transactions en succès chez l'opérateur")
@@ -790,36 +791,25 @@ def import_ecarts_and_en_echec_orange_money_payin():
     if fichier_ecarts is not None and fichier_en_echec is not None :
         try:
             # Charger les données des fichiers Excel
-            df_ecarts = pd.read_excel(fichier_ecarts)
-            df_en_echec = pd.read_excel(fichier_en_echec)
+            df_ecarts = fichier_ecarts.charger()
+            df_en_echec = fichier_en_echec.charger()
             #df_operateur = pd.read_excel(fichier_operateur)
             
-            # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "CUSTOM 6" des transactions en échec
-            matched_df = pd.merge(df_ecarts, df_en_echec, left_on='Référence', right_on='CUSTOM 6', how='left')
-            
-            # Utiliser la fonction RECHERCHEV pour trouver les éléments "ID TRANSACTION" et "SITE ID" dans les transactions en échec de CinetPay
-            matched_df['ID TRANSACTION'] = matched_df['Référence'].apply(lambda x: df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x, 'ID TRANSACTION'].values[0] if not pd.isnull(x) and not df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x].empty else '')
-            matched_df['SITE_ID'] = matched_df['Référence'].apply(lambda x: df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x, 'SITE_ID'].values[0] if not pd.isnull(x) and not df_en_echec.loc[df_en_echec['ID TRANSACTION'] == x].empty else '')
+            # Effectuer le matching des écarts avec les transactions en échec et la RECHERCHEV de "ID TRANSACTION" et "SITE ID"
+            resultats = executer_en_tache('ORANGE_MONEY_PAYIN NBSI_ECART', [fichier_ecarts, fichier_en_echec], etapes.nbsi_ecart_orange_money_payin, df_ecarts, df_en_echec)
+            if resultats is None:
+                return
+            matched_df = resultats['resultat']
             
             # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "External Transaction Id" du fichier de l'opérateur en succès
             #matched_df = pd.merge(matched_df, df_operateur, left_on='Référence', right_on='CUSTOM 6', how='left')
             
             # Enregistrer les écarts mis à jour dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                matched_df.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_mis_a_jour.xlsx">Télécharger le fichier des écarts mis à jour</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(matched_df, 'ecarts_mis_a_jour.xlsx', "Télécharger le fichier des écarts mis à jour", 'ORANGE_MONEY_PAYIN NBSI_ECART resultat')
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(matched_df)
+            afficher(matched_df)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -831,64 +821,36 @@ def recherchev_orange_money_payin():
     
     # Charger le fichier des écarts
     st.subheader("Fichier des écarts")
-    fichier_ecarts = st.file_uploader("Sélectionnez le fichier des écarts", type=['xlsx', '.csv'], key=get_unique_key("fichier_ecarts"))
+    fichier_ecarts = choisir_entree('ORANGE_MONEY_PAYIN', 'RECHERCHEV', 'ecarts', "Sélectionnez le fichier des écarts", get_unique_key("fichier_ecarts"))
     
     # Charger le fichier des transactions en échec
     st.subheader("Fichier des transactions en échec")
-    fichier_en_echec = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_echec"))
+    fichier_en_echec = choisir_entree('ORANGE_MONEY_PAYIN', 'RECHERCHEV', 'en_echec', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_en_echec"))
+    tolerance_secondes = tolerance_horaire("tolerance_recherchev_orange_money")
     
-    # Charger le fichier des transactions en succès chez l'opérateur
-    st.subheader("Fichier des transactions en succès chez l'opérateur")
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions en succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
-    
-    if fichier_ecarts is not None and fichier_en_echec is not None and fichier_operateur is not None:
+    if fichier_ecarts is not None and fichier_en_echec is not None:
         try:
             # Charger les données des fichiers Excel
-            df_ecarts = pd.read_excel(fichier_ecarts)
-            df_en_echec = pd.read_excel(fichier_en_echec)
-            df_operateur = pd.read_excel(fichier_operateur)
-            
-            # Créer une colonne "External Transaction Id" pour le fichier des écarts en concaténant les colonnes N° de Compte2, Crédit, Date et Heure
-            df_ecarts['External Transaction Id'] = df_ecarts['N° de Compte2'].astype(str) + df_ecarts['Crédit'].astype(str) + df_ecarts['Date'].astype(str) + df_ecarts['Heure'].astype(str)
-            
-            # Créer une colonne "External Transaction Id" pour le fichier du back office en échec en concaténant les colonnes TELEPHONE, MONTANT, CREATION
-            df_en_echec['Cinetpay Transaction Id'] = df_en_echec['TÉLÉPHONE'].astype(str) + df_en_echec['MONTANT'].astype(str) + df_en_echec['CREATION'].astype(str)+df_en_echec['heure'].astype(str)
-            st.write(df_en_echec)
-            # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "External Transaction Id" du fichier de l'opérateur en succès
-           # matched_df = pd.merge(df_ecarts, df_operateur[['External Transaction Id', 'ID TRANSACTION', 'SITE ID']], left_on='Référence', right_on='External Transaction Id', how='left')
-                    
-            # Convertir la colonne 'Référence' du fichier des écarts en type de données compatible
-            df_ecarts['External Transaction Id'] = df_ecarts['External Transaction Id'].astype(str)
+            df_ecarts = fichier_ecarts.charger()
+            df_en_echec = fichier_en_echec.charger()
             
-            # Fusionner les DataFrames des écarts et des transactions en échec
-            merged_df = pd.merge(df_ecarts, df_en_echec, left_on='External Transaction Id', right_on='Cinetpay Transaction Id', how='left')
-            st.write(merged_df)
-            # Sélectionner les colonnes nécessaires
-            selected_columns = ['ID TRANSACTION', 'SITE_ID', 'CPM_RESULT', 'Référence', 'Date', 'heure']
-            result_table = merged_df[selected_columns].copy()
-
-            # Renommer les colonnes
-            result_table.columns = ['ID transaction', 'Site ID', 'Résultat Paiement', 'Opérateur Transaction ID', 'Date Paiement', 'Heure Paiement']
+            # Fusionner les écarts et les transactions en échec puis sélectionner les colonnes du rapport
+            resultats = executer_en_tache('ORANGE_MONEY_PAYIN RECHERCHEV', [fichier_ecarts, fichier_en_echec], etapes.recherchev_orange_money_payin, df_ecarts, df_en_echec, tolerance_secondes)
+            if resultats is None:
+                return
+            afficher(resultats['en_echec'])
+            afficher(resultats['fusion'])
+            result_table = resultats['resultat']
             
              #Ajout du datafrale dans le fichier de rapport
             #maj_df.to_excel(excel_file, sheet_name="template - CINETPAY", index = None)
             
             # Enregistrer les écarts mis à jour dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                result_table.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_mis_a_jour.xlsx">Télécharger le fichier des écarts mis à jour</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(result_table, 'ecarts_mis_a_jour.xlsx', "Télécharger le fichier des écarts mis à jour", 'ORANGE_MONEY_PAYIN RECHERCHEV resultat')
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(result_table)
+            afficher(result_table)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -898,41 +860,27 @@ def recherchev_orange_money_payin():
 # Créer une fonction pour réaliser le TCD des transactions en succès chez l'opérateur
 def tcd_transactions_success_orange_money_payin():
     # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('ORANGE_MONEY_PAYIN', 'TCD', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     if fichier_operateur is not None:
         try:
             # Charger les données des transactions en succès de l'opérateur dans un DataFrame
-            df_transactions_success = pd.read_excel(fichier_operateur)
-
-            # Convertir la colonne 'Date' en format de date si nécessaire
-            df_transactions_success['Date'] = pd.to_datetime(df_transactions_success['Date'])
-            #convertir la colonne date en date courte
-            df_transactions_success['Date_courte']=df_transactions_success['Date'].dt.strftime('%d-%m-%Y')
-            #formater le montant
-           # df_transactions_success['Crédit']= df_transactions_success['Crédit'].apply(lambda x: "{:.2f}".format(x).rstrip('0').rstrip('.'))
-            #Calculer le count par date
-            count_by_date=df_transactions_success.groupby('Date_courte')['Crédit'].count()
-            #calculer la somme par date
-            sum_by_date=df_transactions_success.groupby('Date_courte')['Crédit'].sum()
-            #On fusionne le résultat dans un dataframe
-            tcd = pd.DataFrame({'Nombre de Montant': count_by_date, 'Somme de Montant': sum_by_date})
-
-            # Enregistrer le TCD dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                tcd.to_excel(writer, index=True)
+            df_transactions_success = fichier_operateur.charger()
 
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.getvalue()).decode()
-            href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="tcd_orange_transactions_success.xlsx">Télécharger le TCD des transactions succès</a>'
+            # Créer le TCD par date courte
+            resultats = executer_en_tache('ORANGE_MONEY_PAYIN TCD', [fichier_operateur], etapes.tcd_orange_money_payin, df_transactions_success)
+            if resultats is None:
+                return
+            tcd = resultats['tcd']
+            signaler_anomalies(resultats)
+            enregistrer_agregats('ORANGE_MONEY_PAYIN', df_transactions_success)
 
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            # Enregistrer le TCD dans un fichier Excel
+            proposer_telechargement(tcd, 'tcd_orange_transactions_success.xlsx', "Télécharger le TCD des transactions succès", 'ORANGE_MONEY_PAYIN TCD tcd', avec_index=True)
 
             # Afficher le TCD
             st.subheader("TCD des transactions succès chez l'opérateur")
-            st.write(tcd)
+            afficher(tcd)
 
            
         except Exception as e:
@@ -949,72 +897,32 @@ ICI IL S'AGIT DE CREER LA LOGIQUE POUR TOGO MONEY PAYIN POUR TOUS LES PAYS
 
 def import_and_match_transactions_togo_money_payin():
     # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('TOGO_MONEY_PAYIN', 'NBSI_OP', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
 
     # Charger le fichier des transactions succès dans notre Back Office
-    fichier_back_office = st.file_uploader("Sélectionnez le fichier des transactions succès dans notre Back Office", type=['xlsx', '.csv'], key=get_unique_key("fichier_back_office"))
+    fichier_back_office = choisir_entree('TOGO_MONEY_PAYIN', 'NBSI_OP', 'back_office', "Sélectionnez le fichier des transactions succès dans notre Back Office", get_unique_key("fichier_back_office"))
 
     if fichier_operateur is not None and fichier_back_office is not None:
         try:
-            # Charger les données des fichiers Excel ou CSV
-            if fichier_operateur.name.endswith('.xlsx'):
-                df_operateur = pd.read_excel(fichier_operateur, engine='openpyxl')
-            else:
-                df_operateur = pd.read_csv(fichier_operateur)
-
-            if fichier_back_office.name.endswith('.xlsx'):
-                df_back_office = pd.read_excel(fichier_back_office, engine='openpyxl')
-            else:
-                df_back_office = pd.read_csv(fichier_back_office)
-
-            # Convertir la colonne "Transaction Id" en nombre entier en remplaçant les valeurs non valides par NaN
-            #df_operateur['Transaction Id'] = pd.to_numeric(df_operateur['Transaction Id'], errors='coerce')
-
-            # Filtrer les lignes contenant NaN dans la colonne "Transaction Id"
-            #df_operateur = df_operateur.dropna(subset=['Transaction Id'])
-            
-            # Convertir la colonne "Transaction Id" en nombre entier
-            #df_back_office['Transaction Id'] = df_back_office['Transaction Id'].astype(int)
-
-
-            # Filtrer la colonne "Type" pour ne garder que les transactions de type "sell"
-            df_operateur = df_operateur[df_operateur['Type'] == 'sell']
-
-            # Filtrer la colonne "State" pour ne garder que les transactions en "Completed"
-            df_operateur = df_operateur[df_operateur['State'] == 'Completed']
-
-            # Fractionner la colonne "Amount" pour enlever les zéros après le point
-            df_operateur['Amount'] = df_operateur['Amount'].apply(lambda x: '{:.3f}'.format(float(x)))
-
-            # Filtrer la colonne "ETAT TRANSACTION" pour ne garder que les transactions en "SUCCES"
-            df_back_office = df_back_office[df_back_office['ETAT TRANSACTION'] == 'SUCCES']
-
-            # Convertir la colonne "Transaction Id" en nombre entier
-            #df_back_office['ID PAIEMENT'] = df_back_office['ID PAIEMENT'].astype(int)
-
-            # Faire le matching entre la colonne 'Transaction Id' du premier DataFrame et la colonne 'ID PAIEMENT' du deuxième DataFrame
-            #merged_df = pd.merge(df_operateur, df_back_office, left_on='Transaction Id', right_on='ID PAIEMENT', how='left', indicator=True)
-            merged_df=df_operateur[(df_operateur["Transaction Id"].isin(df_back_office["ID PAIEMENT"]) == False)] 
-            
-            # Filtrer les transactions non correspondantes (en écart)
-            #non_matched_df = merged_df[merged_df['_merge'] == 'left_only']
+            # Charger les données des fichiers Excel ou CSV (le format est détecté d'après le nom du fichier)
+            df_operateur = fichier_operateur.charger()
+            df_back_office = fichier_back_office.charger()
+
+            # Les écarts sont les transactions opérateur "sell" / "Completed" absentes du Back Office
+            resultats = executer_nbsi_op('TOGO_MONEY_PAYIN', [fichier_operateur, fichier_back_office], etapes.nbsi_op_togo_money_payin, df_operateur, df_back_office)
+            if resultats is None:
+                return
+            deposer_resultats('TOGO_MONEY_PAYIN', 'NBSI_OP', resultats, [fichier_operateur, fichier_back_office])
+            merged_df = resultats['ecarts']
+            signaler_anomalies(resultats)
+            signaler_doublons(resultats, 'doublons_TMONEY.xlsx', 'TOGO_MONEY_PAYIN NBSI_OP')
 
             # Télécharger le fichier des écarts
             st.subheader("Télécharger le fichier des écarts")
-            st.write(merged_df)
+            afficher(merged_df)
 
             # Enregistrer les écarts dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                merged_df.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_TMONEY.xlsx">Télécharger le fichier des écarts</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(merged_df, 'ecarts_TMONEY.xlsx', "Télécharger le fichier des écarts", 'TOGO_MONEY_PAYIN NBSI_OP ecarts')
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -1027,67 +935,34 @@ def import_ecarts_and_en_echec_togo_money_payin():
       # Charger le fichier de l'opérateur
     #fichier_operateur = st.file_uploader("Sélectionnez le fichier de l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
     # Charger le fichier des écarts
-    fichier_ecarts = st.file_uploader("Sélectionnez le fichier des écarts", type=['xlsx', '.csv'], key=get_unique_key("fichier_ecarts"))
+    fichier_ecarts = choisir_entree('TOGO_MONEY_PAYIN', 'NBSI_ECART', 'ecarts', "Sélectionnez le fichier des écarts", get_unique_key("fichier_ecarts"))
     
     # Charger le fichier des transactions en échec
-    fichier_en_echec = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_echec"))
+    fichier_en_echec = choisir_entree('TOGO_MONEY_PAYIN', 'NBSI_ECART', 'en_echec', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_en_echec"))
+    tolerance_secondes = tolerance_horaire("tolerance_ecarts_togo_money")
     
     if fichier_ecarts is not None and fichier_en_echec is not None:
         try:
             # Charger les données des fichiers Excel into Pandas DataFrames
             #df_operateur = pd.read_excel(fichier_operateur)
-            df_en_echec = pd.read_excel(fichier_en_echec)
-            df_en_écart = pd.read_excel(fichier_ecarts)
+            df_en_echec = fichier_en_echec.charger()
+            df_en_écart = fichier_ecarts.charger()
 
-            # Vérifier s'il y a des écarts (différence de lignes entre les deux fichiers)
-            #is_ecart = len(df_en_écart) < len(df_operateur)
-
-            #if is_ecart:
-            df_en_écart['Initiator'] = df_en_écart['Initiator'].astype(str)
-            df_en_écart['Date'] = df_en_écart['Date'].astype(str)
-            #df_en_écart['HEURE'] = df_en_écart['HEURE'].astype(str)
-                #df_en_écart['Amount.1'] = df_en_écart['Amount.1'].astype(str)
-
-                # Créer une nouvelle DataFrame pour les écarts
-            new_df_ecarts = pd.DataFrame(df_en_écart)
-                
-                # Modifier les colonnes spécifiques pour créer la colonne "External Transaction Id"
-            new_df_ecarts['External Transaction Id'] = new_df_ecarts['Initiator'] + new_df_ecarts['Date']
-                
-            df_en_echec['TÉLÉPHONE'] = df_en_echec['TÉLÉPHONE'].astype(str)
-            df_en_echec['CREATION'] = df_en_echec['CREATION'].astype(str)
-                #df_en_echec['MONTANT'] = df_en_echec['MONTANT'].astype(str)
-               
-
-                # Créer une colonne External Transaction Id dans le fichier des transactions succès chez notre Back Office
-                #df_en_echec['External Transaction Id'] = df_en_echec['TELEPHONE'].str.cat([
-                #    df_en_echec['DATE PAIEMENT'], df_en_echec['MONTANT']
-               # ], sep='')
-            df_en_echec['External Transaction Id'] = df_en_echec['TÉLÉPHONE'].astype(str) + df_en_echec['CREATION'].astype(str) 
-                
-
-                # Faire le matching des colonnes External Transaction Id
-            matched_df = pd.merge(new_df_ecarts, df_en_echec[['External Transaction Id', 'ID TRANSACTION', 'SITE_ID']], on='External Transaction Id', how='left')
+            # Faire le matching des colonnes External Transaction Id
+            resultats = executer_en_tache('TOGO_MONEY_PAYIN NBSI_ECART', [fichier_ecarts, fichier_en_echec], etapes.nbsi_ecart_togo_money_payin, df_en_écart, df_en_echec, tolerance_secondes)
+            if resultats is None:
+                return
+            matched_df = resultats['resultat']
 
                 # Faire la RECHERCHEV pour compléter les informations manquantes dans les écarts
                 # ...
 
                 # Enregistrer les écarts dans un fichier Excel
-            excel_data_ecarts = io.BytesIO()
-            with pd.ExcelWriter(excel_data_ecarts, engine='xlsxwriter') as writer:
-                matched_df.to_excel(writer, index=False)
-            excel_data_ecarts.seek(0)
-
-                # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data_ecarts.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts.xlsx">Télécharger le fichier des écarts</a>'
-
-                # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(matched_df, 'ecarts.xlsx', "Télécharger le fichier des écarts", 'TOGO_MONEY_PAYIN NBSI_ECART resultat')
 
                 # Afficher les résultats
             st.subheader("Résultats")
-            st.write(matched_df)
+            afficher(matched_df)
 
            # else:
                 # Réaliser le TCD interne car il n'y a pas d'écarts
@@ -1114,67 +989,41 @@ def recherchev_togo_money_payin():
     
     # Charger le fichier des écarts
     st.subheader("Fichier des écarts")
-    fichier_ecarts = st.file_uploader("Sélectionnez le fichier des écarts", type=['xlsx', '.csv'], key=get_unique_key("fichier_ecarts"))
+    fichier_ecarts = choisir_entree('TOGO_MONEY_PAYIN', 'RECHERCHEV', 'ecarts', "Sélectionnez le fichier des écarts", get_unique_key("fichier_ecarts"))
     
     # Charger le fichier des transactions en échec
     st.subheader("Fichier des transactions en échec")
-    fichier_en_echec = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_en_echec"))
+    fichier_en_echec = choisir_entree('TOGO_MONEY_PAYIN', 'RECHERCHEV', 'en_echec', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_en_echec"))
     
     # Charger le fichier des transactions en succès chez l'opérateur
     #st.subheader("Fichier des transactions en succès chez l'opérateur")
     #fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions en succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    tolerance_secondes = tolerance_horaire("tolerance_recherchev_togo_money")
     
     if fichier_ecarts is not None and fichier_en_echec is not None :
         try:
             # Charger les données des fichiers Excel
-            df_ecarts = pd.read_excel(fichier_ecarts)
-            df_en_echec = pd.read_excel(fichier_en_echec)
+            df_ecarts = fichier_ecarts.charger()
+            df_en_echec = fichier_en_echec.charger()
            # df_operateur = pd.read_excel(fichier_operateur)
             
-            # Créer une colonne "External Transaction Id" pour le fichier des écarts en concaténant les colonnes N° de Compte2, Crédit, Date et Heure
-            df_ecarts['External Transaction Id'] = df_ecarts['Initiator'].astype(str) + df_ecarts['Amount'].astype(str) + df_ecarts['Date'].astype(str) + df_ecarts['heure'].astype(str)
-            
-            # Créer une colonne "External Transaction Id" pour le fichier du back office en échec en concaténant les colonnes TELEPHONE, MONTANT, CREATION
-            df_en_echec['Cinetpay Transaction Id'] = df_en_echec['TÉLÉPHONE'].astype(str) + df_en_echec['MONTANT'].astype(str) + df_en_echec['CREATION'].astype(str) + df_en_echec['heure'].astype(str)
-            st.write(df_en_echec)
-            # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "External Transaction Id" du fichier de l'opérateur en succès
-            #matched_df = pd.merge(df_ecarts, df_en_echec[['External Transaction Id', 'ID TRANSACTION', 'SITE ID']], left_on='External Transaction Id', right_on='Cinetpay Transaction Id', how='left')
-                    
-            # Convertir la colonne 'Référence' du fichier des écarts en type de données compatible
-            df_ecarts['External Transaction Id'] = df_ecarts['External Transaction Id'].astype(str)
-            
-            # Fusionner les DataFrames des écarts et des transactions en échec
-            merged_df = pd.merge(df_ecarts, df_en_echec, left_on='External Transaction Id', right_on='Cinetpay Transaction Id', how='left')
-            st.write(merged_df)
-            
-            # Substituer les valeurs 'NA' par 'ACCEPTED' dans la colonne 'CPM_RESULT'
-            merged_df['CPM_RESULT'] = merged_df['CPM_RESULT'].replace('NA', 'ACCEPTED')
-            # Sélectionner les colonnes nécessaires
-            selected_columns = ['ID TRANSACTION', 'SITE_ID', 'CPM_RESULT', 'Transaction Id', 'Date']
-            result_table = merged_df[selected_columns].copy()
-
-            # Renommer les colonnes
-            result_table.columns = ['ID transaction', 'Site ID', 'Résultat Paiement', 'Opérateur Transaction ID', 'Date Paiement']
+            # Fusionner les écarts et les transactions en échec puis sélectionner les colonnes du rapport
+            resultats = executer_en_tache('TOGO_MONEY_PAYIN RECHERCHEV', [fichier_ecarts, fichier_en_echec], etapes.recherchev_togo_money_payin, df_ecarts, df_en_echec, tolerance_secondes)
+            if resultats is None:
+                return
+            afficher(resultats['en_echec'])
+            afficher(resultats['fusion'])
+            result_table = resultats['resultat']
             
              #Ajout du datafrale dans le fichier de rapport
             #maj_df.to_excel(excel_file, sheet_name="template - CINETPAY", index = None)
             
             # Enregistrer les écarts mis à jour dans un fichier Excel
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
-                result_table.to_excel(writer, index=False)
-            excel_data.seek(0)
-
-            # Générer le lien de téléchargement
-            b64 = base64.b64encode(excel_data.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="ecarts_mis_a_jour.xlsx">Télécharger le fichier des écarts mis à jour</a>'
-
-            # Afficher le lien de téléchargement
-            st.markdown(href, unsafe_allow_html=True)
+            proposer_telechargement(result_table, 'ecarts_mis_a_jour.xlsx', "Télécharger le fichier des écarts mis à jour", 'TOGO_MONEY_PAYIN RECHERCHEV resultat')
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(result_table)
+            afficher(result_table)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
@@ -1184,90 +1033,58 @@ def recherchev_togo_money_payin():
 # Créer une fonction pour réaliser le TCD des transactions en succès chez l'opérateur
 def tcd_transactions_success_togo_money_payin():
     # Charger le fichier des transactions succès chez l'opérateur
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions succès chez l'opérateur", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('TOGO_MONEY_PAYIN', 'TCD', 'operateur', "Sélectionnez le fichier des transactions succès chez l'opérateur", get_unique_key("fichier_operateur"))
     
     if fichier_operateur is not None:
         try:
             # Charger les données des transactions en succès de l'opérateur dans un DataFrame
-            df_transactions_success = pd.read_excel(fichier_operateur)
-
-            # Convertir la colonne 'Date' en format de date si nécessaire
-            df_transactions_success['Date'] = pd.to_datetime(df_transactions_success['Date'])
-
-            # Créer le TCD en utilisant la méthode pivot_table()
-            tcd = pd.pivot_table(df_transactions_success, index=['Date'], values=['Crédit'], aggfunc={'Crédit': ['count', 'sum']}, fill_value=0)
-
-            # Renommer les colonnes du TCD
-            tcd.columns = ['Nombre de Montant', 'Somme de Montant']
+            df_transactions_success = fichier_operateur.charger()
 
-            # Calculer la colonne 'Somme des Frais' en soustrayant 'Nombre de Montant' de 'Somme de Montant'
-            tcd['Somme des Frais'] = tcd['Somme de Montant'] - tcd['Nombre de Montant']
+            # Créer le TCD par date
+            resultats = executer_en_tache('TOGO_MONEY_PAYIN TCD', [fichier_operateur], etapes.tcd_togo_money_payin, df_transactions_success)
+            if resultats is None:
+                return
+            tcd = resultats['tcd']
+            signaler_anomalies(resultats)
+            enregistrer_agregats('TOGO_MONEY_PAYIN', df_transactions_success)
 
             # Afficher les résultats
             st.subheader("Résultats")
-            st.write(tcd)
+            afficher(tcd)
         except Exception as e:
             st.error(f"Erreur lors du traitement du fichier : {str(e)}")  
             
 
 def import_orange_pendings_bo_payout():
     # Charger le fichier des pendings
-    fichier_pending = st.file_uploader("Sélectionnez le fichier des pendings", type=['xlsx', '.csv'], key=get_unique_key("fichier_pending"))
+    fichier_pending = choisir_entree('ORANGE_PENDING_PAYOUT', 'PENDINGS', 'pending', "Sélectionnez le fichier des pendings", get_unique_key("fichier_pending"))
 
     # Charger le fichier des transactions en échec
-    fichier_operateur = st.file_uploader("Sélectionnez le fichier des transactions en échec", type=['xlsx', '.csv'], key=get_unique_key("fichier_operateur"))
+    fichier_operateur = choisir_entree('ORANGE_PENDING_PAYOUT', 'PENDINGS', 'operateur', "Sélectionnez le fichier des transactions en échec", get_unique_key("fichier_operateur"))
 
     if fichier_pending is not None and fichier_operateur is not None:
         try:
-            # Charger les données des fichiers Excel into Pandas DataFrames
-            df_pending = pd.read_excel(fichier_pending)
-            df_operateur = pd.read_excel(fichier_operateur)
-
-            # Vérifier si les colonnes existent dans les DataFrames
-            required_columns_pending = ['mobile_recepteur', 'created_at', 'montant_transfert']
-            required_columns_operateur = ['N° de Compte2', 'Date', 'Débit']
-
-            if all(column in df_pending.columns for column in required_columns_pending) and all(column in df_operateur.columns for column in required_columns_operateur):
-                # Créer une nouvelle colonne "External Transaction Id" dans le DataFrame df_pending
-                df_pending['mobile_recepteur'] = df_pending['mobile_recepteur'].str[-3:]  # Récupérer les 3 derniers caractères
-                df_pending['created_at'] = df_pending['created_at']
-                df_pending['montant_transfert'] = df_pending['montant_transfert']
-                df_pending['External Transaction Id'] = df_pending['mobile_recepteur'] + df_pending['created_at'] + df_pending['montant_transfert']
-
-                # Créer une nouvelle colonne "External Transaction Id" dans le DataFrame df_operateur
-                df_operateur['N° de Compte2'] = df_operateur['N° de Compte2']
-                df_operateur['Date'] = df_operateur['Date']
-                df_operateur['Débit'] = df_operateur['Débit']
-                df_operateur['External Transaction Id'] = df_operateur['N° de Compte2'] + df_operateur['Date'] + df_operateur['Débit']
-
-                # Faire le matching des colonnes "External Transaction Id" entre les deux DataFrames
-                matched_df = pd.merge(df_pending, df_operateur[['External Transaction Id', 'ID TRANSACTION', 'SITE_ID']], on='External Transaction Id', how='left')
-
-                # Filtrer les transactions correspondantes
-                transactions_correspondantes = matched_df.dropna(subset=['ID TRANSACTION'])
-
-                # Filtrer les transactions en échec (non correspondantes)
-                transactions_en_echec = matched_df[matched_df['ID TRANSACTION'].isnull()]
-
-                # Enregistrer les transactions en échec dans un fichier Excel
-                excel_data_en_echec = io.BytesIO()
-                with pd.ExcelWriter(excel_data_en_echec, engine='xlsxwriter') as writer:
-                    transactions_en_echec.to_excel(writer, index=False)
-                excel_data_en_echec.seek(0)
-
-                # Générer le lien de téléchargement pour le fichier des transactions en échec
-                b64_en_echec = base64.b64encode(excel_data_en_echec.read()).decode()
-                href_en_echec = f'<a href="data:application/octet-stream;base64,{b64_en_echec}" download="transactions_en_echec.xlsx">Télécharger le fichier des transactions en échec</a>'
-
-                # Afficher le lien de téléchargement
-                st.markdown(href_en_echec, unsafe_allow_html=True)
-
-                # Afficher les résultats
-                st.subheader("Transactions Correspondantes")
-                st.write(transactions_correspondantes)
-            else:
+            # Charger les seules colonnes utiles des fichiers, puis rapprocher les pendings des transactions
+            # en échec (les colonnes requises sont vérifiées sur l'en-tête, avant la lecture des lignes)
+            try:
+                df_pending = fichier_pending.charger()
+                df_operateur = fichier_operateur.charger()
+                resultats = executer_en_tache('ORANGE_PENDING_PAYOUT PENDINGS', [fichier_pending, fichier_operateur], etapes.pendings_orange_payout, df_pending, df_operateur)
+            except etapes.ColonnesManquantesError:
                 st.warning("Les colonnes 'mobile_recepteur', 'created_at' et 'montant_transfert' doivent exister dans le DataFrame des pendings.")
                 st.warning("Les colonnes 'N° de Compte2', 'Date' et 'Débit' doivent exister dans le DataFrame des transactions en échec.")
+                return
+            if resultats is None:
+                return
+            transactions_correspondantes = resultats['correspondantes']
+            transactions_en_echec = resultats['en_echec']
+
+            # Enregistrer les transactions en échec dans un fichier Excel
+            proposer_telechargement(transactions_en_echec, 'transactions_en_echec.xlsx', "Télécharger le fichier des transactions en échec", 'ORANGE_PENDING_PAYOUT PENDINGS en_echec')
+
+            # Afficher les résultats
+            st.subheader("Transactions Correspondantes")
+            afficher(transactions_correspondantes)
         except Exception as e:
             st.error(f"Erreur lors du traitement des fichiers : {str(e)}")
             st.error(traceback.format_exc())
@@ -1288,7 +1105,8 @@ def mtn_payin_page():
         'NBSI_OP': import_and_match_transactions_payin,
         'NBSI_ECART': import_ecarts_and_en_echec_payin,
         'RECHERCHEV': recherchev,
-        'TCD': tcd_transactions_success_payin
+        'TCD': tcd_transactions_success_payin,
+        'TCD PÉRIODE': lambda: tcd_periode('MTN_PAYIN'),
     }
     
     # Affichage de la liste déroulante
@@ -1309,7 +1127,8 @@ def orange_payin_magma_page():
     # Dictionnaire associant chaque option à une fonction
     options = {
         'Option 1': import_and_match_transactions_orange_magma_payin,
-        'Option 2': tcd_transactions_success_magma_payin
+        'Option 2': tcd_transactions_success_magma_payin,
+        'Option 3': lambda: tcd_periode('ORANGE_MAGMA_PAYIN'),
     }
     
     # Affichage de la liste déroulante
@@ -1319,6 +1138,27 @@ def orange_payin_magma_page():
     option_function = options[selected_option]
     option_function()
     
+# Créer la page ORANGE PAYIN (relevés Orange_GN, Orange_CI, Orange_BF, Orange_ML, Orange_SN)
+def orange_payin_page():
+    st.title("ORANGE PAYIN")
+    st.header("Page ORANGE PAYIN")
+    st.subheader("Importation des fichiers et matching des transactions succès")
+    
+    # Dictionnaire associant chaque option à une fonction
+    options = {
+        'EXTERNAL ID': import_and_match_transactions_orange_payin,
+        'NBSI_OP': NBSI_transactions_orange_payin,
+        'NBSI_ECART': import_ecarts_and_en_echec_orange_payin,
+    }
+    
+    # Affichage de la liste déroulante
+    selected_option = st.selectbox('Sélectionnez une option', list(options.keys()), key=get_unique_key("selectbox"))
+    
+    # Appel de la fonction correspondante à l'option sélectionnée
+    option_function = options[selected_option]
+    option_function()
+
+
 # Créer la page ORANGE PAYIN
 def orange_money_payin_page():
     st.title("ORANGE MONEY PAYIN ")
@@ -1330,7 +1170,8 @@ def orange_money_payin_page():
         'Option 1': import_and_match_transactions_orange_money_payin,
         'Option 2': import_ecarts_and_en_echec_orange_money_payin,
         'Option 3': recherchev_orange_money_payin,
-        'Option 4': tcd_transactions_success_orange_money_payin
+        'Option 4': tcd_transactions_success_orange_money_payin,
+        'Option 5': lambda: tcd_periode('ORANGE_MONEY_PAYIN'),
     }
     
     # Affichage de la liste déroulante
@@ -1352,7 +1193,8 @@ def TOGO_money_payin_page():
         'Option 1': import_and_match_transactions_togo_money_payin,
         'Option 2': import_ecarts_and_en_echec_togo_money_payin,
         'Option 3': recherchev_togo_money_payin,
-        'Option 4': tcd_transactions_success_togo_money_payin
+        'Option 4': tcd_transactions_success_togo_money_payin,
+        'Option 5': lambda: tcd_periode('TOGO_MONEY_PAYIN'),
     }
     
     # Affichage de la liste déroulante
@@ -1393,12 +1235,44 @@ pages = {
     "ORANGE MAGMA PAYIN": orange_payin_magma_page,
     #"ORANGE PAYOUT": orange_payin_page
     "ORANGE MONEY PAYIN": orange_money_payin_page,
-    #"ORANGE PAYIN": orange_payout_page
+    "ORANGE PAYIN": orange_payin_page,
      "TOGO MONEY PAYIN": TOGO_money_payin_page,
     #"TOGO PAYIN": TOGO_payout_page
     "ORANGE PENDING PAYOUT": Orange_pending_payout_page,
 }
 
-# Afficher la page sélectionnée
+# Afficher la page sélectionnée, en mesurant chaque phase des étapes exécutées
 selected_page = st.sidebar.selectbox("Sélectionnez une page", list(pages.keys()))
-pages[selected_page]()
+mesurer_memoire = st.sidebar.checkbox("Mesurer le pic mémoire des étapes (plus lent)", key="mesurer_memoire")
+# Moteur des jointures et des TCD : 'auto' garde pandas pour les petits fichiers
+moteur_execution = st.sidebar.selectbox("Moteur d'exécution", [AUTO] + moteurs_disponibles(), key="moteur_execution")
+# Les étapes longues sont exécutées par les travailleurs du serveur : la page reste utilisable pendant le calcul
+st.sidebar.checkbox("Exécuter les étapes en arrière-plan", value=False, key="arriere_plan")
+nouvelle_relance()
+with collecter(selected_page, memoire=mesurer_memoire) as collecteur, utiliser_moteur(moteur_execution):
+    pages[selected_page]()
+
+# Afficher les mesures des étapes exécutées lors de cette relance
+if collecteur.mesures:
+    with st.expander("Instrumentation des étapes"):
+        st.dataframe(collecteur.tableau())
+        if st.checkbox("Ajouter ces mesures au journal des métriques", key="journal_metriques"):
+            collecteur.enregistrer()
+
+# Afficher les compteurs du cache des fichiers importés
+stats_cache = cache_fichiers.statistiques()
+with st.sidebar.expander("Cache des fichiers importés"):
+    st.write(f"Hits : {stats_cache['hits']} | Misses : {stats_cache['misses']} | Évictions : {stats_cache['evictions']}")
+    st.write(f"{stats_cache['entrees']} fichier(s), {stats_cache['taille_octets'] / 1024 ** 2:.1f} Mo / {stats_cache['budget_octets'] / 1024 ** 2:.0f} Mo")
+    if st.button("Vider le cache", key="vider_cache_fichiers"):
+        cache_fichiers.vider()
+
+# Afficher les résultats et fichiers conservés dans la session, repris par les étapes suivantes
+with st.sidebar.expander("Résultats conservés dans la session"):
+    st.dataframe(resume())
+    if st.button("Oublier les résultats de la session", key="vider_artefacts"):
+        vider()
+
+# Afficher les tâches de la session (la progression des tâches en cours est actualisée par suivre_tache)
+with st.sidebar.expander("Tâches en arrière-plan"):
+    st.dataframe(gestionnaire.tableau(identifiant_session()))
@@ -0,0 +1,145 @@
+"""
+Agrégats journaliers des transactions succès, pour les TCD sur une longue période.
+
+Le TCD d'une étape se calcule sur le fichier opérateur importé : un TCD trimestriel
+obligerait à réimporter et ré-agréger trois mois de relevés. À chaque TCD exécuté, les
+transactions sont donc aussi résumées par jour (nombre, somme, frais, montants minimum
+et maximum) dans une table conservée par opérateur. Le TCD d'une période quelconque se
+lit ensuite dans cette table, sans relire aucun relevé.
+
+Les fichiers opérateur étant exportés en cumul, un jour présent dans un nouveau relevé
+remplace le jour déjà enregistré (réimporter un fichier ne compte pas deux fois ses
+transactions) ; les jours absents du relevé sont conservés.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from dates import jour, jour_en_date, libelles_jours
+from montants import montants_entiers
+
+# Dossier des agrégats (modifiable par la variable d'environnement RAPPROCHEMENT_AGREGATS)
+DOSSIER_AGREGATS = os.environ.get('RAPPROCHEMENT_AGREGATS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agregats'))
+
+# Par opérateur : colonnes date et montant du fichier des transactions succès (celles des étapes TCD)
+SOURCES_AGREGATS = {
+    'MTN_PAYIN': {'date': 'Date', 'montant': 'Montant'},
+    'ORANGE_MAGMA_PAYIN': {'date': 'Created At', 'montant': 'Amount'},
+    'ORANGE_MONEY_PAYIN': {'date': 'Date', 'montant': 'Crédit'},
+    'TOGO_MONEY_PAYIN': {'date': 'Date', 'montant': 'Crédit'},
+}
+
+COLONNES_AGREGATS = ['nombre', 'somme', 'frais', 'minimum', 'maximum']
+
+# Libellés des colonnes du TCD sur période (mêmes noms que les TCD des étapes)
+LIBELLES_TCD = {
+    'nombre': 'Nombre de Montant',
+    'somme': 'Somme de Montant',
+    'frais': 'Somme des Frais',
+    'minimum': 'Montant minimum',
+    'maximum': 'Montant maximum',
+}
+
+
+def table_vide():
+    colonnes = {colonne: pd.Series(dtype='int64' if colonne == 'nombre' else 'float64') for colonne in COLONNES_AGREGATS}
+    return pd.DataFrame(colonnes, index=pd.Index([], dtype='int64', name='jour'))
+
+
+def cumul_journalier(df, operateur):
+    """
+    Résumé par jour (numéro de jour depuis 1970) des transactions d'un relevé : nombre, somme,
+    frais (somme - nombre, comme la colonne 'Somme des Frais' des TCD), montants min et max.
+    Les lignes sans date ou sans montant reconnus sont ignorées.
+    """
+    source = SOURCES_AGREGATS[operateur]
+    jours = jour(df[source['date']], operateur)
+    montants = montants_entiers(df[source['montant']])
+    valides = (jours.notna() & montants.notna()).to_numpy()
+    if not valides.any():
+        return table_vide()
+    groupes = montants[valides].astype('int64').groupby(jours[valides].astype('int64').to_numpy())
+    cumul = groupes.agg(['count', 'sum', 'min', 'max']).rename(columns={'count': 'nombre', 'sum': 'somme', 'min': 'minimum', 'max': 'maximum'})
+    cumul['frais'] = cumul['somme'] - cumul['nombre']
+    cumul.index.name = 'jour'
+    return cumul[COLONNES_AGREGATS]
+
+
+class AgregatsJournaliers:
+    """Tables d'agrégats journaliers par opérateur, enregistrées sur disque et gardées en mémoire."""
+
+    def __init__(self, dossier=DOSSIER_AGREGATS):
+        self.dossier = dossier
+        self._tables = {}
+        self._verrou = threading.Lock()
+
+    def _chemin(self, operateur):
+        return os.path.join(self.dossier, f'{operateur}.pkl')
+
+    def charger(self, operateur):
+        # La table lue est gardée en mémoire tant que le fichier n'a pas changé
+        chemin = self._chemin(operateur)
+        if not os.path.exists(chemin):
+            return table_vide()
+        modification = os.path.getmtime(chemin)
+        with self._verrou:
+            en_memoire = self._tables.get(operateur)
+            if en_memoire is None or en_memoire[0] != modification:
+                en_memoire = (modification, pd.read_pickle(chemin))
+                self._tables[operateur] = en_memoire
+        return en_memoire[1]
+
+    def enregistrer(self, operateur, table):
+        os.makedirs(self.dossier, exist_ok=True)
+        chemin = self._chemin(operateur)
+        temporaire = chemin + '.tmp'
+        table.to_pickle(temporaire)
+        os.replace(temporaire, chemin)
+        with self._verrou:
+            self._tables[operateur] = (os.path.getmtime(chemin), table)
+
+    def mettre_a_jour(self, operateur, df):
+        """
+        Ajoute à la table de l'opérateur les jours du relevé `df` (un jour déjà présent est remplacé).
+        Retourne {'jours_ajoutes', 'jours_remplaces', 'jours_total'}.
+        """
+        nouveaux = cumul_journalier(df, operateur)
+        table = self.charger(operateur)
+        remplaces = table.index.isin(nouveaux.index)
+        if len(nouveaux):
+            table = pd.concat([table[~remplaces], nouveaux]).sort_index() if len(table) else nouveaux
+            self.enregistrer(operateur, table)
+        return {'jours_ajoutes': len(nouveaux) - int(remplaces.sum()), 'jours_remplaces': int(remplaces.sum()), 'jours_total': len(table)}
+
+    def periode(self, operateur):
+        # Premier et dernier jour enregistrés (dates), ou (None, None)
+        table = self.charger(operateur)
+        if table.empty:
+            return None, None
+        bornes = jour_en_date([table.index.min(), table.index.max()])
+        return bornes[0].date(), bornes[1].date()
+
+    def tcd(self, operateur, debut=None, fin=None):
+        """
+        TCD par jour entre `debut` et `fin` inclus (dates, textes ISO ou None pour ne pas borner),
+        avec une ligne 'Total' : nombre, somme et frais additionnés, minimum et maximum de la période.
+        """
+        table = self.charger(operateur)
+        if debut is not None:
+            table = table[table.index >= jour(pd.Series([pd.Timestamp(debut)]))[0]]
+        if fin is not None:
+            table = table[table.index <= jour(pd.Series([pd.Timestamp(fin)]))[0]]
+        total = pd.DataFrame({
+            'nombre': [table['nombre'].sum()],
+            'somme': [table['somme'].sum()],
+            'frais': [table['frais'].sum()],
+            'minimum': [table['minimum'].min()],
+            'maximum': [table['maximum'].max()],
+        }, index=['Total'])
+        tcd = pd.concat([table.set_axis(libelles_jours(table.index), axis=0), total])
+        tcd.index.name = 'Date'
+        return tcd.rename(columns=LIBELLES_TCD)
+
+
+agregats = AgregatsJournaliers()
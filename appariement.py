@@ -0,0 +1,145 @@
+"""
+Appariement un à un des transactions d'une même clé, et contrôle de la taille d'une fusion.
+
+La fusion des transactions internes MTN se fait sur le téléphone (MSISDN = TELEPHONE) :
+un abonné qui a payé 40 fois a 40 lignes de chaque côté, et la fusion les combine toutes
+(1 600 lignes pour un seul client). La taille du résultat croît comme le carré du nombre
+de paiements par client, jusqu'à épuiser la mémoire en fin de mois.
+
+En appariement un à un, les occurrences d'une même clé sont numérotées de chaque côté,
+dans l'ordre de l'horodatage puis du montant : la k-ième transaction d'un client chez
+l'opérateur est rapprochée de sa k-ième transaction au Back Office. Chaque ligne n'est
+rapprochée qu'une fois et le résultat ne dépasse jamais le plus petit des deux fichiers.
+Les occurrences opérateur sans k-ième transaction au Back Office (le client a payé trois
+fois, le Back Office n'en a qu'une) ne sont pas rapprochées : ce sont des écarts.
+
+Avant toute fusion, sa taille est estimée à partir du nombre d'occurrences de chaque clé
+(sans rien fusionner) ; au-delà du budget de lignes, la fusion est refusée, ou seulement
+signalée, selon la politique de dépassement.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from dates import epoque
+from montants import montants_entiers
+from types_colonnes import harmoniser_cles
+
+UN_A_UN = 'un_a_un'
+TOUTES = 'toutes'
+
+LIBELLES_APPARIEMENT = {
+    UN_A_UN: 'Un à un (k-ième paiement du client avec sa k-ième transaction au Back Office)',
+    TOUTES: 'Toutes les combinaisons (chaque paiement avec toutes les transactions du client)',
+}
+
+REFUSER = 'refuser'
+AVERTIR = 'avertir'
+
+# Nombre maximal de lignes d'une fusion (modifiable par la variable d'environnement RAPPROCHEMENT_BUDGET_FUSION)
+BUDGET_LIGNES = int(os.environ.get('RAPPROCHEMENT_BUDGET_FUSION', 5_000_000))
+
+# Politique au-delà du budget : refuser la fusion ou la faire en la signalant (variable RAPPROCHEMENT_DEPASSEMENT)
+DEPASSEMENT = os.environ.get('RAPPROCHEMENT_DEPASSEMENT', REFUSER)
+
+COLONNE_OCCURRENCE = '_occurrence'
+
+
+class FusionTropVolumineuseError(ValueError):
+    """Levée quand la fusion estimée dépasse le budget de lignes et que la politique est de refuser."""
+
+
+def codes_communs(cle_gauche, cle_droite):
+    # Codes des deux colonnes clés par une seule table de hachage ; -1 pour une clé vide
+    cle_gauche, cle_droite = harmoniser_cles(pd.Series(cle_gauche), pd.Series(cle_droite))
+    codes = pd.factorize(pd.concat([cle_gauche, cle_droite], ignore_index=True))[0]
+    return codes[:len(cle_gauche)], codes[len(cle_gauche):]
+
+
+def estimer_fusion(cle_gauche, cle_droite, appariement=TOUTES):
+    """
+    Nombre de lignes d'une fusion interne sur la clé, calculé sur les seuls comptes d'occurrences :
+    somme, par clé, du produit des occurrences des deux côtés (ou du plus petit des deux en un à un).
+    """
+    codes_gauche, codes_droite = codes_communs(cle_gauche, cle_droite)
+    taille = int(max(codes_gauche.max(initial=-1), codes_droite.max(initial=-1))) + 1
+    comptes_gauche = np.bincount(codes_gauche[codes_gauche >= 0], minlength=taille).astype(np.int64)
+    comptes_droite = np.bincount(codes_droite[codes_droite >= 0], minlength=taille).astype(np.int64)
+    if appariement == UN_A_UN:
+        return int(np.minimum(comptes_gauche, comptes_droite).sum())
+    return int((comptes_gauche * comptes_droite).sum())
+
+
+def nombre(valeur):
+    return f"{valeur:,}".replace(',', ' ')
+
+
+def controler_fusion(libelle, lignes_gauche, lignes_droite, estimation, appariement=TOUTES, budget=None, depassement=None):
+    """
+    Compare la taille estimée de la fusion au budget. Au-delà, lève FusionTropVolumineuseError si la
+    politique est de refuser ; sinon retourne le rapport (DataFrame d'une ligne) avec 'dépassement' vrai.
+    """
+    budget = BUDGET_LIGNES if budget is None else budget
+    depassement = depassement or DEPASSEMENT
+    if estimation > budget and depassement == REFUSER:
+        conseil = " ; l'appariement un à un la ramène à au plus une ligne par transaction" if appariement != UN_A_UN else ''
+        raise FusionTropVolumineuseError(
+            f"La fusion {libelle} produirait environ {nombre(estimation)} lignes, au-delà du budget de {nombre(budget)} lignes "
+            f"({nombre(lignes_gauche)} et {nombre(lignes_droite)} lignes en entrée){conseil}"
+        )
+    return pd.DataFrame([{
+        'fusion': libelle,
+        'appariement': appariement,
+        'lignes gauche': lignes_gauche,
+        'lignes droite': lignes_droite,
+        'lignes estimées': estimation,
+        'budget': budget,
+        'dépassement': estimation > budget,
+    }])
+
+
+def en_flottants(serie):
+    # Critère de tri : valeurs vides placées après toutes les autres
+    return serie.to_numpy(dtype='float64', na_value=np.inf)
+
+
+def criteres_ordre(df, colonne_horodatage=None, colonne_montant=None, operateur=None):
+    # Horodatage (secondes) puis montant (unités mineures) ; une colonne absente du fichier est ignorée
+    criteres = []
+    if colonne_horodatage in df.columns:
+        criteres.append(en_flottants(epoque(df[colonne_horodatage], operateur)))
+    if colonne_montant in df.columns:
+        criteres.append(en_flottants(montants_entiers(df[colonne_montant])))
+    return criteres
+
+
+def numeros_occurrence(cle, criteres=()):
+    """
+    Rang (à partir de 0) de chaque ligne parmi les lignes de même clé, dans l'ordre des `criteres`
+    (tableaux de même longueur, le premier prioritaire) puis dans l'ordre du fichier.
+    """
+    codes = pd.factorize(pd.Series(cle))[0]
+    positions = np.arange(len(codes))
+    # np.lexsort trie sur la dernière clé d'abord : clé, puis critères dans l'ordre, puis position
+    ordre = np.lexsort([positions] + list(reversed(list(criteres))) + [codes])
+    codes_tries = codes[ordre]
+    debuts = np.ones(len(codes), dtype=bool)
+    debuts[1:] = codes_tries[1:] != codes_tries[:-1]
+    rangs_tries = positions - np.maximum.accumulate(np.where(debuts, positions, 0))
+    rangs = np.empty(len(codes), dtype=np.int64)
+    rangs[ordre] = rangs_tries
+    return rangs
+
+
+def occurrences_appariees(cle_gauche, cle_droite, criteres_gauche=()):
+    """
+    Masque des lignes de gauche qui trouvent une partenaire en appariement un à un : leur rang
+    parmi les lignes de même clé (voir numeros_occurrence) est inférieur au nombre de lignes
+    de droite de cette clé.
+    """
+    codes_gauche, codes_droite = codes_communs(cle_gauche, cle_droite)
+    taille = int(max(codes_gauche.max(initial=-1), codes_droite.max(initial=-1))) + 2
+    # Le code -1 (clé vide) pointe sur la dernière case, toujours à zéro
+    comptes_droite = np.bincount(codes_droite[codes_droite >= 0], minlength=taille)
+    return numeros_occurrence(cle_gauche, criteres_gauche) < comptes_droite[codes_gauche]
@@ -0,0 +1,156 @@
+"""
+Passage des résultats d'une étape à la suivante, en mémoire, dans la session.
+
+Sans cela, l'écart produit par NBSI_OP doit être téléchargé en xlsx puis réimporté dans
+NBSI_ECART, et encore une fois dans la RECHERCHEV : chaque passage paie l'écriture du
+classeur et sa ré-analyse complète, et perd les types des colonnes. Les résultats
+d'une étape, ainsi que les fichiers importés, sont donc conservés comme DataFrames dans
+la session Streamlit (artefacts). Une entrée d'étape qui peut en provenir (voir
+`Etape.sources` dans etapes.py) propose de les reprendre directement ; importer un
+fichier externe reste possible.
+
+Les DataFrames sont transmis par copie superficielle : avec le copy-on-write de pandas,
+aucune donnée n'est dupliquée, et une étape qui modifie son entrée ne modifie pas
+l'artefact.
+
+Chaque artefact garde sa provenance (signatures des entrées et paramètres de l'étape
+qui l'a produit, ou signature du fichier importé). Une page redépose ses résultats à
+chaque relance : à provenance égale, l'artefact déjà déposé est conservé, si bien que
+la signature d'une entrée reprise ne change pas et que l'étape suivante, exécutée en
+arrière-plan, n'est pas soumise de nouveau.
+"""
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+import etapes
+from lecture import lire_fichier, verifier_entete
+
+CLE_SESSION = 'artefacts'
+
+RESULTAT = 'résultat'
+FICHIER_IMPORTE = 'fichier importé'
+
+
+def colonnes_attendues(operateur, nom_etape, entree):
+    options = etapes.options_lecture(operateur, nom_etape, entree)
+    return list(dict.fromkeys(list(options['colonnes'] or []) + list(options['requises'] or [])))
+
+
+class Artefact:
+    """DataFrame produit (ou importé) par une étape, avec son origine."""
+
+    def __init__(self, df, operateur, nom_etape, nom, origine=RESULTAT, provenance=None):
+        self.df = df.copy(deep=False)
+        self.operateur = operateur
+        self.nom_etape = nom_etape
+        self.nom = nom
+        self.origine = origine
+        self.provenance = provenance
+        self.produit_le = datetime.now()
+
+    def description(self):
+        return f"{self.nom} de l'étape {self.nom_etape} ({self.origine}, {len(self.df)} ligne(s), {self.produit_le:%H:%M:%S})"
+
+    def convient(self, operateur, nom_etape, entree):
+        # L'artefact contient-il les colonnes lues ou vérifiées par l'étape pour cette entrée ?
+        return set(colonnes_attendues(operateur, nom_etape, entree)) <= set(self.df.columns)
+
+    def pour_entree(self, operateur, nom_etape, entree):
+        # Colonnes vérifiées comme à la lecture d'un fichier, puis seules les colonnes lues par l'étape
+        options = etapes.options_lecture(operateur, nom_etape, entree)
+        verifier_entete(self.df.columns, colonnes_attendues(operateur, nom_etape, entree), self.description(), entree)
+        df = self.df.copy(deep=False)
+        return df[list(options['colonnes'])] if options['colonnes'] is not None else df
+
+
+def artefacts():
+    return st.session_state.setdefault(CLE_SESSION, {})
+
+
+def deposer(operateur, nom_etape, nom, df, origine=RESULTAT, provenance=None):
+    # À provenance égale, le résultat est celui déjà déposé : l'artefact existant (et son heure de production) est gardé
+    existant = recuperer(operateur, nom_etape, nom)
+    if provenance is not None and existant is not None and existant.provenance == provenance:
+        return existant
+    artefact = Artefact(df, operateur, nom_etape, nom, origine, provenance)
+    artefacts()[(operateur, nom_etape, nom)] = artefact
+    return artefact
+
+
+def provenance_sources(sources, **parametres):
+    # Entrées (SourceEntree) et paramètres de l'étape qui produit les résultats
+    return (tuple(source.signature() for source in sources), repr(sorted(parametres.items())))
+
+
+def deposer_resultats(operateur, nom_etape, resultats, sources, **parametres):
+    """Dépose les résultats d'une étape exécutée sur `sources` avec `parametres`."""
+    provenance = provenance_sources(sources, **parametres)
+    for nom, df in resultats.items():
+        if isinstance(df, pd.DataFrame):
+            deposer(operateur, nom_etape, nom, df, provenance=provenance)
+
+
+def recuperer(operateur, nom_etape, nom):
+    return artefacts().get((operateur, nom_etape, nom))
+
+
+def vider():
+    artefacts().clear()
+
+
+def resume():
+    # Artefacts conservés dans la session, pour l'affichage
+    return pd.DataFrame([
+        {'Opérateur': artefact.operateur, 'Étape': artefact.nom_etape, 'Nom': artefact.nom, 'Origine': artefact.origine,
+         'Lignes': len(artefact.df), 'Produit à': f"{artefact.produit_le:%H:%M:%S}"}
+        for artefact in artefacts().values()
+    ])
+
+
+class SourceEntree:
+    """
+    Entrée choisie pour une étape : artefact de la session ou fichier importé. `charger()`
+    retourne le DataFrame (à appeler dans le `try` de la page, comme `lire_fichier`).
+    """
+
+    def __init__(self, operateur, nom_etape, entree, fichier=None, artefact=None):
+        self.operateur = operateur
+        self.nom_etape = nom_etape
+        self.entree = entree
+        self.fichier = fichier
+        self.artefact = artefact
+
+    def signature(self):
+        # Identifie l'entrée sans la lire : artefact (et sa provenance) ou fichier importé
+        if self.artefact is not None:
+            provenance = self.artefact.provenance if self.artefact.provenance is not None else self.artefact.produit_le.isoformat()
+            return (self.artefact.operateur, self.artefact.nom_etape, self.artefact.nom, provenance)
+        return (getattr(self.fichier, 'file_id', None), getattr(self.fichier, 'name', None), getattr(self.fichier, 'size', None))
+
+    def charger(self):
+        if self.artefact is not None:
+            return self.artefact.pour_entree(self.operateur, self.nom_etape, self.entree)
+        df = lire_fichier(self.fichier, **etapes.options_lecture(self.operateur, self.nom_etape, self.entree))
+        # Le fichier importé peut être repris par les étapes suivantes
+        deposer(self.operateur, self.nom_etape, self.entree, df, FICHIER_IMPORTE, provenance=self.signature())
+        return df
+
+
+def choisir_entree(operateur, nom_etape, entree, libelle, cle):
+    """
+    Propose, pour l'entrée `entree` de l'étape, l'artefact de la session dont elle peut provenir
+    puis, à défaut ou au choix de l'utilisateur, l'import d'un fichier. Retourne une SourceEntree,
+    ou None tant qu'aucun fichier n'est importé.
+    """
+    source = etapes.ETAPES[operateur][nom_etape].sources.get(entree)
+    artefact = recuperer(operateur, *source) if source is not None else None
+    if artefact is not None and artefact.convient(operateur, nom_etape, entree):
+        choix = st.radio(libelle, [f"Reprendre : {artefact.description()}", "Importer un fichier"], key=f"source_{cle}", horizontal=True)
+        if not choix.startswith("Importer"):
+            return SourceEntree(operateur, nom_etape, entree, artefact=artefact)
+    fichier = st.file_uploader(libelle, type=['xlsx', '.csv'], key=cle)
+    if fichier is None:
+        return None
+    return SourceEntree(operateur, nom_etape, entree, fichier=fichier)
@@ -0,0 +1,100 @@
+"""
+Benchmark de l'étape NBSI_ECART de la page ORANGE PAYIN (import_ecarts_and_en_echec_orange_payin) :
+recherche de SITE_ID / ID TRANSACTION pour chaque écart dans le fichier des transactions en échec.
+
+Compare l'ancienne boucle `iterrows` (un filtrage complet du fichier en échec par écart)
+à la recherche par index de hachage (recherche.IndexRecherche).
+
+Utilisation :
+    python benchmarks/bench_ecarts_orange.py
+    python benchmarks/bench_ecarts_orange.py --tailles 10000 100000 1000000
+
+Au-delà de --max-boucle lignes, la boucle n'est chronométrée que sur un
+échantillon d'écarts et son temps total est extrapolé (marqué « estimé »).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recherche import IndexRecherche  # noqa: E402
+
+
+def generer_fichiers(nombre_lignes, taux_correspondance=0.8, graine=0):
+    # Fichier des écarts et fichier des transactions en échec de même taille
+    rng = np.random.default_rng(graine)
+    cles_echec = np.array([f"07{n:08d}_2023-06-{1 + n % 28:02d}_{100 * (1 + n % 500)}" for n in range(nombre_lignes)], dtype=object)
+    fichier_en_échec = pd.DataFrame({
+        'External Transaction Id': cles_echec,
+        'SITE_ID': rng.integers(100000, 999999, nombre_lignes),
+        'ID TRANSACTION': [f"CP{n:010d}" for n in range(nombre_lignes)],
+    })
+    trouve = rng.random(nombre_lignes) < taux_correspondance
+    cles_ecart = np.where(trouve, rng.permutation(cles_echec), 'absent_' + pd.Series(range(nombre_lignes)).astype(str).to_numpy())
+    fichier_écart = pd.DataFrame({'External Transaction Id': cles_ecart})
+    return fichier_écart, fichier_en_échec
+
+
+def matching_boucle(fichier_écart, fichier_en_échec):
+    # Reproduction de l'ancienne implémentation (iterrows + filtrage complet par ligne)
+    site_ids = []
+    id_transactions = []
+    for index, row in fichier_écart.iterrows():
+        reference = row['External Transaction Id']
+        match = fichier_en_échec[fichier_en_échec['External Transaction Id'] == reference]
+        if not match.empty:
+            site_ids.append(match['SITE_ID'].values[0])
+            id_transactions.append(match['ID TRANSACTION'].values[0])
+        else:
+            site_ids.append('')
+            id_transactions.append('')
+    resultat = fichier_écart.copy()
+    resultat['SITE_ID'] = site_ids
+    resultat['ID TRANSACTION'] = id_transactions
+    return resultat
+
+
+def matching_index(fichier_écart, fichier_en_échec):
+    index_en_échec = IndexRecherche(fichier_en_échec, 'External Transaction Id')
+    return index_en_échec.remplir(fichier_écart.copy(), 'External Transaction Id', ['SITE_ID', 'ID TRANSACTION'])
+
+
+def chronometrer(fonction, *args):
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    return time.perf_counter() - debut, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-boucle', type=int, default=10_000, help="taille maximale chronométrée entièrement pour la boucle")
+    parser.add_argument('--echantillon', type=int, default=200, help="nombre d'écarts chronométrés pour extrapoler la boucle")
+    args = parser.parse_args()
+
+    print(f"{'lignes':>10} | {'boucle iterrows (s)':>22} | {'index (s)':>10} | {'gain':>8}")
+    for taille in args.tailles:
+        fichier_écart, fichier_en_échec = generer_fichiers(taille)
+        temps_index, resultat_index = chronometrer(matching_index, fichier_écart, fichier_en_échec)
+
+        if taille <= args.max_boucle:
+            temps_boucle, resultat_boucle = chronometrer(matching_boucle, fichier_écart, fichier_en_échec)
+            # Les deux implémentations doivent produire les mêmes correspondances
+            pd.testing.assert_frame_equal(resultat_boucle.astype(str), resultat_index.astype(str))
+            libelle_boucle = f"{temps_boucle:.2f}"
+        else:
+            echantillon = fichier_écart.head(args.echantillon)
+            temps_echantillon, _ = chronometrer(matching_boucle, echantillon, fichier_en_échec)
+            temps_boucle = temps_echantillon * taille / len(echantillon)
+            libelle_boucle = f"{temps_boucle:.0f} (estimé)"
+
+        print(f"{taille:>10} | {libelle_boucle:>22} | {temps_index:>10.3f} | {temps_boucle / temps_index:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
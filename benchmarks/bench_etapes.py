@@ -0,0 +1,141 @@
+"""
+Benchmark de toutes les étapes de rapprochement sur des relevés synthétiques (generateur.py).
+
+Chaque étape de etapes.ETAPES est chronométrée puis exécutée une seconde fois sous
+tracemalloc pour mesurer le pic de mémoire allouée. Les résultats sont ajoutés à
+benchmarks/resultats.csv (date, commit, opérateur, étape, lignes, durée, mémoire) et
+comparés à la mesure précédente de la même étape à la même taille : un ralentissement
+au-delà de --seuil est signalé comme régression.
+
+Utilisation :
+    python benchmarks/bench_etapes.py
+    python benchmarks/bench_etapes.py --tailles 10000 100000 --operateurs MTN_PAYIN TOGO_MONEY_PAYIN
+    python benchmarks/bench_etapes.py --etapes NBSI_OP RECHERCHEV --sans-memoire
+    python benchmarks/bench_etapes.py --moteur duckdb --tailles 1000000
+
+La boucle iterrows historique de l'étape NBSI_ECART Orange est comparée à part dans
+bench_ecarts_orange.py ; ici l'étape ORANGE_PAYIN NBSI_ECART mesure la version actuelle.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from etapes import ETAPES, Etape  # noqa: E402
+from execution import AUTO, MOTEURS  # noqa: E402
+from generateur import generer_jeu  # noqa: E402
+from recherche import IndexRecherche  # noqa: E402
+
+FICHIER_RESULTATS = os.path.join(RACINE, 'benchmarks', 'resultats.csv')
+
+
+def nbsi_ecart_orange_payin(df_ecarts, df_en_echec):
+    # Étape de la page Orange payin (Hello.py), qui n'a pas d'équivalent dans etapes.py
+    df_ecarts['External Transaction Id'] = df_ecarts['Receiver'].astype(str) + df_ecarts['Created At'].astype(str) + df_ecarts['Amount'].astype(str)
+    df_en_echec['External Transaction Id'] = df_en_echec['TELEPHONE'].astype(str) + df_en_echec['DATE PAIEMENT'].astype(str) + df_en_echec['MONTANT'].astype(str)
+    index_en_echec = IndexRecherche(df_en_echec, 'External Transaction Id')
+    return {'resultat': index_en_echec.remplir(df_ecarts, 'External Transaction Id', ['SITE_ID', 'ID TRANSACTION'])}
+
+
+ETAPES_BENCHMARK = dict(ETAPES, ORANGE_PAYIN={'NBSI_ECART': Etape(nbsi_ecart_orange_payin, ['ecarts', 'en_echec'], {'resultat': 'ecarts.xlsx'})})
+
+
+def commit_courant():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def entrees_etape(etape, jeu):
+    # Chaque exécution reçoit ses propres copies : les étapes modifient parfois leurs entrées
+    return {entree: jeu[entree].copy() for entree in etape.entrees}
+
+
+def mesurer(etape, jeu, avec_memoire=True):
+    dataframes = entrees_etape(etape, jeu)
+    debut = time.perf_counter()
+    resultats = etape.executer(**dataframes)
+    duree = time.perf_counter() - debut
+    lignes_resultat = sum(len(df) for df in resultats.values())
+    del resultats
+
+    pic = None
+    if avec_memoire:
+        dataframes = entrees_etape(etape, jeu)
+        tracemalloc.start()
+        etape.executer(**dataframes)
+        pic = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return duree, pic, lignes_resultat
+
+
+def mesures_precedentes(chemin):
+    if not os.path.exists(chemin):
+        return {}
+    historique = pd.read_csv(chemin)
+    derniere = historique.groupby(['operateur', 'etape', 'lignes']).tail(1)
+    return {(ligne.operateur, ligne.etape, ligne.lignes): ligne.duree_s for ligne in derniere.itertuples()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--operateurs', nargs='+', choices=sorted(ETAPES_BENCHMARK), default=sorted(ETAPES_BENCHMARK))
+    parser.add_argument('--etapes', nargs='+', help="limiter aux étapes données (ex. NBSI_OP TCD)")
+    parser.add_argument('--sans-memoire', action='store_true', help="ne pas mesurer le pic mémoire (tracemalloc ralentit l'exécution)")
+    parser.add_argument('--resultats', default=FICHIER_RESULTATS, help="fichier CSV auquel ajouter les mesures")
+    parser.add_argument('--seuil', type=float, default=1.25, help="rapport de durée au-delà duquel une régression est signalée")
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--moteur', choices=[AUTO] + MOTEURS, default=AUTO, help="moteur des jointures et des TCD (voir execution.py)")
+    args = parser.parse_args()
+    os.environ['RAPPROCHEMENT_MOTEUR'] = args.moteur
+
+    precedentes = mesures_precedentes(args.resultats)
+    horodatage = datetime.now().isoformat(timespec='seconds')
+    commit = commit_courant()
+    mesures = []
+
+    print(f"{'opérateur':<22} {'étape':<11} {'lignes':>9} | {'durée (s)':>9} | {'pic (Mo)':>9} | {'vs précédent':>12}")
+    for taille in args.tailles:
+        for operateur in args.operateurs:
+            jeu = generer_jeu(operateur, taille, graine=args.graine)
+            for nom_etape, etape in ETAPES_BENCHMARK[operateur].items():
+                if args.etapes and nom_etape not in args.etapes:
+                    continue
+                duree, pic, lignes_resultat = mesurer(etape, jeu, not args.sans_memoire)
+
+                comparaison = ''
+                precedente = precedentes.get((operateur, nom_etape, taille))
+                if precedente:
+                    rapport = duree / precedente
+                    comparaison = f"{rapport:.2f}x" + (' RÉGRESSION' if rapport > args.seuil else '')
+                libelle_pic = f"{pic:9.1f}" if pic is not None else f"{'-':>9}"
+                print(f"{operateur:<22} {nom_etape:<11} {taille:>9} | {duree:>9.3f} | {libelle_pic} | {comparaison:>12}")
+
+                mesures.append({
+                    'date': horodatage,
+                    'commit': commit,
+                    'operateur': operateur,
+                    'etape': nom_etape,
+                    'lignes': taille,
+                    'lignes_resultat': lignes_resultat,
+                    'duree_s': round(duree, 4),
+                    'memoire_pic_mo': round(pic, 1) if pic is not None else None,
+                })
+
+    if mesures:
+        pd.DataFrame(mesures).to_csv(args.resultats, mode='a', header=not os.path.exists(args.resultats), index=False)
+        print(f"{len(mesures)} mesure(s) ajoutée(s) à {args.resultats}")
+
+
+if __name__ == '__main__':
+    main()
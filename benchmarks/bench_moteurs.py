@@ -0,0 +1,100 @@
+"""
+Comparaison des moteurs d'exécution (pandas, DuckDB, Polars) sur une jointure et un TCD.
+
+Pour chaque moteur installé, la jointure MSISDN = TELEPHONE de NBSI_OP MTN et l'agrégation
+nombre / somme du TCD sont chronométrées partie par partie : codage des clés (pandas),
+appariement ou regroupement (moteur), assemblage du résultat (pandas). Le résultat de
+chaque moteur est comparé à celui de pandas. Les parties faites par pandas ne profitent
+pas des cœurs supplémentaires : le gain total du moteur est à lire sur cette machine.
+
+Utilisation :
+    python benchmarks/bench_moteurs.py
+    python benchmarks/bench_moteurs.py --tailles 100000 1000000 --repetitions 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from execution import NOMBRE_SOMME, PAIRES, PANDAS, assembler, codes_jointure, moteurs_disponibles  # noqa: E402
+from generateur import generer_jeu  # noqa: E402
+
+
+def chronometrer(fonction, repetitions):
+    # Meilleure durée sur `repetitions` exécutions, et le résultat de la dernière
+    meilleure = None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        duree = time.perf_counter() - debut
+        meilleure = duree if meilleure is None else min(meilleure, duree)
+    return meilleure, resultat
+
+
+def jointure(moteur, gauche, droite, repetitions):
+    # Durées (codage, appariement, assemblage) et résultat de la jointure interne MSISDN = TELEPHONE
+    if moteur == PANDAS:
+        duree, fusion = chronometrer(lambda: pd.merge(gauche, droite, left_on='MSISDN', right_on='TELEPHONE'), repetitions)
+        return {'codage': None, 'moteur': duree, 'assemblage': None}, fusion
+    codage, (codes_gauche, codes_droite) = chronometrer(lambda: codes_jointure(gauche, droite, ['MSISDN'], ['TELEPHONE']), repetitions)
+    appariement, (positions_gauche, positions_droite) = chronometrer(lambda: PAIRES[moteur](codes_gauche, codes_droite, 'inner'), repetitions)
+    assemblage, fusion = chronometrer(
+        lambda: assembler(gauche, droite, positions_gauche, positions_droite, ['MSISDN'], ['TELEPHONE']), repetitions)
+    return {'codage': codage, 'moteur': appariement, 'assemblage': assemblage}, fusion
+
+
+def agregation(moteur, cles, valeurs, repetitions):
+    # Durées (codage, regroupement, assemblage) et résultat du nombre / somme par date
+    if moteur == PANDAS:
+        duree, tcd = chronometrer(lambda: valeurs.groupby(cles).agg(['count', 'sum']), repetitions)
+        return {'codage': None, 'moteur': duree, 'assemblage': None}, tcd
+    codage, (codes, distinctes) = chronometrer(lambda: pd.factorize(cles, sort=True), repetitions)
+    regroupement, (codes_groupes, nombres, sommes) = chronometrer(
+        lambda: NOMBRE_SOMME[moteur](codes, valeurs.to_numpy(dtype=np.int64)), repetitions)
+    assemblage, tcd = chronometrer(lambda: pd.DataFrame(
+        {'count': nombres, 'sum': sommes}, index=pd.Index(distinctes).take(codes_groupes).rename(cles.name)), repetitions)
+    return {'codage': codage, 'moteur': regroupement, 'assemblage': assemblage}, tcd
+
+
+def format_duree(duree):
+    return f"{duree:>10.3f}" if duree is not None else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tailles', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    moteurs = moteurs_disponibles()
+    print(f"{os.cpu_count()} cœur(s) ; moteurs installés : {', '.join(moteurs)}")
+    print(f"{'opération':<10} {'lignes':>9} {'moteur':<7} | {'codage':>10} | {'moteur':>10} | {'assemblage':>10} | {'total':>10} | {'vs pandas':>9}")
+    for taille in args.tailles:
+        jeu = generer_jeu('MTN_PAYIN', taille, graine=args.graine)
+        gauche, droite = jeu['operateur'], jeu['back_office']
+        cles = pd.to_datetime(gauche['StartDateTime']).dt.normalize().rename('Date')
+        valeurs = gauche['Montant'].astype('int64')
+        for operation, executer in (('jointure', lambda moteur: jointure(moteur, gauche, droite, args.repetitions)),
+                                    ('TCD', lambda moteur: agregation(moteur, cles, valeurs, args.repetitions))):
+            reference = None
+            for moteur in moteurs:
+                durees, resultat = executer(moteur)
+                total = sum(duree for duree in durees.values() if duree is not None)
+                if moteur == PANDAS:
+                    reference, total_pandas = resultat, total
+                else:
+                    pd.testing.assert_frame_equal(resultat.reset_index(drop=operation == 'jointure'),
+                                                  reference.reset_index(drop=operation == 'jointure'), check_dtype=False)
+                print(f"{operation:<10} {taille:>9} {moteur:<7} | {format_duree(durees['codage'])} | {format_duree(durees['moteur'])} | "
+                      f"{format_duree(durees['assemblage'])} | {total:>10.3f} | {total_pandas / total:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Générateur de relevés synthétiques pour chaque opérateur, aux colonnes attendues par les étapes.
+
+Pour un opérateur et un nombre de lignes opérateur, produit les fichiers d'entrée des étapes
+(mêmes noms que dans etapes.ETAPES : operateur, back_office, ecarts, en_echec, pending) :
+  - `taux_correspondance` : part des transactions opérateur présentes en succès au Back Office,
+    les autres formant les écarts ;
+  - `taux_echec` : part des écarts retrouvés dans le fichier des transactions en échec.
+
+Utilisation :
+    python benchmarks/generateur.py MTN_PAYIN 100000 --sortie donnees/
+    python cli.py MTN_PAYIN NBSI_OP --entree operateur=donnees/operateur.csv --entree back_office=donnees/back_office.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+DEBUT_PERIODE = pd.Timestamp('2023-06-01')
+JOURS_PERIODE = 28
+
+
+def telephones(rng, nombre, prefixe='07'):
+    # Numéros tirés dans un parc de la taille du fichier : un client a parfois plusieurs transactions
+    return prefixe + pd.Series(rng.integers(0, max(nombre, 1), nombre)).astype(str).str.zfill(8)
+
+
+def horodatages(rng, nombre):
+    return pd.Series(DEBUT_PERIODE + pd.to_timedelta(rng.integers(0, JOURS_PERIODE * 86400, nombre), unit='s'))
+
+
+def montants(rng, nombre):
+    return rng.integers(1, 500, nombre) * 100
+
+
+def repartir(rng, nombre, taux_correspondance, taux_echec):
+    # Masques des transactions présentes au Back Office, et des écarts retrouvés en échec
+    correspond = rng.random(nombre) < taux_correspondance
+    en_echec = ~correspond & (rng.random(nombre) < taux_echec)
+    return correspond, en_echec
+
+
+def melanger(rng, df):
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+
+def fichier_en_echec(rng, telephone, instant, montant, reference, nombre_bruit):
+    """
+    Transactions en échec chez CinetPay : les écarts retrouvés (mêmes téléphone, date, heure, montant
+    et référence en CUSTOM 6) plus `nombre_bruit` échecs sans rapport avec les écarts.
+    """
+    telephone = pd.concat([pd.Series(telephone), telephones(rng, nombre_bruit, prefixe='05')], ignore_index=True)
+    instant = pd.concat([pd.Series(instant), horodatages(rng, nombre_bruit)], ignore_index=True)
+    montant = np.concatenate([np.asarray(montant), montants(rng, nombre_bruit)])
+    reference = pd.concat([pd.Series(reference, dtype=object), 'BRUIT' + pd.Series(np.arange(nombre_bruit)).astype(str)], ignore_index=True)
+    nombre = len(telephone)
+    df = pd.DataFrame({
+        'ID TRANSACTION': 'CP' + pd.Series(np.arange(nombre)).astype(str).str.zfill(10),
+        'SITE_ID': rng.integers(100000, 999999, nombre),
+        'TELEPHONE': telephone,
+        'TÉLÉPHONE': telephone,
+        'MONTANT': montant,
+        'CREATION': instant.dt.normalize(),
+        'DATE PAIEMENT': instant.dt.normalize(),
+        'heure': instant.dt.strftime('%H:%M:%S'),
+        'HEURE': instant.dt.strftime('%H:%M:%S'),
+        'CUSTOM 6': reference,
+        'External Transaction Id': reference,
+        'CPM_RESULT': rng.choice(['NA', 'REFUSED', 'INSUFFICIENT_BALANCE'], nombre),
+    })
+    df['SITE ID'] = df['SITE_ID']
+    return melanger(rng, df)
+
+
+def generer_mtn_payin(rng, nombre, taux_correspondance, taux_echec):
+    instant = horodatages(rng, nombre)
+    telephone = telephones(rng, nombre)
+    montant = montants(rng, nombre)
+    identifiants = pd.Series(100_000_000 + np.arange(nombre))
+    operateur = pd.DataFrame({
+        'TransactionId': identifiants.map('{:,}'.format),
+        'MSISDN': telephone,
+        'ResponseMessage': np.where(rng.random(nombre) < 0.95, 'Successfully Processed Transaction', 'Failed'),
+        'StartDateTime': instant,
+        'Date': instant.dt.normalize(),
+        'HEURE': instant.dt.strftime('%H:%M:%S'),
+        'Montant': montant,
+        'External Transaction Id': instant.astype(str) + pd.Series(montant).astype(str),
+    })
+    correspond, echec = repartir(rng, nombre, taux_correspondance, taux_echec)
+
+    back_office = pd.DataFrame({
+        'ID PAIEMENT': 'BO' + identifiants[correspond].astype(str),
+        'TELEPHONE': telephone[correspond],
+        'MONTANT': montant[correspond],
+        'CREATION': instant[correspond],
+        'ETAT TRANSACTION': 'SUCCES',
+    })
+    ecarts = operateur[~correspond].rename(columns={'Montant': 'MONTANT'})
+    en_echec = fichier_en_echec(rng, telephone[echec], instant[echec], montant[echec], operateur['External Transaction Id'][echec], nombre // 10)
+    return {'operateur': operateur, 'back_office': melanger(rng, back_office), 'ecarts': ecarts.reset_index(drop=True), 'en_echec': en_echec}
+
+
+def generer_orange_magma_payin(rng, nombre, taux_correspondance, taux_echec):
+    identifiants = 'MP' + pd.Series(np.arange(nombre)).astype(str).str.zfill(12)
+    operateur = pd.DataFrame({'TransactionID': identifiants, 'Created At': horodatages(rng, nombre), 'Amount': montants(rng, nombre)})
+    correspond, _ = repartir(rng, nombre, taux_correspondance, taux_echec)
+    back_office = pd.DataFrame({
+        'slug': identifiants[correspond],
+        'Traitant': np.where(rng.random(int(correspond.sum())) < 0.98, 'Orange CI (API MAGMA)', 'Orange CI (USSD)'),
+    })
+    return {'operateur': operateur, 'back_office': melanger(rng, back_office)}
+
+
+def generer_orange_money_payin(rng, nombre, taux_correspondance, taux_echec):
+    instant = horodatages(rng, nombre)
+    telephone = telephones(rng, nombre)
+    montant = montants(rng, nombre)
+    reference = 'PP' + pd.Series(np.arange(nombre)).astype(str).str.zfill(10)
+    operateur = pd.DataFrame({
+        'Référence': reference,
+        'N° de Compte2': telephone,
+        'Crédit': montant,
+        'Date': instant.dt.normalize(),
+        'Heure': instant.dt.strftime('%H:%M:%S'),
+    })
+    correspond, echec = repartir(rng, nombre, taux_correspondance, taux_echec)
+    back_office = pd.DataFrame({'ID PAIEMENT': reference[correspond], 'ETAT TRANSACTION': 'SUCCES'})
+    en_echec = fichier_en_echec(rng, telephone[echec], instant[echec], montant[echec], reference[echec], nombre // 10)
+    return {'operateur': operateur, 'back_office': melanger(rng, back_office), 'ecarts': operateur[~correspond].reset_index(drop=True), 'en_echec': en_echec}
+
+
+def generer_togo_money_payin(rng, nombre, taux_correspondance, taux_echec):
+    instant = horodatages(rng, nombre)
+    telephone = telephones(rng, nombre, prefixe='90')
+    montant = montants(rng, nombre)
+    identifiants = pd.Series(5_000_000 + np.arange(nombre))
+    operateur = pd.DataFrame({
+        'Transaction Id': identifiants,
+        'Type': np.where(rng.random(nombre) < 0.9, 'sell', 'buy'),
+        'State': np.where(rng.random(nombre) < 0.95, 'Completed', 'Failed'),
+        'Amount': montant.astype(float),
+        'Crédit': montant,
+        'Initiator': telephone,
+        'Date': instant,
+        'heure': instant.dt.strftime('%H:%M:%S'),
+    })
+    correspond, echec = repartir(rng, nombre, taux_correspondance, taux_echec)
+    back_office = pd.DataFrame({'ID PAIEMENT': identifiants[correspond], 'ETAT TRANSACTION': 'SUCCES'})
+    en_echec = fichier_en_echec(rng, telephone[echec], instant[echec], montant[echec], identifiants[echec].astype(str), nombre // 10)
+    # Le fichier en échec TMoney porte la date et l'heure complètes de la transaction
+    en_echec['CREATION'] = pd.to_datetime(en_echec['CREATION'].dt.strftime('%Y-%m-%d ') + en_echec['heure'])
+    return {'operateur': operateur, 'back_office': melanger(rng, back_office), 'ecarts': operateur[~correspond].reset_index(drop=True), 'en_echec': en_echec}
+
+
+def generer_orange_pending_payout(rng, nombre, taux_correspondance, taux_echec):
+    # Les pendings retrouvés dans le relevé opérateur partagent numéro (3 derniers chiffres), date et montant
+    telephone = telephones(rng, nombre)
+    date = horodatages(rng, nombre).dt.strftime('%Y-%m-%d')
+    montant = pd.Series(montants(rng, nombre)).astype(str)
+    pending = pd.DataFrame({'mobile_recepteur': telephone, 'created_at': date, 'montant_transfert': montant})
+    correspond, _ = repartir(rng, nombre, taux_correspondance, taux_echec)
+    retrouves = int(correspond.sum())
+    operateur = pd.DataFrame({
+        'N° de Compte2': telephone[correspond].str[-3:],
+        'Date': date[correspond],
+        'Débit': montant[correspond],
+        'ID TRANSACTION': ('CP' + pd.Series(np.arange(retrouves)).astype(str).str.zfill(10)).to_numpy(),
+        'SITE_ID': rng.integers(100000, 999999, retrouves),
+    })
+    return {'pending': pending, 'operateur': melanger(rng, operateur)}
+
+
+def generer_orange_payin(rng, nombre, taux_correspondance, taux_echec):
+    # Schéma de la page Orange payin (écarts Receiver / Created At / Amount, échecs TELEPHONE / DATE PAIEMENT / MONTANT)
+    instant = horodatages(rng, nombre)
+    telephone = telephones(rng, nombre)
+    montant = montants(rng, nombre)
+    operateur = pd.DataFrame({
+        'Receiver': telephone,
+        'Created At': instant.dt.normalize(),
+        'Amount': montant,
+        'Heure': instant.dt.strftime('%H:%M:%S'),
+        'Operator': rng.choice(['Orange_CI', 'Orange_SN', 'Orange_ML', 'Orange_CM'], nombre),
+    })
+    correspond, echec = repartir(rng, nombre, taux_correspondance, taux_echec)
+    cle = telephone + instant.dt.normalize().astype(str) + pd.Series(montant).astype(str)
+    en_echec = fichier_en_echec(rng, telephone[echec], instant[echec], montant[echec], cle[echec], nombre // 10)
+    return {'operateur': operateur, 'ecarts': operateur[~correspond].reset_index(drop=True), 'en_echec': en_echec}
+
+
+GENERATEURS = {
+    'MTN_PAYIN': generer_mtn_payin,
+    'ORANGE_MAGMA_PAYIN': generer_orange_magma_payin,
+    'ORANGE_MONEY_PAYIN': generer_orange_money_payin,
+    'TOGO_MONEY_PAYIN': generer_togo_money_payin,
+    'ORANGE_PENDING_PAYOUT': generer_orange_pending_payout,
+    'ORANGE_PAYIN': generer_orange_payin,
+}
+
+
+def generer_jeu(operateur, nombre_lignes, taux_correspondance=0.9, taux_echec=0.6, graine=0):
+    """Retourne {nom de l'entrée: DataFrame} pour l'opérateur ; même graine, mêmes fichiers."""
+    rng = np.random.default_rng(graine)
+    return GENERATEURS[operateur](rng, nombre_lignes, taux_correspondance, taux_echec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('operateur', choices=sorted(GENERATEURS))
+    parser.add_argument('lignes', type=int, help="nombre de transactions dans le fichier opérateur")
+    parser.add_argument('--sortie', default='.', help="dossier des fichiers CSV produits")
+    parser.add_argument('--taux-correspondance', type=float, default=0.9)
+    parser.add_argument('--taux-echec', type=float, default=0.6)
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    jeu = generer_jeu(args.operateur, args.lignes, args.taux_correspondance, args.taux_echec, args.graine)
+    os.makedirs(args.sortie, exist_ok=True)
+    for nom, df in jeu.items():
+        chemin = os.path.join(args.sortie, f"{nom}.csv")
+        df.to_csv(chemin, index=False)
+        print(f"{chemin} : {len(df)} ligne(s)")
+
+
+if __name__ == '__main__':
+    main()
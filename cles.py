@@ -0,0 +1,201 @@
+"""
+Construction des clés de rapprochement composites ("External Transaction Id").
+
+Une clé est décrite de façon déclarative par une SpecCle : une liste de branches,
+chacune donnant les colonnes à concaténer et, éventuellement, la condition sur
+laquelle elle s'applique (par exemple « Operator dans Orange_* »). Les conditions
+sont évaluées comme des masques sur toute la colonne et les concaténations
+sont faites avec les opérations de chaînes vectorisées de pandas, au lieu d'un
+`DataFrame.apply(..., axis=1)` qui construit un objet et une f-string par ligne.
+"""
+import numpy as np
+import pandas as pd
+
+from dates import canoniser_dates, texte_canonique
+from execution import fusionner
+
+
+class BrancheCle:
+    """
+    Une façon de construire la clé : les `colonnes` à concaténer, appliquée aux lignes
+    où `si=(colonne, valeurs)` est vérifié, ou à celles où `sauf=(colonne, valeurs)`
+    ne l'est pas. Sans condition, la branche s'applique à toutes les lignes restantes.
+    """
+
+    def __init__(self, colonnes, si=None, sauf=None):
+        if si is not None and sauf is not None:
+            raise ValueError("Une branche accepte 'si' ou 'sauf', pas les deux")
+        self.colonnes = list(colonnes)
+        self.si = si
+        self.sauf = sauf
+
+    def masque(self, df):
+        if self.si is not None:
+            colonne, valeurs = self.si
+            return df[colonne].isin(valeurs).to_numpy()
+        if self.sauf is not None:
+            colonne, valeurs = self.sauf
+            return ~df[colonne].isin(valeurs).to_numpy()
+        return np.ones(len(df), dtype=bool)
+
+    def __repr__(self):
+        texte = '_'.join(self.colonnes)
+        if self.si is not None:
+            texte += f" si {self.si[0]} dans {list(self.si[1])}"
+        if self.sauf is not None:
+            texte += f" sauf {self.sauf[0]} dans {list(self.sauf[1])}"
+        return f"BrancheCle({texte})"
+
+
+def textes_cellules(serie):
+    """
+    Texte de chaque cellule, comme dans une f-string : les dates sont formatées cellule par
+    cellule (str(Timestamp)), et non d'après l'ensemble des valeurs de la colonne, qui ferait
+    disparaître l'heure d'un sous-ensemble de dates toutes à minuit.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.astype(str)
+    codes, distinctes = pd.factorize(serie)
+    textes = np.array([str(valeur) for valeur in distinctes] + ['NaT'], dtype=object)
+    return pd.Series(textes[codes], index=serie.index, name=serie.name, dtype=object)
+
+
+class SpecCle:
+    """
+    Spécification d'une clé composite : la première branche dont la condition est
+    vérifiée fournit les colonnes de la ligne. Les lignes couvertes par aucune
+    branche reçoivent une clé vide (NaN).
+    """
+
+    def __init__(self, branches, separateur='_'):
+        if isinstance(branches, BrancheCle):
+            branches = [branches]
+        self.branches = list(branches)
+        self.separateur = separateur
+
+    def colonnes(self):
+        # Toutes les colonnes nécessaires à la construction de la clé
+        colonnes = []
+        for branche in self.branches:
+            condition = branche.si or branche.sauf
+            for colonne in branche.colonnes + ([condition[0]] if condition else []):
+                if colonne not in colonnes:
+                    colonnes.append(colonne)
+        return colonnes
+
+    def construire(self, df):
+        cle = pd.Series(np.nan, index=df.index, dtype=object)
+        restantes = np.ones(len(df), dtype=bool)
+        for branche in self.branches:
+            masque = restantes & branche.masque(df)
+            if masque.any():
+                parties = [textes_cellules(df[colonne][masque]) for colonne in branche.colonnes]
+                cle[masque] = parties[0].str.cat(parties[1:], sep=self.separateur, na_rep='nan').to_numpy()
+            restantes &= ~masque
+        return cle
+
+    def __repr__(self):
+        return f"SpecCle({self.branches!r}, separateur={self.separateur!r})"
+
+
+
+# ---------------------------------------------------------------------------
+# Clés hachées sur 64 bits pour les jointures multi-colonnes
+# ---------------------------------------------------------------------------
+
+class CollisionCleError(ValueError):
+    pass
+
+
+def normaliser_composant(serie):
+    """
+    Forme textuelle canonique d'une composante de clé : espaces supprimés,
+    nombres entiers sans '.0', dates (cellules date ou textes d'un format connu, voir
+    dates.py) en 'AAAA-MM-JJ[ HH:MM:SS]', valeurs vides -> ''.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        texte = texte_canonique(serie)
+    else:
+        texte = canoniser_dates(serie).astype(str).str.strip()
+        texte = texte.str.replace(r'^(-?\d+)\.0+$', r'\1', regex=True)
+    return texte.where(serie.notna(), '')
+
+
+def composante(serie):
+    """
+    Code chaque valeur de la colonne par sa position parmi les valeurs distinctes et retourne
+    (codes, empreintes des valeurs distinctes normalisées, textes normalisés). La normalisation
+    et le hachage ne portent ainsi que sur les valeurs distinctes, pas sur chaque ligne.
+    """
+    codes, distinctes = pd.factorize(serie)
+    # Le code -1 (valeur vide) pointe sur le '' ajouté en dernière position
+    textes = np.append(normaliser_composant(pd.Series(distinctes)).to_numpy(dtype=object), '')
+    return codes, pd.util.hash_array(textes), textes
+
+
+def combiner_empreintes(empreintes_colonnes):
+    # Combinaison des empreintes par colonne en une empreinte par ligne (même schéma que les tuples Python)
+    nombre = len(empreintes_colonnes)
+    resultat = np.full(len(empreintes_colonnes[0]), 0x345678, dtype=np.uint64)
+    multiplicateur = np.uint64(1000003)
+    with np.errstate(over='ignore'):
+        for position, empreintes in enumerate(empreintes_colonnes):
+            resultat = (resultat ^ empreintes) * multiplicateur
+            multiplicateur += np.uint64(82520 + nombre + nombre - position)
+        resultat += np.uint64(97531)
+    return resultat
+
+
+class CleHachee:
+    """Empreinte uint64 par ligne d'une clé composite, avec ses composantes pour le contrôle des collisions."""
+
+    def __init__(self, df, colonnes):
+        self.composantes = [composante(df[colonne]) for colonne in colonnes]
+        self.empreintes_colonnes = [empreintes[codes] for codes, empreintes, _ in self.composantes]
+        self.valeurs = combiner_empreintes(self.empreintes_colonnes)
+
+
+def cle_hachee(df, colonnes):
+    return pd.Series(CleHachee(df, colonnes).valeurs, index=df.index)
+
+
+def verifier_collisions(*cles):
+    """
+    Vérifie qu'une même empreinte ne correspond jamais à deux tuples de composantes
+    différents, sur l'ensemble des côtés de la jointure : d'abord colonne par colonne
+    (textes distincts -> empreintes distinctes), puis sur les tuples d'empreintes.
+    """
+    for position in range(len(cles[0].composantes)):
+        textes = pd.unique(np.concatenate([cle.composantes[position][2] for cle in cles]))
+        empreintes = pd.util.hash_array(textes)
+        en_collision = pd.Series(empreintes).duplicated(keep=False).to_numpy()
+        if en_collision.any():
+            raise CollisionCleError(f"Collision d'empreintes entre des valeurs différentes : {list(textes[en_collision][:4])}")
+
+    tuples = pd.concat(
+        [pd.DataFrame(dict(enumerate(cle.empreintes_colonnes)) | {'_cle': cle.valeurs}).drop_duplicates() for cle in cles],
+        ignore_index=True,
+    ).drop_duplicates()
+    en_collision = tuples['_cle'].duplicated(keep=False)
+    if en_collision.any():
+        raise CollisionCleError(f"Collision d'empreintes de clé composite sur {int(en_collision.sum())} tuples distincts")
+
+
+def fusionner_sur_cles(gauche, droite, colonnes_gauche, colonnes_droite, how='left', verifier=True):
+    """
+    Jointure de `gauche` et `droite` sur plusieurs colonnes, via une empreinte uint64
+    des composantes normalisées au lieu d'une longue chaîne concaténée.
+    """
+    if len(colonnes_gauche) != len(colonnes_droite):
+        raise ValueError("Les deux côtés de la jointure doivent avoir le même nombre de colonnes clés")
+    cle_gauche = CleHachee(gauche, colonnes_gauche)
+    cle_droite = CleHachee(droite, colonnes_droite)
+    if verifier:
+        verifier_collisions(cle_gauche, cle_droite)
+
+    fusion = fusionner(
+        gauche.assign(_cle_jointure=cle_gauche.valeurs),
+        droite.assign(_cle_jointure=cle_droite.valeurs),
+        on='_cle_jointure', how=how,
+    )
+    return fusion.drop(columns='_cle_jointure')
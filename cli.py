@@ -0,0 +1,206 @@
+"""
+Exécution des étapes de rapprochement en ligne de commande, sans l'interface Streamlit.
+
+Exemples :
+    python cli.py --liste
+    python cli.py MTN_PAYIN NBSI_OP --entree operateur=mtn.xlsx --entree back_office=bo.xlsx --sortie resultats/
+    python cli.py MTN_PAYIN RECHERCHEV --entree ecarts=resultats/ecarts_test_mtn.xlsx \\
+        --entree en_echec=echecs.xlsx --entree operateur=mtn.xlsx --sortie resultats/
+    python cli.py --tous manifeste.json --sortie resultats/
+    python cli.py MTN_PAYIN TCD --du 2024-01-01 --au 2024-03-31 --sortie resultats/
+
+Les fichiers produits portent les mêmes noms que les téléchargements de l'interface,
+ce qui permet d'enchaîner les étapes (par exemple depuis cron).
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from agregats import SOURCES_AGREGATS, agregats
+from appariement import TOUTES, UN_A_UN
+from etapes import ETAPES
+from execution import AUTO, MOTEURS
+from incremental import COLONNES_INCREMENTALES, RapprochementIncremental
+from instrumentation import collecter, mesurer
+from lecture import lire_fichier
+from parallele import charger_manifeste, executer_tous
+
+
+def normaliser_nom(nom):
+    return nom.strip().upper().replace('-', '_').replace(' ', '_')
+
+
+def lister_etapes():
+    lignes = []
+    for operateur, etapes_operateur in ETAPES.items():
+        for nom_etape, etape in etapes_operateur.items():
+            lignes.append(f"{operateur:<22} {nom_etape:<11} entrées : {', '.join(etape.entrees)}")
+    return '\n'.join(lignes)
+
+
+def analyser_entrees(valeurs):
+    entrees = {}
+    for valeur in valeurs:
+        nom, separateur, chemin = valeur.partition('=')
+        if not separateur or not chemin:
+            raise argparse.ArgumentTypeError(f"Entrée invalide '{valeur}' (attendu : nom=chemin)")
+        entrees[nom.strip()] = chemin.strip()
+    return entrees
+
+
+def ecrire_resultat(df, chemin, avec_index=False):
+    if chemin.lower().endswith('.csv'):
+        df.to_csv(chemin, index=avec_index)
+    else:
+        with pd.ExcelWriter(chemin, engine='xlsxwriter') as writer:
+            df.to_excel(writer, index=avec_index)
+
+
+def executer_etape(operateur, nom_etape, chemins, dossier_sortie, format_sortie='xlsx', incremental=False, parametres=None):
+    """
+    Charge les entrées, exécute l'étape et écrit ses fichiers ; retourne {fichier: nombre de lignes}.
+    Avec `incremental`, l'étape NBSI_OP ne rapproche que les transactions nouvelles depuis la dernière exécution.
+    `parametres` est transmis aux étapes qui l'acceptent (ex. tolerance_secondes des RECHERCHEV Orange / TMoney et de NBSI_ECART TMoney,
+    appariement de NBSI_OP MTN).
+    """
+    etape = ETAPES[operateur][nom_etape]
+    manquantes = [entree for entree in etape.entrees if entree not in chemins]
+    if manquantes:
+        raise ValueError(f"Entrées manquantes pour {operateur} {nom_etape} : {', '.join(manquantes)}")
+
+    dataframes = {entree: lire_fichier(chemins[entree], operateur=operateur, type_source=entree, **etape.options_lecture(entree)) for entree in etape.entrees}
+    if incremental and nom_etape == 'NBSI_OP' and operateur in COLONNES_INCREMENTALES:
+        resultats, _ = RapprochementIncremental(operateur).executer(
+            lambda df_operateur, df_back_office: etape.executer(parametres, operateur=df_operateur, back_office=df_back_office),
+            dataframes['operateur'], dataframes['back_office'],
+            un_a_un='appariement' in etape.parametres and (parametres or {}).get('appariement', UN_A_UN) == UN_A_UN,
+        )
+    else:
+        resultats = etape.executer(parametres, **dataframes)
+    if nom_etape == 'TCD' and operateur in SOURCES_AGREGATS:
+        # Les jours du relevé alimentent les agrégats journaliers (TCD sur période)
+        with mesurer('agrégats journaliers', len(dataframes['operateur'])):
+            agregats.mettre_a_jour(operateur, dataframes['operateur'])
+
+    cardinalite = resultats.get('cardinalite')
+    if cardinalite is not None and cardinalite['dépassement'].any():
+        ligne = cardinalite.iloc[0]
+        print(f"Attention : la fusion {ligne['fusion']} a produit environ {ligne['lignes estimées']} lignes (budget : {ligne['budget']})", file=sys.stderr)
+
+    anomalies = resultats.get('anomalies_montants')
+    if anomalies is not None and not anomalies.empty:
+        print(f"Attention : {len(anomalies)} montant(s) non numérique(s) ou arrondi(s) dans {', '.join(anomalies['colonne'].unique())}", file=sys.stderr)
+
+    doublons = resultats.get('doublons')
+    if doublons is not None and not doublons.empty:
+        print(f"Attention : {doublons['groupe'].nunique()} groupe(s) de transactions en double ({len(doublons)} ligne(s))", file=sys.stderr)
+
+    os.makedirs(dossier_sortie, exist_ok=True)
+    ecrits = {}
+    for nom_resultat, nom_fichier in etape.fichiers.items():
+        if format_sortie == 'csv':
+            nom_fichier = os.path.splitext(nom_fichier)[0] + '.csv'
+        chemin = os.path.join(dossier_sortie, nom_fichier)
+        with mesurer(f"écriture {nom_fichier}", len(resultats[nom_resultat])):
+            ecrire_resultat(resultats[nom_resultat], chemin, avec_index=etape.avec_index)
+        ecrits[chemin] = len(resultats[nom_resultat])
+    return ecrits
+
+
+def executer_tcd_periode(operateur, debut, fin, dossier_sortie, format_sortie='xlsx'):
+    # TCD de la période lu dans les agrégats journaliers, sans fichier d'entrée
+    if operateur not in SOURCES_AGREGATS:
+        raise ValueError(f"Pas d'agrégats journaliers pour {operateur}")
+    with mesurer('TCD sur période'):
+        tcd = agregats.tcd(operateur, debut, fin)
+    os.makedirs(dossier_sortie, exist_ok=True)
+    chemin = os.path.join(dossier_sortie, f"tcd_{operateur.lower()}_{debut or 'debut'}_{fin or 'fin'}.{format_sortie}")
+    ecrire_resultat(tcd, chemin, avec_index=True)
+    return {chemin: len(tcd)}
+
+
+def parametres_etapes(args):
+    # Paramètres transmis aux étapes qui les acceptent, pour une étape seule comme pour --tous
+    return {'tolerance_secondes': args.tolerance, 'appariement': args.appariement}
+
+
+def executer_rapprochement_global(args):
+    try:
+        manifeste = charger_manifeste(args.tous)
+        debut = time.perf_counter()
+        resume = executer_tous(manifeste, args.sortie, args.format, args.processus, args.incremental, parametres_etapes(args))
+    except Exception as e:
+        print(f"Erreur lors du rapprochement global : {e}", file=sys.stderr)
+        return 1
+
+    # Résumé consolidé de tous les opérateurs
+    os.makedirs(args.sortie, exist_ok=True)
+    ecrire_resultat(resume, os.path.join(args.sortie, f'resume_rapprochement.{args.format}'))
+    print(resume.to_string(index=False))
+    print(f"Rapprochement global terminé en {time.perf_counter() - debut:.1f} s")
+    return 0 if (resume['Statut'] == 'OK').all() else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('operateur', nargs='?', help="opérateur (ex. MTN_PAYIN, ORANGE_MONEY_PAYIN)")
+    parser.add_argument('etape', nargs='?', help="étape (NBSI_OP, NBSI_ECART, RECHERCHEV, TCD, PENDINGS)")
+    parser.add_argument('--entree', action='append', default=[], metavar='NOM=CHEMIN', help="fichier d'entrée de l'étape (répétable)")
+    parser.add_argument('--sortie', default='.', help="dossier des fichiers produits (défaut : dossier courant)")
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx', help="format des fichiers produits")
+    parser.add_argument('--liste', action='store_true', help="lister les opérateurs, étapes et entrées attendues")
+    parser.add_argument('--tous', metavar='MANIFESTE', help="exécuter NBSI_OP et TCD pour tous les opérateurs du manifeste JSON, en parallèle")
+    parser.add_argument('--incremental', action='store_true', help="NBSI_OP : ne rapprocher que les transactions nouvelles depuis la dernière exécution (MTN_PAYIN, TOGO_MONEY_PAYIN)")
+    parser.add_argument('--metriques', action='store_true', help="afficher la durée, les lignes et le pic mémoire de chaque phase, et les ajouter au journal des métriques")
+    parser.add_argument('--processus', type=int, help="nombre de processus pour --tous (défaut : un par opérateur, au plus le nombre de cœurs)")
+    parser.add_argument('--du', metavar='AAAA-MM-JJ', help="TCD sans --entree : premier jour de la période, lue dans les agrégats journaliers")
+    parser.add_argument('--au', metavar='AAAA-MM-JJ', help="TCD sans --entree : dernier jour de la période")
+    parser.add_argument('--appariement', choices=[UN_A_UN, TOUTES], default=UN_A_UN, help="NBSI_OP MTN : paiements répétés d'un même téléphone appariés un à un (défaut) ou combinés avec toutes ses transactions au Back Office")
+    parser.add_argument('--tolerance', type=int, default=0, metavar='SECONDES', help="RECHERCHEV Orange / TMoney, NBSI_ECART TMoney : rapprocher à téléphone (et montant) égaux les horodatages distants d'au plus SECONDES (défaut : égalité exacte)")
+    parser.add_argument('--moteur', choices=[AUTO] + MOTEURS, help="moteur des jointures et des TCD (défaut : RAPPROCHEMENT_MOTEUR, sinon auto)")
+    args = parser.parse_args(argv)
+
+    if args.moteur:
+        # Par l'environnement, pour que les processus de --tous utilisent le même moteur
+        os.environ['RAPPROCHEMENT_MOTEUR'] = args.moteur
+
+    if args.liste:
+        print(lister_etapes())
+        return 0
+    if args.tous:
+        return executer_rapprochement_global(args)
+    if not args.operateur or not args.etape:
+        parser.error("l'opérateur et l'étape sont obligatoires (voir --liste)")
+
+    operateur = normaliser_nom(args.operateur)
+    nom_etape = normaliser_nom(args.etape)
+    if operateur not in ETAPES or nom_etape not in ETAPES[operateur]:
+        parser.error(f"étape inconnue : {operateur} {nom_etape} (voir --liste)")
+
+    try:
+        chemins = analyser_entrees(args.entree)
+        debut = time.perf_counter()
+        with collecter(f"{operateur} {nom_etape}", memoire=args.metriques) as collecteur:
+            if nom_etape == 'TCD' and not chemins and (args.du or args.au):
+                ecrits = executer_tcd_periode(operateur, args.du, args.au, args.sortie, args.format)
+            else:
+                ecrits = executer_etape(operateur, nom_etape, chemins, args.sortie, args.format, args.incremental, parametres_etapes(args))
+    except Exception as e:
+        print(f"Erreur lors du traitement des fichiers : {e}", file=sys.stderr)
+        return 1
+
+    if args.metriques:
+        print(collecteur.tableau().to_string(index=False))
+        collecteur.enregistrer()
+
+    for chemin, nombre_lignes in ecrits.items():
+        print(f"{chemin} : {nombre_lignes} ligne(s)")
+    print(f"{operateur} {nom_etape} terminé en {time.perf_counter() - debut:.1f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Détection des transactions en double dans le relevé opérateur et dans le Back Office.
+
+Une transaction présente deux fois dans le relevé de l'opérateur, ou créditée deux fois
+au Back Office, ne produit aucun écart : les deux lignes trouvent leur correspondance.
+Les doublons étaient donc cherchés à l'œil dans les fichiers Excel exportés. Ils sont
+relevés à l'import des fichiers de NBSI_OP, sur les seules transactions retenues par
+les filtres de l'étape (succès), selon deux critères :
+  - même identifiant de transaction (normalisé, voir cles.py) ;
+  - même téléphone et même montant, à des horodatages distants d'au plus
+    FENETRE_SECONDES (un double crédit n'a presque jamais exactement la même heure).
+
+Les deux critères sont calculés en temps linéaire, par des tables de hachage : les valeurs
+sont codées par `factorize` (identifiant et téléphone normalisés sur leurs seules valeurs
+distinctes), le second critère par des seaux de FENETRE_SECONDES secondes (deux
+horodatages assez proches sont dans le même seau ou dans deux seaux voisins). Seules les
+lignes relevées sont ensuite triées, pour former les groupes du rapport.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from dates import epoque_date_heure
+from montants import montants_entiers
+
+# Écart maximal entre deux transactions de même téléphone et même montant (variable RAPPROCHEMENT_FENETRE_DOUBLONS)
+FENETRE_SECONDES = int(os.environ.get('RAPPROCHEMENT_FENETRE_DOUBLONS', 120))
+
+CRITERE_IDENTIFIANT = 'identifiant'
+CRITERE_FENETRE = 'téléphone, montant et horodatage'
+
+SOURCE_OPERATEUR = 'opérateur'
+SOURCE_BACK_OFFICE = 'back office'
+
+# Par opérateur et par fichier : colonnes de l'identifiant, du téléphone, du montant, de la date et de l'heure.
+# Une colonne absente du fichier (ou non lue par l'étape) désactive le critère qui en a besoin.
+SOURCES_DOUBLONS = {
+    'MTN_PAYIN': {
+        'operateur': {'identifiant': 'TransactionId', 'telephone': 'MSISDN', 'montant': 'Montant', 'date': 'StartDateTime'},
+        'back_office': {'identifiant': 'ID PAIEMENT', 'telephone': 'TELEPHONE', 'montant': 'MONTANT', 'date': 'CREATION'},
+    },
+    'ORANGE_MAGMA_PAYIN': {
+        'operateur': {'identifiant': 'TransactionID', 'montant': 'Amount', 'date': 'Created At'},
+        'back_office': {'identifiant': 'slug'},
+    },
+    'ORANGE_MONEY_PAYIN': {
+        'operateur': {'identifiant': 'Référence', 'telephone': 'N° de Compte2', 'montant': 'Crédit', 'date': 'Date', 'heure': 'Heure'},
+        'back_office': {'identifiant': 'ID PAIEMENT', 'telephone': 'TELEPHONE', 'montant': 'MONTANT', 'date': 'CREATION'},
+    },
+    'TOGO_MONEY_PAYIN': {
+        'operateur': {'identifiant': 'Transaction Id', 'telephone': 'Initiator', 'montant': 'Amount', 'date': 'Date', 'heure': 'heure'},
+        'back_office': {'identifiant': 'ID PAIEMENT', 'telephone': 'TELEPHONE', 'montant': 'MONTANT', 'date': 'CREATION'},
+    },
+}
+
+COLONNES_RAPPORT = ['source', 'critère', 'groupe', 'occurrences', 'ligne', 'identifiant', 'téléphone', 'montant', 'horodatage']
+
+
+def rapport_vide():
+    return pd.DataFrame({colonne: pd.Series(dtype=object) for colonne in COLONNES_RAPPORT})
+
+
+def codes_normalises(serie):
+    """
+    Code de chaque valeur après normalisation (espaces retirés, entiers sans '.0', comme les
+    composantes de clé de cles.py) ; -1 pour une valeur vide. Seules les valeurs distinctes
+    sont normalisées.
+    """
+    codes, distinctes = pd.factorize(serie)
+    textes = pd.Series(pd.Index(distinctes).astype(str), dtype='string').str.replace(r'\s+', '', regex=True)
+    textes = textes.str.replace(r'^(-?\d+)\.0+$', r'\1', regex=True)
+    codes_textes = np.append(pd.factorize(textes)[0], -1)
+    return codes_textes[codes]
+
+
+def codes_composes(*codes):
+    # Code unique d'un tuple de codes (tous >= 0), -1 si l'un d'eux est vide
+    compose = np.zeros(len(codes[0]), dtype=np.int64)
+    for valeurs in codes:
+        compose = compose * (int(valeurs.max(initial=0)) + 1) + valeurs
+    vides = np.logical_or.reduce([valeurs < 0 for valeurs in codes])
+    return np.where(vides, -1, compose)
+
+
+def lignes_meme_identifiant(identifiants):
+    # Masque des lignes dont l'identifiant (non vide) apparaît plusieurs fois, et codes des identifiants
+    codes = codes_normalises(identifiants)
+    masque = pd.Series(codes).duplicated(keep=False).to_numpy() & (codes >= 0)
+    return masque, codes
+
+
+def lignes_proches(cles, secondes, fenetre=FENETRE_SECONDES):
+    """
+    Masque des lignes qui ont une autre ligne de même clé (code >= 0) à au plus `fenetre` secondes.
+    Les horodatages sont rangés par seaux de `fenetre` secondes : une ligne est relevée si son seau
+    contient une autre ligne de même clé, ou si le seau précédent (suivant) de la même clé contient
+    une ligne assez proche, c'est-à-dire si son horodatage maximal (minimal) l'est.
+    """
+    valides = ~np.isnan(secondes) & (cles >= 0)
+    masque = np.zeros(len(cles), dtype=bool)
+    if not valides.any():
+        return masque
+    cles, secondes = cles[valides], secondes[valides]
+    seaux = np.floor_divide(secondes, max(fenetre, 1)).astype(np.int64)
+    # (clé, seau) codé par un seul entier ; les seaux voisins de la même clé sont à +1 et -1
+    seaux = seaux - seaux.min() + 1
+    cles_seaux = cles * (int(seaux.max()) + 2) + seaux
+    groupes, distincts = pd.factorize(cles_seaux)
+    statistiques = pd.Series(secondes).groupby(groupes).agg(['size', 'min', 'max'])
+    index = pd.Index(distincts)
+
+    def voisin(decalage, statistique):
+        positions = index.get_indexer(cles_seaux + decalage)
+        valeurs = np.append(statistiques[statistique].to_numpy(dtype='float64'), np.nan)
+        return valeurs[positions]
+
+    proches = (
+        (voisin(0, 'size') > 1)
+        | (secondes - voisin(-1, 'max') <= fenetre)
+        | (voisin(1, 'min') - secondes <= fenetre)
+    )
+    masque[valides] = proches
+    return masque
+
+
+def groupes_fenetre(cles, secondes, fenetre=FENETRE_SECONDES):
+    # Numéro de groupe des lignes relevées : même clé, horodatages successifs distants d'au plus `fenetre`
+    ordre = np.lexsort([secondes, cles])
+    cles_triees, secondes_triees = cles[ordre], secondes[ordre]
+    nouveau = np.ones(len(ordre), dtype=bool)
+    nouveau[1:] = (cles_triees[1:] != cles_triees[:-1]) | (np.diff(secondes_triees) > fenetre)
+    groupes = np.empty(len(ordre), dtype=np.int64)
+    groupes[ordre] = np.cumsum(nouveau) - 1
+    return groupes
+
+
+def valeurs_source(df, colonnes, operateur=None):
+    # Valeurs normalisées d'un fichier : identifiant, téléphone, montant (unités mineures), horodatage (secondes)
+    def colonne(nom):
+        return df[colonnes[nom]] if colonnes.get(nom) in df.columns else None
+
+    date, heure = colonne('date'), colonne('heure')
+    montant = colonne('montant')
+    return {
+        'identifiant': colonne('identifiant'),
+        'téléphone': colonne('telephone'),
+        'montant': montants_entiers(montant) if montant is not None else None,
+        'secondes': epoque_date_heure(date, heure, operateur) if date is not None else None,
+    }
+
+
+def doublons_source(df, colonnes, source, fenetre=FENETRE_SECONDES, operateur=None):
+    """Rapport des doublons d'un fichier (une ligne par transaction relevée, par critère)."""
+    valeurs = valeurs_source(df, colonnes, operateur)
+    rapports = []
+
+    def rapport(critere, masque, groupes):
+        positions = np.flatnonzero(masque)
+        occurrences = pd.Series(groupes).map(pd.Series(groupes).value_counts()).to_numpy()
+        extrait = {nom: (serie.iloc[positions].to_numpy(dtype=object) if serie is not None else None)
+                   for nom, serie in valeurs.items() if nom != 'secondes'}
+        horodatage = (pd.to_datetime(valeurs['secondes'].iloc[positions].to_numpy(dtype='float64'), unit='s')
+                      if valeurs['secondes'] is not None else None)
+        return pd.DataFrame({
+            'source': source,
+            'critère': critere,
+            'groupe': groupes,
+            'occurrences': occurrences,
+            'ligne': df.index[positions],
+            **extrait,
+            'horodatage': horodatage,
+        }, columns=COLONNES_RAPPORT)
+
+    if valeurs['identifiant'] is not None:
+        masque, codes = lignes_meme_identifiant(valeurs['identifiant'])
+        if masque.any():
+            rapports.append(rapport(CRITERE_IDENTIFIANT, masque, pd.factorize(codes[masque])[0]))
+
+    if valeurs['téléphone'] is not None and valeurs['montant'] is not None and valeurs['secondes'] is not None:
+        cles = codes_composes(codes_normalises(valeurs['téléphone']), pd.factorize(valeurs['montant'])[0])
+        secondes = valeurs['secondes'].to_numpy(dtype='float64', na_value=np.nan)
+        masque = lignes_proches(cles, secondes, fenetre)
+        if masque.any():
+            rapports.append(rapport(CRITERE_FENETRE, masque, groupes_fenetre(cles[masque], secondes[masque], fenetre)))
+    return rapports
+
+
+def detecter_doublons(operateur, df_operateur, df_back_office, masque_operateur=None, masque_back_office=None, fenetre=FENETRE_SECONDES):
+    """
+    Doublons du relevé opérateur et du Back Office (restreints aux lignes des masques, par exemple
+    les filtres de succès de l'étape). Retourne le rapport : une ligne par transaction relevée, avec
+    la source, le critère, le groupe (numéroté à la suite d'une source et d'un critère à l'autre),
+    le nombre de lignes du groupe, la ligne du fichier et les valeurs normalisées.
+    """
+    colonnes = SOURCES_DOUBLONS.get(operateur)
+    if colonnes is None:
+        return rapport_vide()
+    rapports = []
+    for source, df, masque, nom in ((SOURCE_OPERATEUR, df_operateur, masque_operateur, 'operateur'),
+                                    (SOURCE_BACK_OFFICE, df_back_office, masque_back_office, 'back_office')):
+        if masque is not None:
+            df = df[masque]
+        rapports.extend(doublons_source(df, colonnes[nom], source, fenetre, operateur))
+    decalage = 0
+    for rapport in rapports:
+        rapport['groupe'] += decalage
+        decalage = int(rapport['groupe'].max()) + 1
+    return pd.concat(rapports, ignore_index=True) if rapports else rapport_vide()
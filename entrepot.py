@@ -0,0 +1,145 @@
+"""
+Entrepôt local des relevés importés, au format Parquet.
+
+La première lecture d'un fichier opérateur ou Back Office est enregistrée en Parquet
+(colonnes typées), avec un manifeste indiquant l'opérateur, le type de source et la
+période couverte. Les étapes suivantes, et les jours suivants, relisent ce fichier
+(lecture des seules colonnes utiles, en mémoire mappée) au lieu de ré-analyser l'Excel.
+
+Nécessite pyarrow ; sans lui (ou si RAPPROCHEMENT_ENTREPOT est vide) l'entrepôt est désactivé.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    pq = None
+
+# Dossier de l'entrepôt (modifiable par la variable d'environnement RAPPROCHEMENT_ENTREPOT)
+DOSSIER_ENTREPOT = os.environ.get('RAPPROCHEMENT_ENTREPOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'entrepot'))
+
+# Colonnes de date connues des relevés, par ordre de préférence, pour déterminer la période couverte
+COLONNES_DATE = ['StartDateTime', 'Date', 'Created At', 'CREATION', 'DATE PAIEMENT', 'created_at', 'Crée le', 'Créé']
+
+
+def periode_couverte(df):
+    for colonne in COLONNES_DATE:
+        if colonne in df.columns:
+            dates = pd.to_datetime(df[colonne], errors='coerce')
+            if dates.notna().any():
+                return dates.min().date().isoformat(), dates.max().date().isoformat()
+    return None, None
+
+
+def typer_pour_parquet(df):
+    """
+    Parquet impose un type par colonne : les colonnes objet qui mélangent nombres et textes
+    (fréquent dans les exports Excel) sont converties en texte, les valeurs vides restant vides.
+    """
+    df = df.copy(deep=False)
+    for colonne in df.columns:
+        if df[colonne].dtype == object:
+            genre = pd.api.types.infer_dtype(df[colonne], skipna=True)
+            if genre.startswith('mixed') or genre in ('bytes', 'decimal'):
+                df[colonne] = df[colonne].astype(str).where(df[colonne].notna(), None)
+    return df
+
+
+class EntrepotParquet:
+
+    def __init__(self, dossier=DOSSIER_ENTREPOT):
+        self.dossier = dossier
+        self._chemin_manifeste = os.path.join(dossier, 'manifeste.json')
+        self._verrou = threading.Lock()
+
+    @property
+    def disponible(self):
+        return pq is not None and bool(self.dossier)
+
+    def _lire_manifeste(self):
+        if not os.path.exists(self._chemin_manifeste):
+            return {}
+        with open(self._chemin_manifeste, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _ecrire_manifeste(self, manifeste):
+        # Écriture atomique : le manifeste n'est jamais lu à moitié écrit
+        temporaire = self._chemin_manifeste + '.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump(manifeste, f, ensure_ascii=False, indent=1)
+        os.replace(temporaire, self._chemin_manifeste)
+
+    def chercher(self, identifiant):
+        entree = self._lire_manifeste().get(identifiant)
+        if entree is None or not os.path.exists(os.path.join(self.dossier, entree['chemin'])):
+            return None
+        return entree
+
+    def enregistrer(self, identifiant, df, operateur=None, type_source=None, nom_origine=''):
+        """Enregistre le DataFrame en Parquet et l'inscrit au manifeste ; retourne l'entrée ou None."""
+        if not self.disponible or not all(isinstance(colonne, str) for colonne in df.columns):
+            return None
+        operateur = operateur or 'INCONNU'
+        type_source = type_source or 'inconnu'
+        chemin_relatif = os.path.join(operateur, type_source, f"{identifiant}.parquet")
+        chemin = os.path.join(self.dossier, chemin_relatif)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+
+        temporaire = chemin + '.tmp'
+        typer_pour_parquet(df).to_parquet(temporaire, engine='pyarrow', index=False)
+        os.replace(temporaire, chemin)
+
+        date_min, date_max = periode_couverte(df)
+        entree = {
+            'chemin': chemin_relatif,
+            'operateur': operateur,
+            'type_source': type_source,
+            'date_min': date_min,
+            'date_max': date_max,
+            'lignes': len(df),
+            'colonnes': list(df.columns),
+            'nom_origine': nom_origine,
+            'enregistre_le': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._verrou:
+            manifeste = self._lire_manifeste()
+            manifeste[identifiant] = entree
+            self._ecrire_manifeste(manifeste)
+        return entree
+
+    def lire(self, entree, colonnes=None):
+        # Lecture en mémoire mappée des seules colonnes demandées
+        chemin = os.path.join(self.dossier, entree['chemin'])
+        if colonnes is not None:
+            colonnes = [colonne for colonne in colonnes if colonne in entree['colonnes']]
+        return pq.read_table(chemin, columns=colonnes, memory_map=True).to_pandas()
+
+    def lister(self, operateur=None, type_source=None, debut=None, fin=None):
+        """Entrées du manifeste filtrées par opérateur, type de source et chevauchement de période (dates ISO)."""
+        entrees = []
+        for identifiant, entree in self._lire_manifeste().items():
+            if operateur and entree['operateur'] != operateur:
+                continue
+            if type_source and entree['type_source'] != type_source:
+                continue
+            if debut and entree['date_max'] and entree['date_max'] < debut:
+                continue
+            if fin and entree['date_min'] and entree['date_min'] > fin:
+                continue
+            entrees.append(dict(entree, identifiant=identifiant))
+        return sorted(entrees, key=lambda entree: (entree['date_min'] or '', entree['enregistre_le']))
+
+    def charger(self, operateur, type_source, debut=None, fin=None, colonnes=None):
+        # Concaténer tous les relevés enregistrés d'un opérateur sur une période
+        entrees = self.lister(operateur, type_source, debut, fin)
+        if not entrees:
+            return pd.DataFrame(columns=colonnes or [])
+        return pd.concat([self.lire(entree, colonnes) for entree in entrees], ignore_index=True)
+
+
+entrepot = EntrepotParquet()
@@ -0,0 +1,533 @@
+"""
+Logique des étapes de rapprochement, indépendante de l'interface Streamlit.
+
+Chaque étape reçoit les DataFrames déjà chargés et retourne un dictionnaire
+{nom du résultat: DataFrame}. Hello.py se charge de l'import des fichiers et de
+l'affichage ; cli.py permet d'exécuter les mêmes étapes sans navigateur.
+"""
+import pandas as pd
+
+from appariement import UN_A_UN
+from cles import fusionner_sur_cles
+from dates import canoniser_dates, convertir_dates, jour, libelles_jours
+from doublons import detecter_doublons
+from execution import agreger, fusionner
+from fenetre import COLONNE_ECART, fusionner_fenetre, remplir_fenetre
+from instrumentation import instrumente, mesurer
+from lecture import ColonnesManquantesError
+from montants import normaliser_montants
+from moteur import SpecRapprochement, masque_filtre, rapprocher
+from recherche import IndexRecherche
+
+
+def verifier_colonnes(df, colonnes, nom_fichier):
+    manquantes = [colonne for colonne in colonnes if colonne not in df.columns]
+    if manquantes:
+        raise ColonnesManquantesError(f"Colonnes manquantes dans le fichier {nom_fichier} : {', '.join(manquantes)}")
+
+
+def montants_tcd(df, colonne):
+    """
+    Montants d'un TCD en entiers d'unités mineures (voir montants.py) : retourne le masque des
+    lignes au montant numérique, leurs montants (int64) et le rapport des cellules écartées.
+    """
+    with mesurer('normalisation des montants', len(df)):
+        df, anomalies = normaliser_montants(df, [colonne])
+        valides = df[colonne].notna().to_numpy()
+    return valides, df[colonne][valides].astype('int64'), anomalies
+
+
+def doublons_nbsi_op(operateur, spec, df_operateur, df_back_office):
+    # Doublons des transactions retenues par les filtres de l'étape, dans les deux fichiers (voir doublons.py)
+    with mesurer('détection des doublons', len(df_operateur) + len(df_back_office)) as mesure:
+        doublons = detecter_doublons(
+            operateur, df_operateur, df_back_office,
+            masque_filtre(df_operateur, spec.filtre_operateur) if spec.filtre_operateur else None,
+            masque_filtre(df_back_office, spec.filtre_back_office) if spec.filtre_back_office else None,
+        )
+        mesure.lignes_sortie = len(doublons)
+    return doublons
+
+
+"""
+MTN PAYIN
+"""
+
+def convertir_transaction_id_mtn(df_operateur):
+    # Supprimer les virgules et convertir la colonne 'TransactionId' en entiers (déjà fait si le
+    # relevé a été chargé avec les types compacts)
+    if not pd.api.types.is_integer_dtype(df_operateur['TransactionId']):
+        df_operateur['TransactionId'] = df_operateur['TransactionId'].str.replace(',', '').astype(int)
+    return df_operateur
+
+
+# Transactions "Successfully Processed Transaction" rapprochées des succès du Back Office par MSISDN = TELEPHONE ;
+# les paiements répétés d'un même téléphone sont appariés un à un, dans l'ordre de l'heure puis du montant
+SPEC_NBSI_OP_MTN = SpecRapprochement(
+    'MSISDN', 'TELEPHONE',
+    filtre_operateur={'ResponseMessage': 'Successfully Processed Transaction'},
+    filtre_back_office={'ETAT TRANSACTION': 'SUCCES'},
+    preparation_operateur=convertir_transaction_id_mtn,
+    internes=True,
+    gabarit_fusion=True,
+    appariement=UN_A_UN,
+    ordre_operateur=('StartDateTime', 'Montant'),
+    ordre_back_office=('CREATION', 'MONTANT'),
+)
+
+
+@instrumente
+def nbsi_op_mtn_payin(df_operateur, df_back_office, appariement=UN_A_UN):
+    # Transactions correspondantes (internes), non correspondantes (écarts), rapport de cardinalité de la fusion et doublons
+    resultats = rapprocher(SPEC_NBSI_OP_MTN.variante(appariement=appariement), df_operateur, df_back_office)
+    resultats['doublons'] = doublons_nbsi_op('MTN_PAYIN', SPEC_NBSI_OP_MTN, df_operateur, df_back_office)
+    return resultats
+
+
+@instrumente
+def nbsi_ecart_mtn_payin(df_ecarts, df_en_echec):
+    # Créer la colonne 'External Transaction Id' si elle n'existe pas dans le fichier des écarts
+    if 'External Transaction Id' not in df_ecarts.columns:
+        df_ecarts['External Transaction Id'] = df_ecarts['StartDateTime'].astype(str) + df_ecarts['MONTANT'].astype(str)
+
+    # Créer la colonne 'External Transaction Id' si elle n'existe pas dans le fichier des transactions en échec
+    if 'External Transaction Id' not in df_en_echec.columns:
+        df_en_echec['External Transaction Id'] = df_en_echec['CREATION'].astype(str) + df_en_echec['MONTANT'].astype(str) + df_en_echec['TELEPHONE'].astype(str)
+
+    # Effectuer le Matching des colonnes
+    with mesurer('fusion External Transaction Id = CUSTOM 6', len(df_ecarts) + len(df_en_echec)) as mesure:
+        matched_df = fusionner(df_ecarts, df_en_echec, left_on='External Transaction Id', right_on='CUSTOM 6', how='inner')
+        mesure.lignes_sortie = len(matched_df)
+    return {'resultat': matched_df}
+
+
+@instrumente
+def recherchev_mtn_payin(df_ecarts, df_en_echec, df_operateur):
+    # Effectuer le matching entre la colonne "External Transaction Id" du tableau des écarts et celle des transactions en échec
+    with mesurer('fusion External Transaction Id', len(df_ecarts) + len(df_en_echec)) as mesure:
+        matched_df = fusionner(df_ecarts, df_en_echec, left_on='External Transaction Id', right_on='External Transaction Id', how='left')
+        mesure.lignes_sortie = len(matched_df)
+
+    # Utiliser la RECHERCHEV pour trouver les éléments "ID TRANSACTION" et "SITE ID" dans les transactions en échec de CinetPay
+    with mesurer('recherchev transactions en échec', len(matched_df)):
+        index_en_echec = IndexRecherche(df_en_echec, 'ID TRANSACTION')
+        matched_df = index_en_echec.remplir(matched_df, 'External Transaction Id', {'ID TRANSACTION': 'ID TRANSACTION', 'SITE ID': 'SITE_ID'})
+
+    # Compléter avec la date et l'heure du fichier de l'opérateur en succès
+    with mesurer('recherchev fichier opérateur', len(matched_df)):
+        index_operateur = IndexRecherche(df_operateur, 'External Transaction Id')
+        matched_df = index_operateur.joindre(matched_df, 'External Transaction Id', ['Date', 'HEURE'])
+    return {'resultat': matched_df}
+
+
+@instrumente
+def tcd_mtn_payin(df_transactions_success):
+    # Convertir la colonne 'Date' en format de date si nécessaire
+    with mesurer('conversion des dates', len(df_transactions_success)):
+        df_transactions_success['Date'] = convertir_dates(df_transactions_success['Date'], 'MTN_PAYIN')
+
+    # Créer le TCD : nombre et somme des montants par date
+    valides, montants, anomalies = montants_tcd(df_transactions_success, 'Montant')
+    with mesurer('tableau croisé', len(df_transactions_success)):
+        tcd = agreger(df_transactions_success['Date'][valides], montants)
+    tcd.columns = ['Nombre de Montant', 'Somme de Montant']
+
+    # Calculer la colonne 'Somme des Frais' en soustrayant 'Nombre de Montant' de 'Somme de Montant'
+    tcd['Somme des Frais'] = tcd['Somme de Montant'] - tcd['Nombre de Montant']
+    return {'tcd': tcd, 'anomalies_montants': anomalies}
+
+
+"""
+ORANGE MAGMA PAYIN
+"""
+
+# Transactions opérateur absentes des transactions "Orange CI (API MAGMA)" du Back Office (TransactionID = slug)
+SPEC_NBSI_OP_ORANGE_MAGMA = SpecRapprochement(
+    'TransactionID', 'slug',
+    filtre_back_office={'Traitant': 'Orange CI (API MAGMA)'},
+    gabarit_fusion=True,
+)
+
+
+@instrumente
+def nbsi_op_orange_magma_payin(df_operateur, df_back_office):
+    return {
+        'ecarts': rapprocher(SPEC_NBSI_OP_ORANGE_MAGMA, df_operateur, df_back_office)['ecarts'],
+        'doublons': doublons_nbsi_op('ORANGE_MAGMA_PAYIN', SPEC_NBSI_OP_ORANGE_MAGMA, df_operateur, df_back_office),
+    }
+
+
+@instrumente
+def tcd_orange_magma_payin(df_transactions_success):
+    with mesurer('conversion des dates', len(df_transactions_success)):
+        df_transactions_success['Date'] = convertir_dates(df_transactions_success['Created At'], 'ORANGE_MAGMA_PAYIN')
+
+        # Regrouper par numéro de jour (ordre chronologique), libellé en date courte (jour-mois-année)
+        jours = jour(df_transactions_success['Date'])
+
+    valides, montants, anomalies = montants_tcd(df_transactions_success, 'Amount')
+    with mesurer('tableau croisé', len(df_transactions_success)):
+        par_jour = agreger(jours[valides], montants)
+    par_jour.index = libelles_jours(par_jour.index, 'Date_Courte')
+    count_by_date = par_jour['count']
+    sum_by_date = par_jour['sum']
+
+    # Calculer la colonne 'Somme des Frais' en soustrayant le count du sum
+    sum_frais_by_date = sum_by_date - count_by_date
+
+    tcd = pd.DataFrame({'Nombre de Montant': count_by_date, 'Somme de Montant': sum_by_date, 'Somme des Frais': sum_frais_by_date})
+    return {'tcd': tcd, 'anomalies_montants': anomalies}
+
+
+"""
+ORANGE MONEY PAYIN
+"""
+
+# Transactions opérateur dont la "Référence" est absente des "ID PAIEMENT" du Back Office
+SPEC_NBSI_OP_ORANGE_MONEY = SpecRapprochement('Référence', 'ID PAIEMENT', gabarit_fusion=True)
+
+
+@instrumente
+def nbsi_op_orange_money_payin(df_operateur, df_back_office):
+    return {
+        'ecarts': rapprocher(SPEC_NBSI_OP_ORANGE_MONEY, df_operateur, df_back_office)['ecarts'],
+        'doublons': doublons_nbsi_op('ORANGE_MONEY_PAYIN', SPEC_NBSI_OP_ORANGE_MONEY, df_operateur, df_back_office),
+    }
+
+
+@instrumente
+def nbsi_ecart_orange_money_payin(df_ecarts, df_en_echec):
+    # Effectuer le matching entre la colonne "Référence" du tableau des écarts et la colonne "CUSTOM 6" des transactions en échec
+    with mesurer('fusion Référence = CUSTOM 6', len(df_ecarts) + len(df_en_echec)) as mesure:
+        matched_df = fusionner(df_ecarts, df_en_echec, left_on='Référence', right_on='CUSTOM 6', how='left')
+        mesure.lignes_sortie = len(matched_df)
+
+    # Utiliser la RECHERCHEV pour trouver les éléments "ID TRANSACTION" et "SITE ID" dans les transactions en échec de CinetPay
+    with mesurer('recherchev transactions en échec', len(matched_df)):
+        index_en_echec = IndexRecherche(df_en_echec, 'ID TRANSACTION')
+        matched_df = index_en_echec.remplir(matched_df, 'Référence', ['ID TRANSACTION', 'SITE_ID'])
+    return {'resultat': matched_df}
+
+
+@instrumente
+def recherchev_orange_money_payin(df_ecarts, df_en_echec, tolerance_secondes=None):
+    if tolerance_secondes:
+        # Même téléphone et même montant, date et heure à au plus `tolerance_secondes` près
+        with mesurer('fusion par fenêtre de temps', len(df_ecarts) + len(df_en_echec)) as mesure:
+            merged_df = fusionner_fenetre(df_ecarts, df_en_echec, ['N° de Compte2', 'Crédit'], ['TÉLÉPHONE', 'MONTANT'], ('Date', 'Heure'), ('CREATION', 'heure'), tolerance_secondes)
+            mesure.lignes_sortie = len(merged_df)
+    else:
+        # Fusionner les DataFrames des écarts et des transactions en échec sur la clé composite
+        # (N° de Compte2, Crédit, Date, Heure) = (TÉLÉPHONE, MONTANT, CREATION, heure), hachée sur 64 bits
+        with mesurer('fusion sur clé composite hachée', len(df_ecarts) + len(df_en_echec)) as mesure:
+            merged_df = fusionner_sur_cles(df_ecarts, df_en_echec, ['N° de Compte2', 'Crédit', 'Date', 'Heure'], ['TÉLÉPHONE', 'MONTANT', 'CREATION', 'heure'], how='left')
+            mesure.lignes_sortie = len(merged_df)
+
+    # Sélectionner et renommer les colonnes nécessaires
+    selected_columns = ['ID TRANSACTION', 'SITE_ID', 'CPM_RESULT', 'Référence', 'Date', 'heure']
+    result_table = merged_df[selected_columns].copy()
+    result_table.columns = ['ID transaction', 'Site ID', 'Résultat Paiement', 'Opérateur Transaction ID', 'Date Paiement', 'Heure Paiement']
+    if tolerance_secondes:
+        result_table[COLONNE_ECART] = merged_df[COLONNE_ECART]
+    return {'en_echec': df_en_echec, 'fusion': merged_df, 'resultat': result_table}
+
+
+@instrumente
+def tcd_orange_money_payin(df_transactions_success):
+    with mesurer('conversion des dates', len(df_transactions_success)):
+        df_transactions_success['Date'] = convertir_dates(df_transactions_success['Date'], 'ORANGE_MONEY_PAYIN')
+
+        # Regrouper par numéro de jour (ordre chronologique), libellé en date courte
+        jours = jour(df_transactions_success['Date'])
+
+    valides, montants, anomalies = montants_tcd(df_transactions_success, 'Crédit')
+    with mesurer('tableau croisé', len(df_transactions_success)):
+        par_jour = agreger(jours[valides], montants)
+    par_jour.index = libelles_jours(par_jour.index, 'Date_courte')
+    count_by_date = par_jour['count']
+    sum_by_date = par_jour['sum']
+    tcd = pd.DataFrame({'Nombre de Montant': count_by_date, 'Somme de Montant': sum_by_date})
+    return {'tcd': tcd, 'anomalies_montants': anomalies}
+
+
+"""
+TOGO MONEY PAYIN
+"""
+
+# Transactions "sell" / "Completed" dont le "Transaction Id" est absent des "ID PAIEMENT" en "SUCCES" du Back Office
+SPEC_NBSI_OP_TOGO_MONEY = SpecRapprochement(
+    'Transaction Id', 'ID PAIEMENT',
+    filtre_operateur={'Type': 'sell', 'State': 'Completed'},
+    filtre_back_office={'ETAT TRANSACTION': 'SUCCES'},
+)
+
+
+@instrumente
+def nbsi_op_togo_money_payin(df_operateur, df_back_office):
+    # Les écarts gardent un montant entier (et non un texte '1000.000') ; les cellules non numériques sont relevées à part
+    with mesurer('normalisation des montants', len(df_operateur)):
+        df_operateur, anomalies = normaliser_montants(df_operateur, ['Amount'])
+    return {
+        'ecarts': rapprocher(SPEC_NBSI_OP_TOGO_MONEY, df_operateur, df_back_office)['ecarts'],
+        'anomalies_montants': anomalies,
+        'doublons': doublons_nbsi_op('TOGO_MONEY_PAYIN', SPEC_NBSI_OP_TOGO_MONEY, df_operateur, df_back_office),
+    }
+
+
+@instrumente
+def nbsi_ecart_togo_money_payin(df_en_écart, df_en_echec, tolerance_secondes=None):
+    if tolerance_secondes:
+        # Même téléphone, date et heure à au plus `tolerance_secondes` près (la clé exacte ci-dessous n'a pas de montant)
+        with mesurer('recherchev par fenêtre de temps', len(df_en_écart) + len(df_en_echec)):
+            matched_df = remplir_fenetre(df_en_écart, df_en_echec, ['Initiator'], ['TÉLÉPHONE'], ('Date', None), ('CREATION', None),
+                                         tolerance_secondes, ['ID TRANSACTION', 'SITE_ID'], defaut=None)
+        return {'resultat': matched_df}
+
+    # Les dates entrent dans la clé sous leur forme canonique : une date Excel et le même
+    # horodatage écrit en texte (quel que soit son format connu) donnent la même clé
+    date_ecarts = canoniser_dates(df_en_écart['Date']).astype(str)
+    date_en_echec = canoniser_dates(df_en_echec['CREATION']).astype(str)
+
+    df_en_écart['Initiator'] = df_en_écart['Initiator'].astype(str)
+    df_en_écart['Date'] = df_en_écart['Date'].astype(str)
+
+    # Créer la colonne "External Transaction Id" des écarts
+    new_df_ecarts = pd.DataFrame(df_en_écart)
+    new_df_ecarts['External Transaction Id'] = new_df_ecarts['Initiator'] + date_ecarts
+
+    # Créer la colonne "External Transaction Id" des transactions en échec
+    df_en_echec['TÉLÉPHONE'] = df_en_echec['TÉLÉPHONE'].astype(str)
+    df_en_echec['CREATION'] = df_en_echec['CREATION'].astype(str)
+    df_en_echec['External Transaction Id'] = df_en_echec['TÉLÉPHONE'].astype(str) + date_en_echec
+
+    # Faire le matching des colonnes External Transaction Id
+    with mesurer('recherchev External Transaction Id', len(new_df_ecarts) + len(df_en_echec)):
+        index_en_echec = IndexRecherche(df_en_echec, 'External Transaction Id')
+        matched_df = index_en_echec.joindre(new_df_ecarts, 'External Transaction Id', ['ID TRANSACTION', 'SITE_ID'])
+    return {'resultat': matched_df}
+
+
+@instrumente
+def recherchev_togo_money_payin(df_ecarts, df_en_echec, tolerance_secondes=None):
+    if tolerance_secondes:
+        # Même téléphone et même montant, date et heure à au plus `tolerance_secondes` près
+        with mesurer('fusion par fenêtre de temps', len(df_ecarts) + len(df_en_echec)) as mesure:
+            merged_df = fusionner_fenetre(df_ecarts, df_en_echec, ['Initiator', 'Amount'], ['TÉLÉPHONE', 'MONTANT'], ('Date', 'heure'), ('CREATION', 'heure'), tolerance_secondes)
+            mesure.lignes_sortie = len(merged_df)
+    else:
+        # Fusionner les DataFrames des écarts et des transactions en échec sur la clé composite
+        # (Initiator, Amount, Date, heure) = (TÉLÉPHONE, MONTANT, CREATION, heure), hachée sur 64 bits
+        with mesurer('fusion sur clé composite hachée', len(df_ecarts) + len(df_en_echec)) as mesure:
+            merged_df = fusionner_sur_cles(df_ecarts, df_en_echec, ['Initiator', 'Amount', 'Date', 'heure'], ['TÉLÉPHONE', 'MONTANT', 'CREATION', 'heure'], how='left')
+            mesure.lignes_sortie = len(merged_df)
+
+    # Substituer les valeurs 'NA' par 'ACCEPTED' dans la colonne 'CPM_RESULT'
+    merged_df['CPM_RESULT'] = merged_df['CPM_RESULT'].replace('NA', 'ACCEPTED')
+
+    # Sélectionner et renommer les colonnes nécessaires
+    selected_columns = ['ID TRANSACTION', 'SITE_ID', 'CPM_RESULT', 'Transaction Id', 'Date']
+    result_table = merged_df[selected_columns].copy()
+    result_table.columns = ['ID transaction', 'Site ID', 'Résultat Paiement', 'Opérateur Transaction ID', 'Date Paiement']
+    if tolerance_secondes:
+        result_table[COLONNE_ECART] = merged_df[COLONNE_ECART]
+    return {'en_echec': df_en_echec, 'fusion': merged_df, 'resultat': result_table}
+
+
+@instrumente
+def tcd_togo_money_payin(df_transactions_success):
+    with mesurer('conversion des dates', len(df_transactions_success)):
+        df_transactions_success['Date'] = convertir_dates(df_transactions_success['Date'], 'TOGO_MONEY_PAYIN')
+
+    valides, montants, anomalies = montants_tcd(df_transactions_success, 'Crédit')
+    with mesurer('tableau croisé', len(df_transactions_success)):
+        tcd = agreger(df_transactions_success['Date'][valides], montants)
+    tcd.columns = ['Nombre de Montant', 'Somme de Montant']
+    tcd['Somme des Frais'] = tcd['Somme de Montant'] - tcd['Nombre de Montant']
+    return {'tcd': tcd, 'anomalies_montants': anomalies}
+
+
+"""
+ORANGE PENDING PAYOUT
+"""
+
+def cle_pending(df_pending):
+    # Créer la colonne "External Transaction Id" des pendings (3 derniers caractères du numéro)
+    df_pending['mobile_recepteur'] = df_pending['mobile_recepteur'].str[-3:]
+    df_pending['External Transaction Id'] = df_pending['mobile_recepteur'] + df_pending['created_at'] + df_pending['montant_transfert']
+    return df_pending
+
+
+def cle_operateur_payout(df_operateur):
+    # Créer la colonne "External Transaction Id" du fichier opérateur
+    df_operateur['External Transaction Id'] = df_operateur['N° de Compte2'] + df_operateur['Date'] + df_operateur['Débit']
+    return df_operateur
+
+
+# Pendings retrouvés dans le fichier opérateur (External Transaction Id), avec leur ID TRANSACTION et SITE_ID
+SPEC_PENDINGS_ORANGE_PAYOUT = SpecRapprochement(
+    'External Transaction Id', 'External Transaction Id',
+    preparation_operateur=cle_pending,
+    preparation_back_office=cle_operateur_payout,
+    colonnes_recherchees=['ID TRANSACTION', 'SITE_ID'],
+)
+
+
+@instrumente
+def pendings_orange_payout(df_pending, df_operateur):
+    verifier_colonnes(df_pending, ['mobile_recepteur', 'created_at', 'montant_transfert'], 'des pendings')
+    verifier_colonnes(df_operateur, ['N° de Compte2', 'Date', 'Débit'], 'des transactions en échec')
+
+    # Séparer les transactions correspondantes et les transactions en échec (non correspondantes)
+    resultats = rapprocher(SPEC_PENDINGS_ORANGE_PAYOUT, df_pending, df_operateur)
+    return {'correspondantes': resultats['correspondantes'], 'en_echec': resultats['ecarts']}
+
+
+# Spécification NBSI_OP de chaque opérateur, pour les doublons du relevé entier en mode incrémental
+SPECS_NBSI_OP = {
+    'MTN_PAYIN': SPEC_NBSI_OP_MTN,
+    'ORANGE_MAGMA_PAYIN': SPEC_NBSI_OP_ORANGE_MAGMA,
+    'ORANGE_MONEY_PAYIN': SPEC_NBSI_OP_ORANGE_MONEY,
+    'TOGO_MONEY_PAYIN': SPEC_NBSI_OP_TOGO_MONEY,
+}
+
+
+def doublons_releve(operateur, df_operateur, df_back_office):
+    return doublons_nbsi_op(operateur, SPECS_NBSI_OP[operateur], df_operateur, df_back_office)
+
+
+class Etape:
+    """
+    Description d'une étape pour l'exécution hors interface : fichiers attendus en entrée
+    (dans l'ordre des paramètres de la fonction) et fichiers produits par résultat.
+
+    `colonnes` donne, par entrée, les seules colonnes à lire quand l'étape n'utilise qu'elles ;
+    `requises` les colonnes à vérifier pour une entrée lue en entier (ses lignes sont recopiées
+    telles quelles dans les résultats). Les deux sont contrôlées sur l'en-tête du fichier.
+    `textes` donne, par entrée, les colonnes lues comme texte (numéros, dates et montants concaténés
+    dans une clé : un CSV les lirait sinon comme nombres).
+    `parametres` liste les paramètres facultatifs acceptés par la fonction (ex. tolerance_secondes).
+    `sources` indique, par entrée, le résultat ou l'entrée d'une étape précédente dont elle peut
+    être reprise dans l'interface sans réimport : {entrée: (étape, nom)} (voir artefacts.py).
+    """
+
+    def __init__(self, fonction, entrees, fichiers, avec_index=False, colonnes=None, requises=None, parametres=(), sources=None, textes=None):
+        self.fonction = fonction
+        self.entrees = entrees
+        self.fichiers = fichiers
+        self.avec_index = avec_index
+        self.colonnes = colonnes or {}
+        self.requises = requises or {}
+        self.parametres = tuple(parametres)
+        self.sources = sources or {}
+        self.textes = textes or {}
+
+    def executer(self, parametres=None, **dataframes):
+        # Les paramètres que l'étape n'accepte pas sont ignorés
+        parametres = {nom: valeur for nom, valeur in (parametres or {}).items() if nom in self.parametres}
+        return self.fonction(*(dataframes[entree] for entree in self.entrees), **parametres)
+
+    def options_lecture(self, entree):
+        options = {'colonnes': self.colonnes.get(entree), 'requises': self.requises.get(entree)}
+        if entree in self.textes:
+            options['dtype'] = {colonne: str for colonne in self.textes[entree]}
+        return options
+
+
+# Entrées reprises d'une étape précédente : écarts et fichier opérateur de NBSI_OP, transactions en échec de NBSI_ECART
+ECARTS_NBSI_OP = ('NBSI_OP', 'ecarts')
+OPERATEUR_NBSI_OP = ('NBSI_OP', 'operateur')
+EN_ECHEC_NBSI_ECART = ('NBSI_ECART', 'en_echec')
+
+# Étapes disponibles par opérateur (mêmes noms que les options de la page MTN PAYIN)
+ETAPES = {
+    'MTN_PAYIN': {
+        'NBSI_OP': Etape(
+            nbsi_op_mtn_payin, ['operateur', 'back_office'], {'ecarts': 'ecarts_test_mtn.xlsx', 'internes': 'transactions_internes.xlsx', 'doublons': 'doublons_mtn.xlsx'},
+            requises={'operateur': ['TransactionId', 'MSISDN', 'ResponseMessage'], 'back_office': ['TELEPHONE', 'ETAT TRANSACTION']},
+            parametres=['appariement'],
+        ),
+        'NBSI_ECART': Etape(
+            nbsi_ecart_mtn_payin, ['ecarts', 'en_echec'], {'resultat': 'ecarts.xlsx'},
+            requises={'en_echec': ['CUSTOM 6']},
+            sources={'ecarts': ECARTS_NBSI_OP},
+        ),
+        'RECHERCHEV': Etape(
+            recherchev_mtn_payin, ['ecarts', 'en_echec', 'operateur'], {'resultat': 'ecarts_mis_a_jour.xlsx'},
+            colonnes={'operateur': ['External Transaction Id', 'Date', 'HEURE']},
+            requises={'ecarts': ['External Transaction Id'], 'en_echec': ['External Transaction Id', 'ID TRANSACTION']},
+            sources={'ecarts': ECARTS_NBSI_OP, 'en_echec': EN_ECHEC_NBSI_ECART, 'operateur': OPERATEUR_NBSI_OP},
+        ),
+        'TCD': Etape(
+            tcd_mtn_payin, ['operateur'], {'tcd': 'tcd_transactions_success_mtn.xlsx'}, avec_index=True,
+            colonnes={'operateur': ['Date', 'Montant']}, sources={'operateur': OPERATEUR_NBSI_OP},
+        ),
+    },
+    'ORANGE_MAGMA_PAYIN': {
+        'NBSI_OP': Etape(
+            nbsi_op_orange_magma_payin, ['operateur', 'back_office'], {'ecarts': 'ecarts_orange_magma.xlsx', 'doublons': 'doublons_orange_magma.xlsx'},
+            requises={'operateur': ['TransactionID'], 'back_office': ['slug', 'Traitant']},
+        ),
+        'TCD': Etape(
+            tcd_orange_magma_payin, ['operateur'], {'tcd': 'tcd_transactions_success.xlsx'}, avec_index=True,
+            colonnes={'operateur': ['Created At', 'Amount']}, sources={'operateur': OPERATEUR_NBSI_OP},
+        ),
+    },
+    'ORANGE_MONEY_PAYIN': {
+        'NBSI_OP': Etape(
+            nbsi_op_orange_money_payin, ['operateur', 'back_office'], {'ecarts': 'ecarts_orange.xlsx', 'doublons': 'doublons_orange.xlsx'},
+            requises={'operateur': ['Référence'], 'back_office': ['ID PAIEMENT']},
+        ),
+        'NBSI_ECART': Etape(
+            nbsi_ecart_orange_money_payin, ['ecarts', 'en_echec'], {'resultat': 'ecarts_mis_a_jour.xlsx'},
+            requises={'ecarts': ['Référence'], 'en_echec': ['CUSTOM 6', 'ID TRANSACTION', 'SITE_ID']},
+            sources={'ecarts': ECARTS_NBSI_OP},
+        ),
+        'RECHERCHEV': Etape(
+            recherchev_orange_money_payin, ['ecarts', 'en_echec'], {'resultat': 'ecarts_mis_a_jour.xlsx'},
+            requises={'ecarts': ['N° de Compte2', 'Crédit', 'Date', 'Heure', 'Référence'], 'en_echec': ['TÉLÉPHONE', 'MONTANT', 'CREATION', 'heure', 'ID TRANSACTION', 'SITE_ID', 'CPM_RESULT']},
+            parametres=['tolerance_secondes'],
+            sources={'ecarts': ECARTS_NBSI_OP, 'en_echec': EN_ECHEC_NBSI_ECART},
+        ),
+        'TCD': Etape(
+            tcd_orange_money_payin, ['operateur'], {'tcd': 'tcd_orange_transactions_success.xlsx'}, avec_index=True,
+            colonnes={'operateur': ['Date', 'Crédit']}, sources={'operateur': OPERATEUR_NBSI_OP},
+        ),
+    },
+    'TOGO_MONEY_PAYIN': {
+        'NBSI_OP': Etape(
+            nbsi_op_togo_money_payin, ['operateur', 'back_office'], {'ecarts': 'ecarts_TMONEY.xlsx', 'doublons': 'doublons_TMONEY.xlsx'},
+            colonnes={'back_office': ['ID PAIEMENT', 'ETAT TRANSACTION']},
+            requises={'operateur': ['Type', 'State', 'Amount', 'Transaction Id']},
+        ),
+        'NBSI_ECART': Etape(
+            nbsi_ecart_togo_money_payin, ['ecarts', 'en_echec'], {'resultat': 'ecarts.xlsx'},
+            colonnes={'en_echec': ['TÉLÉPHONE', 'CREATION', 'ID TRANSACTION', 'SITE_ID']},
+            requises={'ecarts': ['Initiator', 'Date']},
+            parametres=['tolerance_secondes'],
+            sources={'ecarts': ECARTS_NBSI_OP},
+        ),
+        'RECHERCHEV': Etape(
+            recherchev_togo_money_payin, ['ecarts', 'en_echec'], {'resultat': 'ecarts_mis_a_jour.xlsx'},
+            requises={'ecarts': ['Initiator', 'Amount', 'Date', 'heure', 'Transaction Id'], 'en_echec': ['TÉLÉPHONE', 'MONTANT', 'CREATION', 'heure', 'ID TRANSACTION', 'SITE_ID', 'CPM_RESULT']},
+            parametres=['tolerance_secondes'],
+            sources={'ecarts': ECARTS_NBSI_OP, 'en_echec': EN_ECHEC_NBSI_ECART},
+        ),
+        'TCD': Etape(
+            tcd_togo_money_payin, ['operateur'], {'tcd': 'tcd_transactions_success_tmoney.xlsx'}, avec_index=True,
+            colonnes={'operateur': ['Date', 'Crédit']}, sources={'operateur': OPERATEUR_NBSI_OP},
+        ),
+    },
+    'ORANGE_PENDING_PAYOUT': {
+        'PENDINGS': Etape(
+            pendings_orange_payout, ['pending', 'operateur'], {'en_echec': 'transactions_en_echec.xlsx'},
+            colonnes={'operateur': ['N° de Compte2', 'Date', 'Débit', 'ID TRANSACTION', 'SITE_ID']},
+            requises={'pending': ['mobile_recepteur', 'created_at', 'montant_transfert']},
+            textes={'pending': ['mobile_recepteur', 'created_at', 'montant_transfert'], 'operateur': ['N° de Compte2', 'Date', 'Débit']},
+        ),
+    },
+}
+
+
+def options_lecture(operateur, nom_etape, entree):
+    # Paramètres de lire_fichier pour une entrée d'une étape (colonnes lues et vérifiées sur l'en-tête)
+    return dict(ETAPES[operateur][nom_etape].options_lecture(entree), operateur=operateur, type_source=entree)
@@ -0,0 +1,214 @@
+"""
+Moteur d'exécution des jointures et des agrégations : pandas, DuckDB ou Polars.
+
+pandas exécute les fusions et les tableaux croisés sur un seul cœur. DuckDB et Polars,
+qui tournent dans le processus, peuvent répartir une partie du travail sur plusieurs
+cœurs. Pour que les résultats soient identiques quel que soit le moteur, le moteur choisi
+ne calcule que l'appariement ou le regroupement, sur des entiers :
+  - pour une jointure, les clés des deux côtés sont codées ensemble (`factorize`, une
+    valeur vide étant une valeur comme une autre, comme dans `pd.merge`) ; le moteur
+    apparie les codes et retourne les couples (position à gauche, position à droite),
+    triés comme pandas les produirait ; les colonnes sont ensuite recopiées par pandas,
+    avec les mêmes noms, suffixes et types que `pd.merge` ;
+  - pour une agrégation nombre / somme, le moteur regroupe les codes des clés triées ;
+    les montants non entiers restent agrégés par pandas (l'ordre des additions en
+    parallèle changerait les derniers chiffres d'une somme de flottants).
+
+Le codage des clés (`factorize`) et l'assemblage des colonnes du résultat restent faits
+par pandas, sur un seul cœur : ils représentent à peu près la moitié d'une jointure, et
+le gain dépend du nombre de cœurs de la machine. Sur un seul cœur, les deux moteurs sont
+plus lents que `pd.merge`. benchmarks/bench_moteurs.py mesure chaque partie pour chaque
+moteur ; c'est à lui de trancher avant de changer le moteur d'une installation.
+
+Le moteur est choisi par `utiliser_moteur` (Hello.py, cli.py) ou par la variable
+d'environnement RAPPROCHEMENT_MOTEUR : 'pandas', 'duckdb', 'polars' ou 'auto' (défaut),
+qui garde pandas pour les petits fichiers ou sur une machine à un seul cœur, et prend le
+premier moteur installé au-delà de SEUIL_LIGNES_AUTO lignes. DuckDB et Polars sont
+facultatifs.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import mesurer
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    duckdb = None
+
+try:
+    import polars as pl
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    pl = None
+
+PANDAS = 'pandas'
+DUCKDB = 'duckdb'
+POLARS = 'polars'
+AUTO = 'auto'
+MOTEURS = [PANDAS, DUCKDB, POLARS]
+
+# En mode automatique, nombre de lignes (des deux côtés) à partir duquel un moteur multi-cœurs est utilisé
+SEUIL_LIGNES_AUTO = 500_000
+
+_local = threading.local()
+
+
+def moteurs_disponibles():
+    modules = {DUCKDB: duckdb, POLARS: pl}
+    return [PANDAS] + [moteur for moteur in MOTEURS[1:] if modules[moteur] is not None]
+
+
+def moteur_demande():
+    return getattr(_local, 'moteur', None) or os.environ.get('RAPPROCHEMENT_MOTEUR', AUTO)
+
+
+@contextmanager
+def utiliser_moteur(moteur):
+    """Choisit le moteur des jointures et agrégations exécutées dans le bloc."""
+    precedent = getattr(_local, 'moteur', None)
+    _local.moteur = moteur
+    try:
+        yield
+    finally:
+        _local.moteur = precedent
+
+
+def choisir_moteur(lignes, moteur=None):
+    moteur = moteur or moteur_demande()
+    disponibles = moteurs_disponibles()
+    if moteur == AUTO:
+        if lignes < SEUIL_LIGNES_AUTO or len(disponibles) == 1 or (os.cpu_count() or 1) == 1:
+            return PANDAS
+        return disponibles[1]
+    if moteur not in disponibles:
+        raise ValueError(f"Moteur d'exécution indisponible : {moteur} (disponibles : {', '.join(disponibles)})")
+    return moteur
+
+
+# ---------------------------------------------------------------------------
+# Jointures
+# ---------------------------------------------------------------------------
+
+def codes_jointure(gauche, droite, cles_gauche, cles_droite):
+    """
+    Code les clés des deux côtés par les mêmes entiers. Les valeurs vides reçoivent un code
+    comme les autres : `pd.merge` rapproche aussi les clés vides entre elles.
+    """
+    codes = np.zeros(len(gauche) + len(droite), dtype=np.int64)
+    for cle_gauche, cle_droite in zip(cles_gauche, cles_droite):
+        valeurs = pd.concat([gauche[cle_gauche], droite[cle_droite]], ignore_index=True)
+        codes_colonne, distinctes = pd.factorize(valeurs, use_na_sentinel=False)
+        codes, _ = pd.factorize(codes * len(distinctes) + codes_colonne)
+    return codes[:len(gauche)], codes[len(gauche):]
+
+
+def paires_duckdb(codes_gauche, codes_droite, how):
+    connexion = duckdb.connect()
+    try:
+        connexion.register('gauche', pd.DataFrame({'code': codes_gauche, 'position': np.arange(len(codes_gauche))}))
+        connexion.register('droite', pd.DataFrame({'code': codes_droite, 'position': np.arange(len(codes_droite))}))
+        jointure = 'LEFT JOIN' if how == 'left' else 'JOIN'
+        paires = connexion.execute(
+            f"SELECT gauche.position AS g, COALESCE(droite.position, -1) AS d "
+            f"FROM gauche {jointure} droite ON gauche.code = droite.code ORDER BY g, d"
+        ).fetchnumpy()
+    finally:
+        connexion.close()
+    return np.asarray(paires['g'], dtype=np.int64), np.asarray(paires['d'], dtype=np.int64)
+
+
+def paires_polars(codes_gauche, codes_droite, how):
+    gauche = pl.DataFrame({'code': codes_gauche, 'g': np.arange(len(codes_gauche))})
+    droite = pl.DataFrame({'code': codes_droite, 'd': np.arange(len(codes_droite))})
+    # L'ordre de pandas (lignes de gauche, puis correspondances dans l'ordre de droite) est conservé par la jointure, sans tri
+    paires = gauche.join(droite, on='code', how=how, maintain_order='left_right').with_columns(pl.col('d').fill_null(-1))
+    return paires['g'].to_numpy().astype(np.int64), paires['d'].to_numpy().astype(np.int64)
+
+
+PAIRES = {DUCKDB: paires_duckdb, POLARS: paires_polars}
+
+
+def assembler(gauche, droite, positions_gauche, positions_droite, cles_gauche, cles_droite, suffixes=('_x', '_y'), indicator=False):
+    """
+    Construit le résultat d'une fusion à partir des couples de positions, avec les colonnes de
+    `pd.merge` : colonnes de gauche puis de droite, clé commune une seule fois, suffixes pour les
+    autres noms en conflit, valeurs vides (et types élargis) pour les lignes sans correspondance.
+    """
+    cles_communes = {cle_gauche for cle_gauche, cle_droite in zip(cles_gauche, cles_droite) if cle_gauche == cle_droite}
+    conflits = (set(gauche.columns) & set(droite.columns)) - cles_communes
+    partie_gauche = gauche.reset_index(drop=True).take(positions_gauche)
+    partie_gauche = partie_gauche.rename(columns={colonne: f'{colonne}{suffixes[0]}' for colonne in conflits})
+    partie_droite = droite.drop(columns=list(cles_communes)).reset_index(drop=True).reindex(positions_droite)
+    partie_droite = partie_droite.rename(columns={colonne: f'{colonne}{suffixes[1]}' for colonne in conflits})
+    fusion = pd.concat([partie_gauche.reset_index(drop=True), partie_droite.reset_index(drop=True)], axis=1)
+    if indicator:
+        fusion['_merge'] = pd.Categorical(np.where(positions_droite >= 0, 'both', 'left_only'), categories=['left_only', 'right_only', 'both'])
+    return fusion
+
+
+def fusionner(gauche, droite, left_on=None, right_on=None, on=None, how='inner', suffixes=('_x', '_y'), indicator=False, moteur=None):
+    """
+    Équivalent de `pd.merge` (jointures 'inner' et 'left') exécuté par le moteur choisi.
+    Avec pandas, `pd.merge` est appelé tel quel.
+    """
+    moteur = choisir_moteur(len(gauche) + len(droite), moteur)
+    if moteur == PANDAS or how not in ('inner', 'left'):
+        return pd.merge(gauche, droite, left_on=left_on, right_on=right_on, on=on, how=how, suffixes=suffixes, indicator=indicator)
+    cles_gauche = [on or left_on] if isinstance(on or left_on, str) else list(on or left_on)
+    cles_droite = [on or right_on] if isinstance(on or right_on, str) else list(on or right_on)
+    with mesurer(f"jointure {moteur}", len(gauche) + len(droite)) as mesure:
+        codes_gauche, codes_droite = codes_jointure(gauche, droite, cles_gauche, cles_droite)
+        positions_gauche, positions_droite = PAIRES[moteur](codes_gauche, codes_droite, how)
+        fusion = assembler(gauche, droite, positions_gauche, positions_droite, cles_gauche, cles_droite, suffixes, indicator)
+        mesure.lignes_sortie = len(fusion)
+    return fusion
+
+
+# ---------------------------------------------------------------------------
+# Agrégations
+# ---------------------------------------------------------------------------
+
+def nombre_somme_duckdb(codes, valeurs):
+    connexion = duckdb.connect()
+    try:
+        connexion.register('lignes', pd.DataFrame({'code': codes, 'valeur': valeurs}))
+        groupes = connexion.execute(
+            "SELECT code, count(valeur) AS nombre, CAST(sum(valeur) AS BIGINT) AS somme "
+            "FROM lignes WHERE code >= 0 GROUP BY code ORDER BY code"
+        ).fetchnumpy()
+    finally:
+        connexion.close()
+    return np.asarray(groupes['code']), np.asarray(groupes['nombre'], dtype=np.int64), np.asarray(groupes['somme'], dtype=np.int64)
+
+
+def nombre_somme_polars(codes, valeurs):
+    lignes = pl.DataFrame({'code': codes, 'valeur': valeurs}).filter(pl.col('code') >= 0)
+    groupes = lignes.group_by('code').agg(
+        pl.col('valeur').count().alias('nombre'),
+        pl.col('valeur').sum().alias('somme'),
+    ).sort('code')
+    return groupes['code'].to_numpy(), groupes['nombre'].to_numpy().astype(np.int64), groupes['somme'].to_numpy().astype(np.int64)
+
+
+NOMBRE_SOMME = {DUCKDB: nombre_somme_duckdb, POLARS: nombre_somme_polars}
+
+
+def agreger(cles, valeurs, moteur=None):
+    """
+    Nombre et somme des `valeurs` par clé (colonnes 'count' et 'sum', clés triées, clés vides
+    ignorées), comme `valeurs.groupby(cles).agg(['count', 'sum'])`.
+    """
+    moteur = choisir_moteur(len(cles), moteur)
+    if moteur == PANDAS or not pd.api.types.is_integer_dtype(valeurs) or pd.api.types.is_extension_array_dtype(valeurs):
+        return valeurs.groupby(cles).agg(['count', 'sum'])
+    with mesurer(f"agrégation {moteur}", len(cles)) as mesure:
+        codes, distinctes = pd.factorize(cles, sort=True)
+        codes_groupes, nombres, sommes = NOMBRE_SOMME[moteur](codes, valeurs.to_numpy(dtype=np.int64))
+        index = pd.Index(distinctes).take(codes_groupes).rename(getattr(cles, 'name', None))
+        resultat = pd.DataFrame({'count': nombres, 'sum': sommes}, index=index)
+        mesure.lignes_sortie = len(resultat)
+    return resultat
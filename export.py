@@ -0,0 +1,165 @@
+"""
+Export des résultats en fichiers Excel téléchargeables.
+
+Au lieu d'encoder chaque classeur en base64 dans un lien `data:` injecté dans la page
+(le classeur était alors gardé trois fois en mémoire et renvoyé au navigateur à chaque
+relance, même sans téléchargement), le fichier n'est généré qu'au clic sur
+« Préparer » puis servi par `st.download_button`. Les gros résultats sont écrits dans
+un fichier temporaire plutôt qu'en mémoire, et ce fichier n'est lu qu'au clic sur le
+bouton de téléchargement (données fournies par une fonction), pas à chaque relance.
+
+Un export préparé est rangé dans la session sous la clé du résultat (opérateur, étape,
+nom du résultat) : deux pages qui produisent un fichier de même nom ne partagent pas
+leur export. Il reste valable tant que l'étape présente le même DataFrame, ce qui se
+vérifie sans relire les données ; l'empreinte du contenu n'est recalculée que lorsque
+l'objet change (étape exécutée de nouveau).
+
+Streamlit ne signale pas la fin d'une session : un fichier temporaire est supprimé
+quand son export est abandonné, quand l'état de la session est libéré, à l'arrêt du
+serveur, et au plus tard quand plus de EXPORTS_TEMPORAIRES_MAX fichiers existent.
+"""
+import io
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from instrumentation import mesurer
+
+# Au-delà de ce nombre de cellules, le classeur est écrit dans un fichier temporaire
+SEUIL_CELLULES_FICHIER_TEMPORAIRE = 200_000
+
+# Nombre maximal de fichiers temporaires conservés, toutes sessions confondues
+# (modifiable par la variable d'environnement RAPPROCHEMENT_EXPORTS_TEMPORAIRES)
+EXPORTS_TEMPORAIRES_MAX = int(os.environ.get('RAPPROCHEMENT_EXPORTS_TEMPORAIRES', 8))
+
+TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def ecrire_excel(df, destination, avec_index=False):
+    with pd.ExcelWriter(destination, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=avec_index)
+
+
+def empreinte_dataframe(df):
+    # Identifie le contenu du résultat pour savoir si un export déjà préparé est encore valable
+    return (df.shape, tuple(map(str, df.columns)), int(pd.util.hash_pandas_object(df, index=True).sum()))
+
+
+def supprimer_fichier(chemin):
+    try:
+        os.remove(chemin)
+    except FileNotFoundError:
+        pass
+
+
+class FichiersTemporaires:
+    """Fichiers temporaires des exports, du plus ancien au plus récent, bornés en nombre."""
+
+    def __init__(self, maximum=EXPORTS_TEMPORAIRES_MAX):
+        self.maximum = maximum
+        self._chemins = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def ajouter(self, chemin):
+        with self._verrou:
+            self._chemins[chemin] = None
+            anciens = []
+            while len(self._chemins) > self.maximum:
+                anciens.append(self._chemins.popitem(last=False)[0])
+        for ancien in anciens:
+            supprimer_fichier(ancien)
+
+    def retirer(self, chemin):
+        with self._verrou:
+            self._chemins.pop(chemin, None)
+        supprimer_fichier(chemin)
+
+    def __len__(self):
+        return len(self._chemins)
+
+
+fichiers_temporaires = FichiersTemporaires()
+
+
+class Export:
+    """
+    Classeur préparé pour un résultat : octets en mémoire (`donnees`) ou fichier temporaire (`chemin`).
+    Le fichier est supprimé par `supprimer()`, ou quand l'export est libéré avec l'état de la session.
+    """
+
+    def __init__(self, df, donnees=None, chemin=None):
+        self.donnees = donnees
+        self.chemin = chemin
+        self.empreinte = empreinte_dataframe(df)
+        self._source = weakref.ref(df)
+        self._suppression = weakref.finalize(self, fichiers_temporaires.retirer, chemin) if chemin else None
+
+    def valable(self, df):
+        # Fichier temporaire supprimé entre-temps (limite EXPORTS_TEMPORAIRES_MAX atteinte) : à préparer de nouveau
+        if self.chemin and not os.path.exists(self.chemin):
+            return False
+        if self._source() is df:
+            return True
+        # Autre objet (étape exécutée de nouveau) : l'export reste valable si le contenu est identique
+        if self.empreinte != empreinte_dataframe(df):
+            return False
+        self._source = weakref.ref(df)
+        return True
+
+    def lire(self):
+        # Appelée par le bouton de téléchargement, au clic seulement
+        with open(self.chemin, 'rb') as fichier:
+            return fichier.read()
+
+    def supprimer(self):
+        if self._suppression is not None:
+            self._suppression()
+
+
+def generer_export(df, avec_index=False):
+    """Écrit le classeur et retourne l'export : octets en mémoire ou fichier temporaire."""
+    if df.size > SEUIL_CELLULES_FICHIER_TEMPORAIRE:
+        descripteur, chemin = tempfile.mkstemp(prefix='export_', suffix='.xlsx')
+        os.close(descripteur)
+        ecrire_excel(df, chemin, avec_index)
+        fichiers_temporaires.ajouter(chemin)
+        return Export(df, chemin=chemin)
+    donnees = io.BytesIO()
+    ecrire_excel(df, donnees, avec_index)
+    return Export(df, donnees=donnees.getvalue())
+
+
+def supprimer_export(export):
+    if export is not None:
+        export.supprimer()
+
+
+def proposer_telechargement(df, nom_fichier, libelle, cle, avec_index=False):
+    """
+    Affiche un bouton « Préparer » puis, une fois le classeur généré, le bouton de téléchargement.
+    `cle` identifie le résultat (ex. 'MTN_PAYIN NBSI_OP ecarts') : l'export préparé est conservé
+    dans la session sous cette clé tant que le résultat ne change pas.
+    """
+    cle = f"export_{cle}"
+    export = st.session_state.get(cle)
+
+    # Un export préparé pour un résultat différent (nouveaux fichiers importés) est abandonné
+    if export is not None and not export.valable(df):
+        supprimer_export(export)
+        export = None
+        del st.session_state[cle]
+
+    if export is None:
+        if not st.button(f"Préparer : {libelle}", key=f"preparer_{cle}"):
+            return
+        with st.spinner("Génération du fichier Excel..."), mesurer(f"export {nom_fichier}", len(df)):
+            export = generer_export(df, avec_index)
+        st.session_state[cle] = export
+
+    donnees = export.lire if export.chemin else export.donnees
+    st.download_button(libelle, data=donnees, file_name=nom_fichier, mime=TYPE_XLSX, key=f"telecharger_{cle}")
@@ -0,0 +1,84 @@
+"""
+Rapprochement par fenêtre de temps, pour les transactions sans identifiant commun.
+
+Les étapes Orange et TMoney rapprochent les écarts des transactions en échec par égalité
+exacte de téléphone + montant + date + heure : une seconde de décalage entre l'horloge de
+l'opérateur et celle du Back Office suffit à créer un faux écart. Ici, le téléphone et le
+montant restent exacts (empreinte uint64 des composantes normalisées, voir cles.py) et
+l'horodatage peut différer d'au plus `tolerance_secondes`.
+
+L'appariement est une jointure « as-of » (`pd.merge_asof`) : les deux côtés sont triés par
+horodatage puis, pour chaque ligne, la transaction la plus proche de la même partition
+téléphone + montant est retenue. Le coût est celui du tri, en n·log n, sans comparer
+toutes les paires candidates.
+"""
+import numpy as np
+import pandas as pd
+
+from cles import cle_hachee
+from dates import epoque_date_heure
+from execution import assembler
+
+# Colonne ajoutée aux fusions : décalage (secondes) entre l'horodatage retenu à droite et celui de gauche
+COLONNE_ECART = 'Écart horodatage (s)'
+
+
+def positions_fenetre(gauche, droite, cles_gauche, cles_droite, temps_gauche, temps_droite, tolerance_secondes):
+    """
+    Pour chaque ligne de `gauche`, position (0..n-1) de la ligne de `droite` de mêmes clés dont
+    l'horodatage est le plus proche, dans la tolérance (-1 sinon), et le décalage en secondes.
+    `temps_gauche` / `temps_droite` : (colonne date, colonne heure ou None).
+    """
+    secondes_gauche = epoque_date_heure(gauche[temps_gauche[0]], gauche[temps_gauche[1]] if temps_gauche[1] else None)
+    secondes_droite = epoque_date_heure(droite[temps_droite[0]], droite[temps_droite[1]] if temps_droite[1] else None)
+    cotes = []
+    for df, cles, secondes, nom in ((gauche, cles_gauche, secondes_gauche, 'gauche'), (droite, cles_droite, secondes_droite, 'droite')):
+        cote = pd.DataFrame({
+            'cle': cle_hachee(df, cles).to_numpy().view('int64'),
+            'temps': secondes.to_numpy(dtype='float64'),
+            f'position_{nom}': np.arange(len(df)),
+        })
+        # Une ligne sans horodatage reconnu n'est pas rapprochée
+        cote = cote[~np.isnan(cote['temps'].to_numpy())].astype({'temps': 'int64'})
+        cotes.append(cote.sort_values('temps', kind='stable'))
+    cote_gauche, cote_droite = cotes
+    cote_droite = cote_droite.assign(temps_droite=cote_droite['temps'])
+
+    appariement = pd.merge_asof(
+        cote_gauche, cote_droite, on='temps', by='cle',
+        direction='nearest', tolerance=int(tolerance_secondes), allow_exact_matches=True,
+    )
+    trouvees = appariement['position_droite'].notna().to_numpy()
+    positions = np.full(len(gauche), -1, dtype=np.int64)
+    ecarts = np.full(len(gauche), np.nan)
+    lignes = appariement['position_gauche'].to_numpy()[trouvees]
+    positions[lignes] = appariement['position_droite'].to_numpy()[trouvees].astype(np.int64)
+    ecarts[lignes] = (appariement['temps_droite'] - appariement['temps']).to_numpy(dtype='float64')[trouvees]
+    return positions, pd.array(ecarts, dtype='Int64')
+
+
+def fusionner_fenetre(gauche, droite, cles_gauche, cles_droite, temps_gauche, temps_droite, tolerance_secondes):
+    """
+    Équivalent de `fusionner_sur_cles(..., how='left')` où la date et l'heure peuvent différer
+    d'au plus `tolerance_secondes` : une ligne par ligne de gauche, colonnes de droite vides sans
+    correspondance, suffixes '_x' / '_y' pour les noms en conflit, plus la colonne COLONNE_ECART.
+    """
+    positions, ecarts = positions_fenetre(gauche, droite, cles_gauche, cles_droite, temps_gauche, temps_droite, tolerance_secondes)
+    fusion = assembler(gauche, droite, np.arange(len(gauche)), positions, [], [])
+    fusion[COLONNE_ECART] = ecarts
+    return fusion
+
+
+def remplir_fenetre(df, reference, cles, cles_reference, temps, temps_reference, tolerance_secondes, colonnes, defaut=''):
+    """
+    Équivalent de `IndexRecherche.remplir` par fenêtre de temps : les `colonnes` de la transaction
+    de référence la plus proche sont recopiées dans `df` (`defaut` sans correspondance).
+    """
+    positions, ecarts = positions_fenetre(df, reference, cles, cles_reference, temps, temps_reference, tolerance_secondes)
+    trouvees = positions >= 0
+    for colonne in colonnes:
+        valeurs = np.full(len(df), defaut, dtype=object)
+        valeurs[trouvees] = reference[colonne].to_numpy(dtype=object)[positions[trouvees]]
+        df[colonne] = valeurs
+    df[COLONNE_ECART] = ecarts
+    return df
@@ -0,0 +1,203 @@
+"""
+Rapprochement incrémental de l'étape NBSI_OP.
+
+Les fichiers opérateur sont importés chaque jour en cumul depuis le début du mois :
+sans mémoire des exécutions précédentes, le 28 du mois refait le matching de 27 jours
+déjà traités. Pour chaque opérateur, on conserve :
+  - l'index des transactions opérateur déjà traitées (identifiant, empreinte de la ligne, statut),
+  - le résultat cumulé de l'étape (écarts, transactions internes...),
+  - la date la plus récente déjà vue, affichée à titre indicatif.
+
+Une exécution ne traite alors que les lignes nouvelles ou modifiées, plus les écarts
+précédents (le Back Office a pu rattraper son retard), et fusionne le résultat avec
+le résultat enregistré. Les lignes à traiter sont choisies par leurs empreintes et non
+par leur date : une transaction antérieure à la date la plus récente peut arriver en
+retard dans le cumul, ou y être corrigée.
+
+En appariement un à un, une ligne Back Office rapprochée d'une transaction déjà traitée
+est consommée : elle n'est plus proposée aux lignes retraitées. Son empreinte est
+conservée dans le résultat enregistré, sur la ligne de la transaction interne.
+
+Le rapport des doublons fait exception : il est recalculé sur le relevé entier, les
+deux exemplaires d'une transaction pouvant être l'un déjà traité, l'autre nouveau.
+
+L'état ne garde que les transactions du relevé importé : au changement de mois, les
+transactions du mois précédent (et leurs écarts) disparaissent du résultat et de l'index.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from appariement import numeros_occurrence
+from entrepot import COLONNES_DATE
+from etapes import doublons_releve
+
+# Dossier de l'état incrémental (modifiable par la variable d'environnement RAPPROCHEMENT_ETAT)
+DOSSIER_ETAT = os.environ.get('RAPPROCHEMENT_ETAT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etat_incremental'))
+
+# Par opérateur : identifiant de la transaction opérateur, et colonnes de matching opérateur / Back Office
+COLONNES_INCREMENTALES = {
+    'MTN_PAYIN': {'id': 'TransactionId', 'cle': 'MSISDN', 'cle_back_office': 'TELEPHONE'},
+    'TOGO_MONEY_PAYIN': {'id': 'Transaction Id', 'cle': 'Transaction Id', 'cle_back_office': 'ID PAIEMENT'},
+}
+
+COLONNE_ID_INTERNE = '_id_incremental'
+COLONNE_EMPREINTE_BACK_OFFICE = '_empreinte_back_office'
+STATUT_ECART = 'ecart'
+STATUT_TRAITE = 'traite'
+
+
+class RapprochementIncremental:
+
+    def __init__(self, operateur, dossier=DOSSIER_ETAT):
+        if operateur not in COLONNES_INCREMENTALES:
+            raise ValueError(f"Le mode incrémental n'est pas disponible pour {operateur}")
+        self.operateur = operateur
+        self.colonnes = COLONNES_INCREMENTALES[operateur]
+        self.dossier = os.path.join(dossier, operateur)
+
+    def _chemin(self, nom):
+        return os.path.join(self.dossier, nom)
+
+    def charger_etat(self):
+        etat = {'date_max_vue': None, 'derniere_execution': None, 'resultats': []}
+        if os.path.exists(self._chemin('etat.json')):
+            with open(self._chemin('etat.json'), encoding='utf-8') as f:
+                etat.update(json.load(f))
+            # Nom de la date la plus récente dans les états enregistrés par les versions précédentes
+            if 'high_water_mark' in etat:
+                etat['date_max_vue'] = etat.pop('high_water_mark')
+        if os.path.exists(self._chemin('index.pkl')):
+            index = pd.read_pickle(self._chemin('index.pkl'))
+        else:
+            index = pd.DataFrame({'id': pd.Series(dtype=object), 'empreinte': pd.Series(dtype='uint64'), 'statut': pd.Series(dtype=object)})
+        if os.path.exists(self._chemin('back_office.pkl')):
+            empreintes_back_office = pd.read_pickle(self._chemin('back_office.pkl'))
+        else:
+            empreintes_back_office = pd.Series(dtype='uint64')
+        resultats = {nom: pd.read_pickle(self._chemin(f'resultat_{nom}.pkl')) for nom in etat['resultats']}
+        return etat, index, empreintes_back_office, resultats
+
+    def enregistrer_etat(self, etat, index, empreintes_back_office, resultats):
+        os.makedirs(self.dossier, exist_ok=True)
+        index.to_pickle(self._chemin('index.pkl'))
+        empreintes_back_office.to_pickle(self._chemin('back_office.pkl'))
+        for nom, df in resultats.items():
+            df.to_pickle(self._chemin(f'resultat_{nom}.pkl'))
+        etat = dict(etat, resultats=list(resultats))
+        temporaire = self._chemin('etat.json.tmp')
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump(etat, f, ensure_ascii=False, indent=1)
+        os.replace(temporaire, self._chemin('etat.json'))
+
+    def reinitialiser(self):
+        if os.path.isdir(self.dossier):
+            for nom in os.listdir(self.dossier):
+                os.remove(self._chemin(nom))
+
+    def executer(self, fonction, df_operateur, df_back_office, nom_ecarts='ecarts', un_a_un=False):
+        """
+        Exécute `fonction(df_operateur, df_back_office)` sur les seules lignes opérateur à traiter
+        et retourne (résultats cumulés, statistiques de l'exécution).
+
+        Sont retraitées : les lignes opérateur nouvelles ou modifiées, les écarts de l'exécution
+        précédente, et les lignes dont la clé de matching apparaît dans une ligne Back Office
+        nouvelle ou modifiée. Le Back Office est passé en entier à l'étape, sauf, avec `un_a_un`,
+        les lignes déjà rapprochées des transactions qui ne sont pas retraitées.
+        """
+        etat, index, empreintes_back_office, resultats_precedents = self.charger_etat()
+
+        ids = df_operateur[self.colonnes['id']].astype(str)
+        empreintes = pd.util.hash_pandas_object(df_operateur, index=False)
+        connus = index.drop_duplicates('id', keep='last').set_index('id')
+
+        # Lignes Back Office absentes de l'exécution précédente : leurs clés de matching sont à revoir
+        empreintes_bo = pd.util.hash_pandas_object(df_back_office, index=False)
+        nouvelles_bo = ~empreintes_bo.isin(empreintes_back_office)
+        cles_a_revoir = df_back_office.loc[nouvelles_bo.to_numpy(), self.colonnes['cle_back_office']].astype(str)
+
+        # Lignes nouvelles, modifiées, en écart lors de l'exécution précédente, ou touchées par le Back Office
+        empreinte_precedente = ids.map(connus['empreinte'])
+        statut_precedent = ids.map(connus['statut'])
+        a_traiter = (
+            empreinte_precedente.isna()
+            | (empreinte_precedente != empreintes)
+            | (statut_precedent == STATUT_ECART)
+            | df_operateur[self.colonnes['cle']].astype(str).isin(cles_a_revoir)
+        ).to_numpy()
+
+        sous_ensemble = df_operateur[a_traiter].assign(**{COLONNE_ID_INTERNE: ids[a_traiter].to_numpy()})
+        # Transactions du relevé dont le résultat enregistré est repris tel quel ; les autres lignes
+        # enregistrées sont retraitées ou ne figurent plus dans le relevé (mois précédent)
+        ids_conserves = set(ids[~a_traiter]) - set(ids[a_traiter])
+        back_office_etape = df_back_office
+        if un_a_un:
+            back_office_etape = self._back_office_libre(df_back_office, empreintes_bo, resultats_precedents, ids_conserves)
+        nouveaux_resultats = fonction(sous_ensemble, back_office_etape)
+
+        # Fusion avec le résultat enregistré : les lignes retraitées remplacent les anciennes
+        resultats = {}
+        for nom, df in nouveaux_resultats.items():
+            precedent = resultats_precedents.get(nom)
+            if precedent is not None and COLONNE_ID_INTERNE in df.columns:
+                precedent = precedent[precedent[COLONNE_ID_INTERNE].isin(ids_conserves)]
+                # Un résultat vide ne participe pas à la concaténation (il ferait perdre les types des colonnes)
+                df = pd.concat([partie for partie in (precedent, df) if not partie.empty] or [df], ignore_index=True)
+            resultats[nom] = df
+        if 'doublons' in nouveaux_resultats:
+            resultats['doublons'] = doublons_releve(self.operateur, df_operateur, df_back_office)
+
+        # Mise à jour de l'index des transactions traitées
+        ids_en_ecart = set(resultats[nom_ecarts][COLONNE_ID_INTERNE]) if nom_ecarts in resultats else set()
+        traitees = pd.DataFrame({'id': ids[a_traiter].to_numpy(), 'empreinte': empreintes[a_traiter].to_numpy()})
+        traitees['statut'] = traitees['id'].map(lambda identifiant: STATUT_ECART if identifiant in ids_en_ecart else STATUT_TRAITE)
+        index = pd.concat([index[index['id'].isin(ids_conserves)], traitees], ignore_index=True)
+        empreintes_back_office = pd.Series(pd.unique(empreintes_bo.to_numpy()), dtype='uint64')
+
+        date_max = self._date_max(df_operateur)
+        if date_max is not None and (etat['date_max_vue'] is None or date_max > etat['date_max_vue']):
+            etat['date_max_vue'] = date_max
+        etat['derniere_execution'] = datetime.now().isoformat(timespec='seconds')
+        self.enregistrer_etat(etat, index, empreintes_back_office, resultats)
+
+        statistiques = {
+            'lignes': len(df_operateur),
+            'lignes_traitees': int(a_traiter.sum()),
+            'lignes_ignorees': int((~a_traiter).sum()),
+            'lignes_back_office_nouvelles': int(nouvelles_bo.sum()),
+            'date_max_vue': etat['date_max_vue'],
+        }
+        resultats = {nom: df.drop(columns=[COLONNE_ID_INTERNE, COLONNE_EMPREINTE_BACK_OFFICE], errors='ignore') for nom, df in resultats.items()}
+        return resultats, statistiques
+
+    @staticmethod
+    def _back_office_libre(df_back_office, empreintes_bo, resultats_precedents, ids_conserves):
+        """
+        Lignes Back Office que les transactions retraitées peuvent rapprocher : toutes, sauf celles
+        déjà rapprochées (un à un) des transactions conservées (`ids_conserves`). Des lignes identiques ont la même
+        empreinte : pour une empreinte consommée k fois, ses k premières lignes sont retirées.
+        L'empreinte de chaque ligne est ajoutée, pour être recopiée dans les transactions internes.
+        """
+        consommees = [
+            precedent.loc[precedent[COLONNE_ID_INTERNE].isin(ids_conserves), COLONNE_EMPREINTE_BACK_OFFICE]
+            for precedent in resultats_precedents.values()
+            if COLONNE_ID_INTERNE in precedent.columns and COLONNE_EMPREINTE_BACK_OFFICE in precedent.columns
+        ]
+        libres = np.ones(len(df_back_office), dtype=bool)
+        if consommees:
+            comptes = pd.concat(consommees, ignore_index=True).dropna().astype('uint64').value_counts()
+            deja_rapprochees = empreintes_bo.map(comptes).fillna(0).to_numpy(dtype=np.int64)
+            libres = numeros_occurrence(empreintes_bo.to_numpy()) >= deja_rapprochees
+        return df_back_office[libres].assign(**{COLONNE_EMPREINTE_BACK_OFFICE: empreintes_bo[libres].to_numpy()})
+
+    @staticmethod
+    def _date_max(df):
+        for colonne in COLONNES_DATE:
+            if colonne in df.columns:
+                dates = pd.to_datetime(df[colonne], errors='coerce')
+                if dates.notna().any():
+                    return dates.max().isoformat()
+        return None
@@ -0,0 +1,160 @@
+"""
+Mesure du temps, du nombre de lignes et du pic mémoire de chaque phase d'une étape.
+
+Hello.py ouvre un collecteur pour la page affichée (`collecter`) ; la lecture des fichiers,
+les fonctions d'étape (décorées par `instrumente`), leurs phases internes (`mesurer`),
+l'export Excel et l'affichage y inscrivent leurs mesures. En dehors d'un collecteur,
+`mesurer` ne coûte presque rien : les étapes restent utilisables telles quelles depuis cli.py.
+
+Le pic mémoire est mesuré avec tracemalloc, qui ralentit l'exécution : il n'est relevé
+que si le collecteur est ouvert avec `memoire=True`.
+"""
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# Journal local des mesures (modifiable par la variable d'environnement RAPPROCHEMENT_METRIQUES)
+JOURNAL_METRIQUES = os.environ.get('RAPPROCHEMENT_METRIQUES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metriques.csv'))
+
+_local = threading.local()
+
+
+class Mesure:
+
+    def __init__(self, nom, niveau=0, lignes_entree=None):
+        self.nom = nom
+        self.niveau = niveau
+        self.lignes_entree = lignes_entree
+        self.lignes_sortie = None
+        self.detail = ''
+        self.duree = 0.0
+        self.pic_octets = None
+
+
+class Collecteur:
+
+    def __init__(self, page, memoire=False):
+        self.page = page
+        self.memoire = memoire
+        self.mesures = []
+        self._pile = []
+        # Fonction appelée au début de chaque phase (suivi d'une tâche en arrière-plan, voir taches.py)
+        self.rappel = None
+
+    def tableau(self):
+        lignes = []
+        for mesure in self.mesures:
+            lignes.append({
+                'Phase': '    ' * mesure.niveau + mesure.nom,
+                'Lignes en entrée': mesure.lignes_entree,
+                'Lignes en sortie': mesure.lignes_sortie,
+                'Durée (s)': round(mesure.duree, 3),
+                'Pic mémoire (Mo)': round(mesure.pic_octets / 1024 ** 2, 1) if mesure.pic_octets is not None else None,
+                'Détail': mesure.detail,
+            })
+        tableau = pd.DataFrame(lignes, columns=['Phase', 'Lignes en entrée', 'Lignes en sortie', 'Durée (s)', 'Pic mémoire (Mo)', 'Détail'])
+        return tableau.astype({'Lignes en entrée': 'Int64', 'Lignes en sortie': 'Int64'})
+
+    def enregistrer(self, chemin=JOURNAL_METRIQUES):
+        # Ajoute les mesures au journal CSV, une ligne par phase
+        if not self.mesures:
+            return
+        horodatage = datetime.now().isoformat(timespec='seconds')
+        journal = pd.DataFrame([{
+            'date': horodatage,
+            'page': self.page,
+            'phase': mesure.nom,
+            'niveau': mesure.niveau,
+            'lignes_entree': mesure.lignes_entree,
+            'lignes_sortie': mesure.lignes_sortie,
+            'duree_s': round(mesure.duree, 4),
+            'pic_mo': round(mesure.pic_octets / 1024 ** 2, 1) if mesure.pic_octets is not None else None,
+            'detail': mesure.detail,
+        } for mesure in self.mesures])
+        journal.to_csv(chemin, mode='a', header=not os.path.exists(chemin), index=False)
+
+
+def collecteur_courant():
+    return getattr(_local, 'collecteur', None)
+
+
+@contextmanager
+def collecter(page, memoire=False):
+    """Ouvre un collecteur pour la durée du bloc ; les mesures prises dans le bloc y sont inscrites."""
+    precedent = collecteur_courant()
+    collecteur = Collecteur(page, memoire)
+    demarre = memoire and not tracemalloc.is_tracing()
+    if demarre:
+        tracemalloc.start()
+    _local.collecteur = collecteur
+    try:
+        yield collecteur
+    finally:
+        _local.collecteur = precedent
+        if demarre:
+            tracemalloc.stop()
+
+
+@contextmanager
+def mesurer(nom, lignes_entree=None):
+    """
+    Mesure la phase `nom` ; l'appelant peut renseigner `lignes_sortie` et `detail` sur la mesure retournée.
+    Les phases imbriquées sont affichées en retrait sous la phase qui les contient.
+    """
+    collecteur = collecteur_courant()
+    mesure = Mesure(nom, len(collecteur._pile) if collecteur else 0, lignes_entree)
+    if collecteur is None:
+        yield mesure
+        return
+
+    if collecteur.rappel is not None:
+        collecteur.rappel(mesure)
+    collecteur.mesures.append(mesure)
+    suivre_memoire = collecteur.memoire and tracemalloc.is_tracing()
+    if suivre_memoire:
+        # Le pic de la phase parente est conservé avant de remettre le compteur à zéro
+        courant, pic = tracemalloc.get_traced_memory()
+        if collecteur._pile:
+            parent = collecteur._pile[-1]
+            parent.pic_octets = max(parent.pic_octets or 0, pic - parent._depart)
+        mesure._depart = courant
+        tracemalloc.reset_peak()
+    collecteur._pile.append(mesure)
+    debut = time.perf_counter()
+    try:
+        yield mesure
+    finally:
+        mesure.duree = time.perf_counter() - debut
+        collecteur._pile.pop()
+        if suivre_memoire:
+            pic = tracemalloc.get_traced_memory()[1] - mesure._depart
+            mesure.pic_octets = max(mesure.pic_octets or 0, pic)
+            if collecteur._pile:
+                parent = collecteur._pile[-1]
+                parent.pic_octets = max(parent.pic_octets or 0, mesure._depart - parent._depart + mesure.pic_octets)
+
+
+def compter_lignes(valeur):
+    if isinstance(valeur, (pd.DataFrame, pd.Series)):
+        return len(valeur)
+    if isinstance(valeur, dict):
+        return sum(len(df) for df in valeur.values() if isinstance(df, (pd.DataFrame, pd.Series)))
+    return None
+
+
+def instrumente(fonction):
+    """Décorateur des fonctions d'étape : mesure l'étape entière, lignes reçues et lignes produites."""
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        lignes_entree = sum(len(arg) for arg in list(args) + list(kwargs.values()) if isinstance(arg, pd.DataFrame))
+        with mesurer(fonction.__name__, lignes_entree) as mesure:
+            resultats = fonction(*args, **kwargs)
+            mesure.lignes_sortie = compter_lignes(resultats)
+        return resultats
+    return enveloppe
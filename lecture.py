@@ -0,0 +1,223 @@
+"""
+Lecture des fichiers importés (Excel ou CSV) avec un cache des DataFrames déjà analysés.
+
+Streamlit relance Hello.py depuis le début à chaque interaction : sans cache,
+chaque clic relit et ré-analyse avec openpyxl tous les fichiers importés.
+Le cache est indexé par l'empreinte du contenu du fichier, la feuille et les
+options de lecture, et limité par un budget en octets (éviction LRU). Derrière
+le cache, l'entrepôt Parquet (entrepot.py) conserve les fichiers déjà analysés
+d'une session ou d'un jour à l'autre.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from entrepot import entrepot
+from instrumentation import mesurer
+from types_colonnes import economie, optimiser_types
+
+# Budget mémoire par défaut du cache des fichiers analysés (512 Mo)
+BUDGET_OCTETS_DEFAUT = 512 * 1024 * 1024
+
+
+class ColonnesManquantesError(ValueError):
+    pass
+
+
+class CacheFichiers:
+    """Cache LRU des DataFrames analysés, borné par un budget en octets."""
+
+    def __init__(self, budget_octets=BUDGET_OCTETS_DEFAUT):
+        self.budget_octets = budget_octets
+        self._entrees = OrderedDict()
+        # En-têtes des fichiers déjà lus (quelques noms de colonnes, hors budget) : une lecture partielle
+        # servie par le cache vérifie ses colonnes requises sans relire le fichier
+        self._entetes = {}
+        self._taille_totale = 0
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def obtenir(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.misses += 1
+                return None
+            # Marquer l'entrée comme la plus récemment utilisée
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return entree[0]
+
+    def ajouter(self, cle, df):
+        taille = int(df.memory_usage(index=True, deep=True).sum())
+        with self._verrou:
+            if cle in self._entrees:
+                self._taille_totale -= self._entrees.pop(cle)[1]
+            # Un fichier plus gros que le budget entier n'est pas conservé
+            if taille > self.budget_octets:
+                return
+            self._entrees[cle] = (df, taille)
+            self._taille_totale += taille
+            # Évincer les entrées les moins récemment utilisées jusqu'à respecter le budget
+            while self._taille_totale > self.budget_octets:
+                _, (_, taille_evincee) = self._entrees.popitem(last=False)
+                self._taille_totale -= taille_evincee
+                self.evictions += 1
+
+    def entete(self, cle_fichier):
+        return self._entetes.get(cle_fichier)
+
+    def noter_entete(self, cle_fichier, colonnes):
+        with self._verrou:
+            self._entetes[cle_fichier] = list(colonnes)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self._entetes.clear()
+            self._taille_totale = 0
+
+    def statistiques(self):
+        with self._verrou:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entrees': len(self._entrees),
+                'taille_octets': self._taille_totale,
+                'budget_octets': self.budget_octets,
+            }
+
+
+# Cache partagé par toutes les relances du script (le module reste importé entre deux relances)
+cache_fichiers = CacheFichiers()
+
+
+def contenu_fichier(fichier):
+    # Récupérer les octets d'un fichier importé (UploadedFile), d'un chemin ou d'un objet fichier
+    if hasattr(fichier, 'getvalue'):
+        return fichier.getvalue()
+    if isinstance(fichier, (str, os.PathLike)):
+        with open(fichier, 'rb') as f:
+            return f.read()
+    contenu = fichier.read()
+    fichier.seek(0)
+    return contenu
+
+
+def nom_fichier(fichier):
+    if isinstance(fichier, (str, os.PathLike)):
+        return os.fspath(fichier)
+    return getattr(fichier, 'name', '') or ''
+
+
+def est_csv(fichier):
+    return nom_fichier(fichier).lower().endswith('.csv')
+
+
+def empreinte_contenu(contenu):
+    return hashlib.sha256(contenu).hexdigest()
+
+
+def lire_fichier(fichier, feuille=0, cache=None, colonnes=None, operateur=None, type_source=None, compacter=True, requises=None, **options):
+    """
+    Lit un fichier Excel ou CSV en DataFrame en passant par le cache, puis par l'entrepôt
+    Parquet : un fichier déjà importé (même contenu) n'est jamais ré-analysé.
+
+    `colonnes` limite la lecture aux colonnes utiles : seules celles-ci sont analysées et
+    conservées. `requises` liste des colonnes qui doivent exister sans restreindre la
+    lecture. Les unes et les autres sont vérifiées sur l'en-tête, avant la lecture du corps
+    du fichier (ColonnesManquantesError). `operateur` et `type_source` étiquettent le relevé
+    dans l'entrepôt. Avec `compacter`, les colonnes connues de l'opérateur reçoivent un type
+    compact (voir types_colonnes.py) avant la mise en cache.
+
+    Une lecture partielle est servie par le cache, qu'elle y soit déjà (même fichier, mêmes
+    colonnes) ou que le fichier y soit lu en entier (par une autre étape) : les colonnes
+    sont alors extraites en mémoire, sans nouvelle analyse.
+
+    Retourne une copie du DataFrame mis en cache : les étapes peuvent donc
+    modifier le résultat sans altérer le cache.
+    """
+    if cache is None:
+        cache = cache_fichiers
+    attendues = list(dict.fromkeys(list(colonnes or []) + list(requises or [])))
+    with mesurer(f"lecture {type_source or nom_fichier(fichier)}") as mesure:
+        contenu = contenu_fichier(fichier)
+        format_fichier = 'csv' if est_csv(fichier) else 'excel'
+        cle_fichier = (empreinte_contenu(contenu), format_fichier, feuille, repr(sorted(options.items())))
+        cle_complete = cle_fichier + (None, operateur if compacter else False)
+        cle = cle_complete if colonnes is None else cle_fichier + (tuple(colonnes), operateur if compacter else False)
+
+        df = cache.obtenir(cle)
+        mesure.detail = 'cache'
+        if df is None and colonnes is not None:
+            complet = cache.obtenir(cle_complete)
+            if complet is not None and set(colonnes) <= set(complet.columns):
+                df = complet[list(colonnes)]
+                mesure.detail = 'cache (fichier complet)'
+        if df is not None:
+            entete = cache.entete(cle_fichier)
+            verifier_entete(entete if entete is not None else df.columns, attendues, fichier, type_source)
+        else:
+            identifiant = empreinte_contenu(repr(cle_fichier).encode())[:32]
+            entree = entrepot.chercher(identifiant) if entrepot.disponible else None
+            if entree is not None:
+                cache.noter_entete(cle_fichier, entree['colonnes'])
+                verifier_entete(entree['colonnes'], attendues, fichier, type_source)
+                df = entrepot.lire(entree, colonnes)
+                mesure.detail = 'entrepôt Parquet'
+            else:
+                if attendues:
+                    entete = lire_entete(contenu, format_fichier, feuille, options)
+                    cache.noter_entete(cle_fichier, entete)
+                    verifier_entete(entete, attendues, fichier, type_source)
+                if colonnes is not None:
+                    # Seules les colonnes utiles sont analysées ; le relevé partiel n'entre pas à l'entrepôt
+                    df = analyser_fichier(contenu, format_fichier, feuille, dict(options, usecols=list(colonnes)))
+                    mesure.detail = f"analyse {format_fichier}, {len(df.columns)} colonne(s)"
+                else:
+                    df = analyser_fichier(contenu, format_fichier, feuille, options)
+                    cache.noter_entete(cle_fichier, df.columns)
+                    mesure.detail = f"analyse {format_fichier}"
+            if compacter:
+                # Types compacts avant l'entrepôt : le fichier Parquet les conserve
+                df, rapport = optimiser_types(df, operateur)
+                mesure.detail += f", {economie(rapport)}"
+            if entree is None and colonnes is None and entrepot.disponible:
+                try:
+                    entrepot.enregistrer(identifiant, df, operateur, type_source, nom_fichier(fichier))
+                except Exception:
+                    # L'entrepôt n'est qu'une accélération : un échec d'écriture ne doit pas bloquer l'étape
+                    pass
+            if colonnes is not None:
+                df = df[list(colonnes)]
+            cache.ajouter(cle, df)
+        mesure.lignes_sortie = len(df)
+        return df.copy()
+
+
+def lire_entete(contenu, format_fichier, feuille=0, options=None):
+    # Noms des colonnes, lus sans analyser les lignes du fichier
+    options = {nom: valeur for nom, valeur in (options or {}).items() if nom not in ('usecols', 'nrows')}
+    return list(analyser_fichier(contenu, format_fichier, feuille, dict(options, nrows=0)).columns)
+
+
+def verifier_entete(colonnes_fichier, attendues, fichier, type_source=None):
+    manquantes = [colonne for colonne in attendues if colonne not in set(colonnes_fichier)]
+    if manquantes:
+        libelle = type_source or nom_fichier(fichier)
+        raise ColonnesManquantesError(f"Colonnes manquantes dans le fichier {libelle} : {', '.join(map(str, manquantes))}")
+
+
+def analyser_fichier(contenu, format_fichier, feuille=0, options=None):
+    options = dict(options or {})
+    if format_fichier == 'csv':
+        return pd.read_csv(io.BytesIO(contenu), **options)
+    options.setdefault('engine', 'openpyxl')
+    return pd.read_excel(io.BytesIO(contenu), sheet_name=feuille, **options)
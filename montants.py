@@ -0,0 +1,100 @@
+"""
+Normalisation des montants en entiers d'unités mineures.
+
+Les relevés écrivent les montants de plusieurs façons : nombre Excel (1000 ou 1000.0),
+texte ('1000', '1 000', '1,000', '1,000.00', '1000,5'), parfois une valeur parasite ('N/A', '-').
+Les montants sont convertis en bloc en entiers d'unités mineures (les francs CFA n'ont
+pas de sous-unité : `decimales=0`), au lieu d'un formatage ou d'un découpage de chaîne
+par ligne. Les sommes des TCD portent alors sur des entiers, et un même montant donne
+la même composante de clé quelle que soit son écriture.
+
+Les cellules non numériques sont vides dans le résultat et relevées dans un rapport à
+part (ligne, valeur d'origine, motif), à afficher à côté du résultat de l'étape.
+"""
+import numpy as np
+import pandas as pd
+
+# Nombre de décimales des unités mineures (francs CFA : aucune)
+DECIMALES = 0
+
+MOTIF_NON_NUMERIQUE = 'non numérique'
+MOTIF_ARRONDI = 'arrondi'
+
+# Espaces (dont insécables) et apostrophes utilisés comme séparateurs de milliers
+MOTIF_SEPARATEURS = "[\\s\u00a0\u202f']"
+
+# Virgules de milliers sans partie décimale : '1,000' vaut mille et non 1,0
+MOTIF_VIRGULES_MILLIERS = r'-?\d{1,3}(?:,\d{3})+'
+
+
+def nombres_textes(textes):
+    """
+    Valeurs numériques d'un tableau de textes : séparateurs de milliers retirés, virgule
+    décimale acceptée ('1000,5'), virgules de milliers quand un point suit ('1,000.00') ou
+    quand elles séparent des groupes de trois chiffres ('1,000', '1,234,567').
+    """
+    textes = pd.Series(textes, dtype='string').str.replace(MOTIF_SEPARATEURS, '', regex=True)
+    virgules_milliers = textes.str.contains('.', regex=False).fillna(False)
+    virgules_milliers |= textes.str.fullmatch(MOTIF_VIRGULES_MILLIERS).fillna(False)
+    textes = textes.where(~virgules_milliers, textes.str.replace(',', '', regex=False))
+    textes = textes.where(virgules_milliers, textes.str.replace(',', '.', regex=False))
+    return pd.to_numeric(textes, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def analyser_montants(serie, decimales=DECIMALES):
+    """
+    Convertit une colonne de montants en entiers d'unités mineures (Int64) et retourne
+    (montants, anomalies). Les anomalies (DataFrame 'ligne', 'valeur', 'motif') sont les cellules
+    non vides mais non numériques (laissées vides) et celles dont la précision dépasse les unités
+    mineures (arrondies). Seules les valeurs distinctes sont analysées.
+    """
+    codes, distinctes = pd.factorize(serie)
+    if pd.api.types.is_numeric_dtype(distinctes.dtype) and not pd.api.types.is_bool_dtype(distinctes.dtype):
+        nombres = np.asarray(distinctes, dtype='float64')
+        blancs = np.zeros(len(distinctes), dtype=bool)
+    else:
+        textes = pd.Series(distinctes.astype(str), dtype='string')
+        nombres = nombres_textes(textes)
+        # Un texte vide ou fait d'espaces est une cellule vide, pas une anomalie
+        blancs = textes.str.strip().eq('').to_numpy(dtype=bool, na_value=True)
+    unites = nombres * 10 ** decimales
+    arrondies = np.round(unites)
+    vides = np.isnan(unites)
+    non_numeriques = vides & ~blancs
+    arrondis = ~vides & (arrondies != unites)
+
+    # Code -1 (cellule vide) : dernière position, vide sans être une anomalie
+    valeurs = np.append(np.where(vides, 0, arrondies).astype(np.int64), 0)
+    vides = np.append(vides, True)
+    montants = pd.Series(pd.arrays.IntegerArray(valeurs[codes], vides[codes]), index=serie.index, name=serie.name)
+
+    motifs = np.append(np.where(non_numeriques, MOTIF_NON_NUMERIQUE, np.where(arrondis, MOTIF_ARRONDI, '')), '')[codes]
+    lignes = np.flatnonzero(motifs != '')
+    anomalies = pd.DataFrame({
+        'ligne': serie.index[lignes],
+        'valeur': serie.to_numpy(dtype=object)[lignes],
+        'motif': motifs[lignes],
+    })
+    return montants, anomalies
+
+
+def montants_entiers(serie, decimales=DECIMALES):
+    # Montants en entiers d'unités mineures, sans le rapport des anomalies
+    return analyser_montants(serie, decimales)[0]
+
+
+def anomalies_vides():
+    return pd.DataFrame({colonne: pd.Series(dtype=object) for colonne in ['colonne', 'ligne', 'valeur', 'motif']})
+
+
+def normaliser_montants(df, colonnes, decimales=DECIMALES):
+    """
+    Remplace les `colonnes` de montants présentes dans `df` par leurs entiers d'unités mineures ;
+    retourne (df, anomalies), les anomalies de toutes les colonnes avec une colonne 'colonne'.
+    """
+    rapports = [anomalies_vides()]
+    for colonne in colonnes:
+        if colonne in df.columns:
+            df[colonne], anomalies = analyser_montants(df[colonne], decimales)
+            rapports.append(anomalies.assign(colonne=colonne))
+    return df, pd.concat(rapports, ignore_index=True)
@@ -0,0 +1,232 @@
+"""
+Moteur de rapprochement unique, piloté par une spécification par opérateur.
+
+Les pages NBSI_OP répétaient toutes le même enchaînement (filtrer par état, construire
+la clé, fusionner, garder les `left_only`) avec chacune ses propres coûts : copies
+intermédiaires, fusion `outer` complète pour n'en garder qu'un côté... Une
+SpecRapprochement décrit ce qui change d'un opérateur à l'autre ; `rapprocher`
+choisit l'exécution la moins coûteuse :
+  - les filtres sont combinés en un seul masque avant toute copie ;
+  - seules la clé (et les colonnes recherchées) du Back Office sont lues ;
+  - les écarts sont obtenus par une anti-jointure sur table de hachage (`isin`, ou
+    empreinte uint64 pour une clé multi-colonnes), sans fusion ;
+  - la fusion complète n'est faite que si les transactions rapprochées sont demandées,
+    et seulement sur les lignes qui ont une correspondance.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+from appariement import (COLONNE_OCCURRENCE, TOUTES, UN_A_UN, controler_fusion, criteres_ordre, estimer_fusion, numeros_occurrence,
+                         occurrences_appariees)
+from cles import cle_hachee
+from execution import fusionner
+from instrumentation import mesurer
+from recherche import IndexRecherche
+from types_colonnes import harmoniser_cles
+
+
+class SpecRapprochement:
+    """
+    Description du rapprochement d'un fichier opérateur avec le Back Office.
+
+    - `cle_operateur` / `cle_back_office` : colonne (ou liste de colonnes) de matching ;
+    - `filtre_operateur` / `filtre_back_office` : {colonne: valeur ou liste de valeurs} à conserver ;
+    - `preparation_operateur` / `preparation_back_office` : fonction df -> df appliquée après les
+      filtres (conversion d'identifiant, construction de clé...) ;
+    - `internes` : produire aussi les transactions rapprochées (fusion interne avec le Back Office) ;
+    - `colonnes_recherchees` : colonnes du Back Office recopiées sur chaque ligne opérateur
+      (première correspondance, comme une RECHERCHEV) ; les lignes trouvées forment alors
+      le résultat 'correspondantes' ;
+    - `gabarit_fusion` : les écarts gardent les colonnes d'une fusion pandas (colonnes du
+      Back Office vides et colonne `_merge`), comme les fichiers produits jusqu'ici ;
+    - `appariement` : pour les transactions internes, TOUTES (chaque ligne opérateur avec toutes
+      les lignes Back Office de même clé) ou UN_A_UN (k-ième occurrence de la clé avec la k-ième,
+      voir appariement.py), les occurrences étant ordonnées par `ordre_operateur` /
+      `ordre_back_office` : (colonne horodatage, colonne montant). En un à un, les occurrences
+      opérateur sans partenaire au Back Office sont des écarts.
+    """
+
+    def __init__(self, cle_operateur, cle_back_office, filtre_operateur=None, filtre_back_office=None,
+                 preparation_operateur=None, preparation_back_office=None, internes=False,
+                 colonnes_recherchees=None, gabarit_fusion=False, appariement=TOUTES, ordre_operateur=None, ordre_back_office=None):
+        self.cles_operateur = [cle_operateur] if isinstance(cle_operateur, str) else list(cle_operateur)
+        self.cles_back_office = [cle_back_office] if isinstance(cle_back_office, str) else list(cle_back_office)
+        if len(self.cles_operateur) != len(self.cles_back_office):
+            raise ValueError("Les deux côtés du rapprochement doivent avoir le même nombre de colonnes clés")
+        if colonnes_recherchees and len(self.cles_operateur) > 1:
+            raise ValueError("Les colonnes recherchées ne sont disponibles que pour une clé d'une seule colonne")
+        self.filtre_operateur = filtre_operateur or {}
+        self.filtre_back_office = filtre_back_office or {}
+        self.preparation_operateur = preparation_operateur
+        self.preparation_back_office = preparation_back_office
+        self.internes = internes
+        self.colonnes_recherchees = list(colonnes_recherchees or [])
+        self.gabarit_fusion = gabarit_fusion
+        self.appariement = appariement
+        self.ordre_operateur = ordre_operateur or (None, None)
+        self.ordre_back_office = ordre_back_office or (None, None)
+
+    def variante(self, **options):
+        # Copie de la spec avec quelques options modifiées (ex. appariement choisi par l'utilisateur)
+        spec = copy.copy(self)
+        for nom, valeur in options.items():
+            setattr(spec, nom, valeur)
+        return spec
+
+    def colonnes_back_office(self):
+        # Colonnes du Back Office réellement utilisées quand la fusion complète n'est pas demandée
+        colonnes = list(self.filtre_back_office) + self.cles_back_office + self.colonnes_recherchees
+        return list(dict.fromkeys(colonnes))
+
+
+def masque_filtre(df, filtre):
+    masque = np.ones(len(df), dtype=bool)
+    for colonne, valeurs in filtre.items():
+        if isinstance(valeurs, (list, tuple, set)):
+            masque &= df[colonne].isin(valeurs).to_numpy()
+        else:
+            masque &= (df[colonne] == valeurs).to_numpy()
+    return masque
+
+
+def appartenance(valeurs, valeurs_reference):
+    """
+    Pour chaque valeur, indique si elle figure parmi les valeurs de référence. Les deux côtés sont
+    codés ensemble par une seule table de hachage (`factorize`), puis comparés par code : plus rapide
+    que `isin`, qui parcourt les chaînes une à une pour les colonnes de texte Arrow.
+    """
+    valeurs_reference = pd.Series(valeurs_reference).dropna()
+    codes, distinctes = pd.factorize(pd.concat([pd.Series(valeurs), valeurs_reference], ignore_index=True))
+    codes_valeurs = codes[:len(valeurs)]
+    presentes = np.zeros(len(distinctes) + 1, dtype=bool)
+    presentes[codes[len(valeurs):]] = True
+    # Le code -1 (valeur vide) pointe sur la dernière case, jamais marquée
+    return presentes[codes_valeurs]
+
+
+def presence(spec, df_operateur, df_back_office):
+    # Anti-jointure : pour chaque ligne opérateur, la clé existe-t-elle au Back Office ?
+    if len(spec.cles_operateur) == 1:
+        return appartenance(*harmoniser_cles(df_operateur[spec.cles_operateur[0]], df_back_office[spec.cles_back_office[0]]))
+    return appartenance(cle_hachee(df_operateur, spec.cles_operateur), cle_hachee(df_back_office, spec.cles_back_office))
+
+
+def cles_jointure(spec, gauche, droite):
+    # Clés comparables des deux côtés : colonne harmonisée, ou empreinte d'une clé multi-colonnes
+    if len(spec.cles_operateur) == 1:
+        return harmoniser_cles(gauche[spec.cles_operateur[0]], droite[spec.cles_back_office[0]])
+    return cle_hachee(gauche, spec.cles_operateur), cle_hachee(droite, spec.cles_back_office)
+
+
+def appliquer_gabarit_fusion(spec, ecarts, colonnes_back_office):
+    """
+    Reproduit les colonnes d'un `pd.merge(..., indicator=True)` pour des lignes sans correspondance :
+    colonnes du Back Office vides, suffixes '_x' / '_y' en cas de conflit de nom, `_merge` = 'left_only'.
+    """
+    communes = [colonne for colonne in colonnes_back_office
+                if colonne in ecarts.columns and not (colonne in spec.cles_operateur and spec.cles_operateur == spec.cles_back_office)]
+    ecarts = ecarts.rename(columns={colonne: f'{colonne}_x' for colonne in communes})
+    vides = {}
+    for colonne in colonnes_back_office:
+        if colonne in spec.cles_operateur and spec.cles_operateur == spec.cles_back_office:
+            continue
+        vides[f'{colonne}_y' if colonne in communes else colonne] = pd.Series(np.nan, index=ecarts.index, dtype=object)
+    ecarts = pd.concat([ecarts, pd.DataFrame(vides, index=ecarts.index)], axis=1)
+    ecarts['_merge'] = pd.Categorical(['left_only'] * len(ecarts), categories=['left_only', 'right_only', 'both'])
+    return ecarts
+
+
+def rapprocher(spec, df_operateur, df_back_office):
+    """
+    Exécute le rapprochement décrit par `spec` et retourne {'ecarts': ...} plus, selon la spec,
+    'internes' (fusion avec le Back Office) ou 'correspondantes' (lignes trouvées avec les colonnes recherchées).
+    """
+    colonnes_back_office = list(df_back_office.columns)
+    with mesurer('filtres', len(df_operateur) + len(df_back_office)) as mesure:
+        if spec.filtre_operateur:
+            df_operateur = df_operateur[masque_filtre(df_operateur, spec.filtre_operateur)]
+        # Sans fusion complète, seules les colonnes utiles du Back Office sont conservées
+        # (après la préparation si celle-ci construit la clé à partir d'autres colonnes)
+        if not spec.internes and spec.preparation_back_office is None:
+            df_back_office = df_back_office[spec.colonnes_back_office()]
+        if spec.filtre_back_office:
+            df_back_office = df_back_office[masque_filtre(df_back_office, spec.filtre_back_office)]
+        mesure.lignes_sortie = len(df_operateur) + len(df_back_office)
+
+    if spec.preparation_operateur is not None or spec.preparation_back_office is not None:
+        with mesurer('préparation des clés', len(df_operateur) + len(df_back_office)):
+            if spec.preparation_operateur is not None:
+                df_operateur = spec.preparation_operateur(df_operateur.copy())
+            if spec.preparation_back_office is not None:
+                df_back_office = spec.preparation_back_office(df_back_office.copy())
+                if not spec.internes:
+                    df_back_office = df_back_office[spec.colonnes_back_office()]
+
+    resultats = {}
+    if spec.colonnes_recherchees:
+        with mesurer('recherche des correspondances', len(df_operateur) + len(df_back_office)) as mesure:
+            index_back_office = IndexRecherche(df_back_office, spec.cles_back_office[0])
+            positions = index_back_office.positions(df_operateur[spec.cles_operateur[0]])
+            trouve = positions >= 0
+            joint = index_back_office.joindre(df_operateur, spec.cles_operateur[0], spec.colonnes_recherchees, positions=positions)
+            resultats['correspondantes'] = joint[trouve]
+            resultats['ecarts'] = joint[~trouve]
+            mesure.lignes_sortie = len(joint)
+        return resultats
+
+    with mesurer('anti-jointure', len(df_operateur) + len(df_back_office)) as mesure:
+        trouve = presence(spec, df_operateur, df_back_office)
+        if spec.internes and spec.appariement == UN_A_UN:
+            # Occurrences de la clé au-delà du nombre d'occurrences au Back Office : sans partenaire, donc en écart
+            positions = np.flatnonzero(trouve)
+            apparies = occurrences_appariees(*cles_jointure(spec, df_operateur.iloc[positions], df_back_office),
+                                             criteres_ordre(df_operateur.iloc[positions], *spec.ordre_operateur))
+            trouve[positions[~apparies]] = False
+        ecarts = df_operateur[~trouve]
+        if spec.gabarit_fusion:
+            ecarts = appliquer_gabarit_fusion(spec, ecarts, colonnes_back_office)
+        resultats['ecarts'] = ecarts
+        mesure.lignes_sortie = len(ecarts)
+
+    if spec.internes:
+        gauche, droite = df_operateur[trouve], df_back_office
+        cle_gauche, cle_droite = cles_jointure(spec, gauche, droite)
+
+        # Taille de la fusion estimée sur les comptes d'occurrences, avant de fusionner
+        with mesurer('contrôle de cardinalité', len(gauche) + len(droite)) as mesure:
+            estimation = estimer_fusion(cle_gauche, cle_droite, spec.appariement)
+            resultats['cardinalite'] = controler_fusion(
+                f"{' + '.join(spec.cles_operateur)} = {' + '.join(spec.cles_back_office)}",
+                len(gauche), len(droite), estimation, spec.appariement,
+            )
+            mesure.detail = f"{estimation} ligne(s) estimée(s), appariement {spec.appariement}"
+
+        # La fusion complète ne porte que sur les lignes qui ont une correspondance
+        with mesurer('fusion des transactions rapprochées', len(gauche) + len(droite)) as mesure:
+            occurrence = []
+            if spec.appariement == UN_A_UN:
+                # Chaque ligne n'est rapprochée qu'une fois : clé + numéro d'occurrence de la clé
+                gauche = gauche.assign(**{COLONNE_OCCURRENCE: numeros_occurrence(cle_gauche, criteres_ordre(gauche, *spec.ordre_operateur))})
+                droite = droite.assign(**{COLONNE_OCCURRENCE: numeros_occurrence(cle_droite, criteres_ordre(droite, *spec.ordre_back_office))})
+                occurrence = [COLONNE_OCCURRENCE]
+            if len(spec.cles_operateur) == 1:
+                if cle_gauche.dtype != gauche[spec.cles_operateur[0]].dtype:
+                    gauche = gauche.assign(**{spec.cles_operateur[0]: cle_gauche})
+                if cle_droite.dtype != droite[spec.cles_back_office[0]].dtype:
+                    droite = droite.assign(**{spec.cles_back_office[0]: cle_droite})
+                internes = fusionner(gauche, droite, left_on=spec.cles_operateur[:1] + occurrence, right_on=spec.cles_back_office[:1] + occurrence, how='inner')
+            else:
+                # Clé multi-colonnes : jointure sur l'empreinte uint64 (voir cles.py)
+                internes = fusionner(
+                    gauche.assign(_cle_jointure=cle_gauche.to_numpy()),
+                    droite.assign(_cle_jointure=cle_droite.to_numpy()),
+                    on=['_cle_jointure'] + occurrence, how='inner',
+                ).drop(columns='_cle_jointure')
+            internes = internes.drop(columns=occurrence)
+            if spec.gabarit_fusion:
+                internes['_merge'] = pd.Categorical(['both'] * len(internes), categories=['left_only', 'right_only', 'both'])
+            resultats['internes'] = internes
+            mesure.lignes_sortie = len(internes)
+    return resultats
@@ -0,0 +1,80 @@
+"""
+Rapprochement de tous les opérateurs en parallèle (un processus par opérateur).
+
+Le manifeste JSON indique, pour chaque opérateur, les fichiers d'entrée :
+    {
+        "MTN_PAYIN": {"operateur": "mtn.xlsx", "back_office": "bo_mtn.xlsx"},
+        "ORANGE_MONEY_PAYIN": {"operateur": "om.xlsx", "back_office": "bo_om.xlsx"}
+    }
+
+Chaque processus lit lui-même ses fichiers (la lecture Excel est donc aussi répartie)
+puis enchaîne les étapes NBSI_OP et TCD ; le fichier opérateur n'est analysé qu'une
+fois grâce au cache de lecture du processus.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from etapes import ETAPES
+
+# Étapes exécutées pour chaque opérateur lors d'un rapprochement global
+ETAPES_QUOTIDIENNES = ('NBSI_OP', 'TCD')
+
+
+def charger_manifeste(chemin):
+    with open(chemin, encoding='utf-8') as f:
+        manifeste = json.load(f)
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    # Les chemins relatifs sont résolus par rapport au dossier du manifeste
+    return {
+        operateur.strip().upper(): {nom: os.path.join(dossier, chemin_entree) for nom, chemin_entree in entrees.items()}
+        for operateur, entrees in manifeste.items()
+    }
+
+
+def executer_operateur(operateur, chemins, dossier_sortie, format_sortie='xlsx', etapes=ETAPES_QUOTIDIENNES, incremental=False, parametres=None):
+    # Import local : exécuté dans le processus de travail
+    from cli import executer_etape
+
+    lignes = []
+    for nom_etape in etapes:
+        if nom_etape not in ETAPES.get(operateur, {}):
+            continue
+        debut = time.perf_counter()
+        try:
+            ecrits = executer_etape(operateur, nom_etape, chemins, os.path.join(dossier_sortie, operateur), format_sortie, incremental, parametres)
+        except Exception as e:
+            lignes.append({'Opérateur': operateur, 'Étape': nom_etape, 'Fichier': '', 'Lignes': None,
+                           'Durée (s)': round(time.perf_counter() - debut, 2), 'Statut': f"Erreur : {e}"})
+            continue
+        duree = round(time.perf_counter() - debut, 2)
+        for chemin, nombre_lignes in ecrits.items():
+            lignes.append({'Opérateur': operateur, 'Étape': nom_etape, 'Fichier': chemin, 'Lignes': nombre_lignes,
+                           'Durée (s)': duree, 'Statut': 'OK'})
+    return lignes
+
+
+def executer_tous(manifeste, dossier_sortie, format_sortie='xlsx', processus=None, incremental=False, parametres=None):
+    """
+    Exécute les étapes quotidiennes de tous les opérateurs du manifeste et retourne le résumé consolidé.
+    `incremental` et `parametres` sont transmis à chaque étape, comme pour une étape seule (voir cli.executer_etape).
+    """
+    inconnus = [operateur for operateur in manifeste if operateur not in ETAPES]
+    if inconnus:
+        raise ValueError(f"Opérateurs inconnus dans le manifeste : {', '.join(inconnus)}")
+
+    lignes = []
+    with ProcessPoolExecutor(max_workers=processus or min(len(manifeste), os.cpu_count() or 1)) as executeur:
+        futures = {
+            executeur.submit(executer_operateur, operateur, chemins, dossier_sortie, format_sortie, ETAPES_QUOTIDIENNES,
+                             incremental, parametres): operateur
+            for operateur, chemins in manifeste.items()
+        }
+        for future in as_completed(futures):
+            lignes.extend(future.result())
+
+    resume = pd.DataFrame(lignes, columns=['Opérateur', 'Étape', 'Fichier', 'Lignes', 'Durée (s)', 'Statut'])
+    return resume.sort_values(['Opérateur', 'Étape'], kind='stable').reset_index(drop=True)
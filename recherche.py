@@ -0,0 +1,104 @@
+"""
+Moteur de RECHERCHEV : index de hachage construit une seule fois sur la colonne clé
+d'un fichier de référence, puis utilisé pour remplir plusieurs colonnes d'un coup.
+
+Remplace les `.apply(lambda x: df.loc[df[cle] == x, ...])` qui parcouraient tout
+le fichier de référence pour chaque ligne recherchée.
+"""
+import numpy as np
+import pandas as pd
+
+# Comportements possibles quand une clé apparaît plusieurs fois dans le fichier de référence
+PREMIER = 'premier'
+DERNIER = 'dernier'
+ERREUR = 'erreur'
+MODES_DOUBLONS = (PREMIER, DERNIER, ERREUR)
+
+
+class CleEnDoubleError(ValueError):
+    pass
+
+
+class IndexRecherche:
+    """
+    Index d'un fichier de référence sur une colonne clé.
+
+    `doublons` fixe la ligne retenue quand une clé est présente plusieurs fois :
+    'premier' (comme RECHERCHEV dans Excel), 'dernier', ou 'erreur' pour refuser
+    les clés en double.
+    """
+
+    def __init__(self, df_reference, colonne_cle, doublons=PREMIER):
+        if doublons not in MODES_DOUBLONS:
+            raise ValueError(f"Mode de doublons inconnu : {doublons!r} (attendu : {', '.join(MODES_DOUBLONS)})")
+
+        # Les clés vides ne peuvent jamais correspondre
+        reference = df_reference[df_reference[colonne_cle].notna()]
+
+        en_double = reference[colonne_cle].duplicated(keep=False)
+        if en_double.any():
+            if doublons == ERREUR:
+                exemples = reference.loc[en_double, colonne_cle].unique()[:5]
+                raise CleEnDoubleError(
+                    f"{int(en_double.sum())} lignes ont une clé '{colonne_cle}' en double "
+                    f"(exemples : {', '.join(str(e) for e in exemples)})"
+                )
+            keep = 'first' if doublons == PREMIER else 'last'
+            reference = reference[~reference[colonne_cle].duplicated(keep=keep)]
+
+        self.colonne_cle = colonne_cle
+        self.doublons = doublons
+        self._reference = reference
+        self._index = pd.Index(reference[colonne_cle])
+
+    def __len__(self):
+        return len(self._index)
+
+    def positions(self, valeurs):
+        # Position de chaque valeur dans le fichier de référence (-1 si absente)
+        return self._index.get_indexer(pd.Index(valeurs))
+
+    def extraire(self, valeurs, colonnes, defaut=np.nan, positions=None):
+        """
+        Retourne un DataFrame aligné sur `valeurs` contenant les colonnes demandées
+        du fichier de référence (ou `defaut` quand la clé est introuvable).
+
+        `colonnes` est une liste de colonnes ou un dictionnaire {colonne source: colonne cible}.
+        `positions` évite de rechercher une seconde fois des valeurs déjà passées à `positions()`.
+        """
+        if not isinstance(colonnes, dict):
+            colonnes = {colonne: colonne for colonne in colonnes}
+        index_resultat = valeurs.index if isinstance(valeurs, pd.Series) else pd.RangeIndex(len(valeurs))
+
+        if positions is None:
+            positions = self.positions(valeurs)
+        trouve = positions >= 0
+        resultat = {}
+        for source, cible in colonnes.items():
+            if len(self._reference) == 0:
+                resultat[cible] = np.full(len(index_resultat), defaut, dtype=object)
+                continue
+            serie = self._reference[source].iloc[np.where(trouve, positions, 0)].reset_index(drop=True)
+            resultat[cible] = serie.where(trouve, defaut).to_numpy()
+        return pd.DataFrame(resultat, index=index_resultat)
+
+    def remplir(self, df, colonne_recherche, colonnes, defaut=''):
+        # Remplir (ou écraser) les colonnes cibles de `df` en une seule passe
+        extrait = self.extraire(df[colonne_recherche], colonnes, defaut=defaut)
+        for colonne in extrait.columns:
+            df[colonne] = extrait[colonne].to_numpy()
+        return df
+
+    def joindre(self, df, colonne_recherche, colonnes, positions=None):
+        """
+        Équivalent d'un `pd.merge(..., how='left')` limité à une ligne de référence par clé :
+        le nombre de lignes de `df` est conservé et les colonnes déjà présentes
+        reçoivent les suffixes '_x' / '_y' comme avec `pd.merge`.
+        """
+        extrait = self.extraire(df[colonne_recherche], colonnes, positions=positions)
+        chevauchement = [colonne for colonne in extrait.columns if colonne in df.columns]
+        resultat = df.rename(columns={colonne: f'{colonne}_x' for colonne in chevauchement})
+        for colonne in extrait.columns:
+            cible = f'{colonne}_y' if colonne in chevauchement else colonne
+            resultat[cible] = extrait[colonne].to_numpy()
+        return resultat
@@ -0,0 +1,204 @@
+"""
+Exécution des étapes longues en arrière-plan.
+
+Une étape exécutée dans le script Streamlit bloque la session : un rapprochement de
+plusieurs centaines de milliers de lignes fige la page, et toute interaction relance le
+script et recommence l'étape depuis le début. Les étapes sont donc soumises comme tâches
+à un groupe de travailleurs partagé par toutes les sessions du serveur : au-delà du
+nombre de travailleurs, les tâches attendent leur tour. La page relancée retrouve sa
+tâche (en cours ou terminée) et n'exécute pas l'étape une seconde fois.
+
+Des threads plutôt que des processus : les DataFrames sont transmis sans copie ni
+sérialisation, et pandas libère le GIL pendant les jointures et agrégations.
+
+La progression est suivie par phase : chaque phase mesurée par `mesurer` (instrumentation.py)
+est signalée à la tâche, qui en affiche le nom et l'avancement par rapport au nombre de
+phases de la dernière exécution de la même étape. L'annulation est coopérative : elle prend
+effet au début de la phase suivante.
+"""
+import itertools
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from execution import utiliser_moteur
+from instrumentation import collecter
+
+# Nombre de tâches exécutées en même temps sur le serveur (modifiable par la variable d'environnement RAPPROCHEMENT_TRAVAILLEURS)
+TRAVAILLEURS = int(os.environ.get('RAPPROCHEMENT_TRAVAILLEURS', min(4, os.cpu_count() or 1)))
+
+# Nombre de tâches terminées conservées (avec leurs résultats) pour l'ensemble des sessions
+TACHES_CONSERVEES = 20
+
+EN_ATTENTE = 'en attente'
+EN_COURS = 'en cours'
+TERMINEE = 'terminée'
+ECHOUEE = 'échouée'
+ANNULEE = 'annulée'
+
+ETATS_FINAUX = (TERMINEE, ECHOUEE, ANNULEE)
+
+
+class TacheAnnulee(Exception):
+    """Levée au début d'une phase lorsque l'annulation de la tâche a été demandée."""
+
+
+class Tache:
+    """Exécution de `fonction(*args, **kwargs)` par un travailleur, avec son état et sa progression."""
+
+    def __init__(self, identifiant, libelle, fonction, args=(), kwargs=None, proprietaire=None, signature=None,
+                 moteur=None, memoire=False, phases_prevues=None):
+        self.identifiant = identifiant
+        self.libelle = libelle
+        self.fonction = fonction
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.proprietaire = proprietaire
+        self.signature = signature
+        self.moteur = moteur
+        self.memoire = memoire
+        self.phases_prevues = phases_prevues
+        self.etat = EN_ATTENTE
+        self.phase = None
+        self.phases_commencees = 0
+        self.resultat = None
+        self.exception = None
+        self.trace = None
+        self.collecteur = None
+        self.soumise_le = datetime.now()
+        self.debut = None
+        self.fin = None
+        self._annulation = threading.Event()
+
+    def terminee(self):
+        return self.etat in ETATS_FINAUX
+
+    def annuler(self):
+        self._annulation.set()
+
+    def progression(self):
+        # Part des phases déjà commencées (None si le nombre de phases n'est pas encore connu)
+        if self.etat == TERMINEE:
+            return 1.0
+        if not self.phases_prevues:
+            return None
+        return min(self.phases_commencees / self.phases_prevues, 0.99)
+
+    def duree(self):
+        if self.debut is None:
+            return None
+        return ((self.fin or datetime.now()) - self.debut).total_seconds()
+
+    def _nouvelle_phase(self, mesure):
+        # Appelée par `mesurer` au début de chaque phase exécutée dans la tâche
+        if self._annulation.is_set():
+            raise TacheAnnulee(self.libelle)
+        self.phase = mesure.nom
+        self.phases_commencees += 1
+
+    def _executer(self):
+        if self._annulation.is_set():
+            self.etat = ANNULEE
+            return
+        self.etat = EN_COURS
+        self.debut = datetime.now()
+        try:
+            with collecter(self.libelle, memoire=self.memoire) as collecteur, utiliser_moteur(self.moteur):
+                collecteur.rappel = self._nouvelle_phase
+                self.collecteur = collecteur
+                self.resultat = self.fonction(*self.args, **self.kwargs)
+            self.etat = TERMINEE
+        except TacheAnnulee:
+            self.etat = ANNULEE
+        except Exception as e:
+            self.exception = e
+            self.trace = traceback.format_exc()
+            self.etat = ECHOUEE
+        finally:
+            self.fin = datetime.now()
+            # Les entrées ne sont plus utiles : la mémoire est rendue même si la tâche reste conservée
+            self.args, self.kwargs = (), {}
+
+
+def copie_resultat(valeur):
+    # Copie superficielle des DataFrames d'un résultat : la page peut les modifier sans altérer la tâche
+    if isinstance(valeur, pd.DataFrame):
+        return valeur.copy(deep=False)
+    if isinstance(valeur, dict):
+        return {nom: copie_resultat(element) for nom, element in valeur.items()}
+    if isinstance(valeur, tuple):
+        return tuple(copie_resultat(element) for element in valeur)
+    return valeur
+
+
+class GestionnaireTaches:
+    """File de tâches partagée par les sessions, exécutées par un groupe de threads."""
+
+    def __init__(self, travailleurs=TRAVAILLEURS, conservees=TACHES_CONSERVEES):
+        self.travailleurs = travailleurs
+        self.conservees = conservees
+        self._executeur = None
+        self._taches = {}
+        self._phases = {}
+        self._compteur = itertools.count(1)
+        self._verrou = threading.Lock()
+
+    def soumettre(self, libelle, fonction, args=(), kwargs=None, proprietaire=None, signature=None, moteur=None, memoire=False):
+        """Ajoute une tâche à la file et la retourne ; elle démarre dès qu'un travailleur est libre."""
+        with self._verrou:
+            if self._executeur is None:
+                self._executeur = ThreadPoolExecutor(max_workers=self.travailleurs, thread_name_prefix='tache')
+            tache = Tache(next(self._compteur), libelle, fonction, args, kwargs, proprietaire, signature,
+                          moteur, memoire, self._phases.get(libelle))
+            self._taches[tache.identifiant] = tache
+            self._purger()
+        self._executeur.submit(self._executer, tache)
+        return tache
+
+    def _executer(self, tache):
+        tache._executer()
+        if tache.etat == TERMINEE:
+            # Nombre de phases retenu pour estimer la progression des prochaines exécutions
+            with self._verrou:
+                self._phases[tache.libelle] = tache.phases_commencees
+
+    def _purger(self):
+        # Seules les `conservees` dernières tâches terminées gardent leurs résultats
+        terminees = [identifiant for identifiant, tache in self._taches.items() if tache.terminee()]
+        for identifiant in terminees[:max(0, len(terminees) - self.conservees)]:
+            del self._taches[identifiant]
+
+    def tache(self, identifiant):
+        return self._taches.get(identifiant)
+
+    def taches(self, proprietaire=None):
+        return [tache for tache in list(self._taches.values()) if proprietaire is None or tache.proprietaire == proprietaire]
+
+    def position(self, tache):
+        # Nombre de tâches soumises avant `tache` et qui attendent encore un travailleur
+        return sum(1 for autre in self.taches() if autre.etat == EN_ATTENTE and autre.identifiant < tache.identifiant)
+
+    def oublier(self, identifiant):
+        # Annule la tâche si elle n'est pas terminée et libère ses résultats
+        with self._verrou:
+            tache = self._taches.pop(identifiant, None)
+        if tache is not None:
+            tache.annuler()
+
+    def tableau(self, proprietaire=None):
+        lignes = [{
+            'Tâche': tache.identifiant,
+            'Étape': tache.libelle,
+            'État': tache.etat,
+            'Phase': tache.phase,
+            'Soumise à': f"{tache.soumise_le:%H:%M:%S}",
+            'Durée (s)': round(tache.duree(), 1) if tache.duree() is not None else None,
+        } for tache in self.taches(proprietaire)]
+        return pd.DataFrame(lignes, columns=['Tâche', 'Étape', 'État', 'Phase', 'Soumise à', 'Durée (s)'])
+
+
+gestionnaire = GestionnaireTaches()
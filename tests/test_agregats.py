@@ -0,0 +1,50 @@
+import datetime
+
+import pandas as pd
+
+from agregats import AgregatsJournaliers
+
+
+def releve(jours_montants):
+    return pd.DataFrame({
+        'Date': [jour for jour, _ in jours_montants],
+        'Montant': [montant for _, montant in jours_montants],
+    })
+
+
+def test_un_jour_reimporte_remplace_le_jour_enregistre(tmp_path):
+    agregats = AgregatsJournaliers(str(tmp_path))
+    bilan = agregats.mettre_a_jour('MTN_PAYIN', releve([('2024-01-01 08:00:00', 100), ('2024-01-02 09:00:00', 200)]))
+    assert bilan == {'jours_ajoutes': 2, 'jours_remplaces': 0, 'jours_total': 2}
+
+    # Relevé en cumul : le 2 janvier est complété, le 3 est nouveau, le 1er (absent) est conservé
+    bilan = agregats.mettre_a_jour('MTN_PAYIN', releve([('2024-01-02 09:00:00', 200), ('2024-01-02 10:00:00', 300), ('2024-01-03 11:00:00', 50)]))
+    assert bilan == {'jours_ajoutes': 1, 'jours_remplaces': 1, 'jours_total': 3}
+
+    tcd = agregats.tcd('MTN_PAYIN')
+    assert tcd.index.tolist() == ['01-01-2024', '02-01-2024', '03-01-2024', 'Total']
+    assert tcd['Nombre de Montant'].tolist() == [1, 2, 1, 4]
+    assert tcd['Somme de Montant'].tolist() == [100, 500, 50, 650]
+    assert tcd['Somme des Frais'].tolist() == [99, 498, 49, 646]
+    assert tcd.loc['Total', 'Montant minimum'] == 50
+    assert tcd.loc['Total', 'Montant maximum'] == 300
+
+
+def test_tcd_bornes_incluses(tmp_path):
+    agregats = AgregatsJournaliers(str(tmp_path))
+    agregats.mettre_a_jour('MTN_PAYIN', releve([(f'2024-01-0{numero} 12:00:00', 10 * numero) for numero in range(1, 6)]))
+    assert agregats.periode('MTN_PAYIN') == (datetime.date(2024, 1, 1), datetime.date(2024, 1, 5))
+
+    tcd = agregats.tcd('MTN_PAYIN', datetime.date(2024, 1, 2), '2024-01-04')
+    assert tcd.index.tolist() == ['02-01-2024', '03-01-2024', '04-01-2024', 'Total']
+    assert tcd.loc['Total', 'Somme de Montant'] == 90
+
+    assert agregats.tcd('MTN_PAYIN', debut='2024-01-05').index.tolist() == ['05-01-2024', 'Total']
+    assert agregats.tcd('MTN_PAYIN', fin='2023-12-31').loc['Total', 'Nombre de Montant'] == 0
+
+
+def test_table_relue_depuis_le_disque(tmp_path):
+    AgregatsJournaliers(str(tmp_path)).mettre_a_jour('MTN_PAYIN', releve([('2024-01-01 08:00:00', 100), ('pas une date', 5), ('2024-01-01 09:00:00', 'abc')]))
+    autre_processus = AgregatsJournaliers(str(tmp_path))
+    assert autre_processus.tcd('MTN_PAYIN')['Nombre de Montant'].tolist() == [1, 1]
+    assert AgregatsJournaliers(str(tmp_path)).periode('TOGO_MONEY_PAYIN') == (None, None)
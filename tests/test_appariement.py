@@ -0,0 +1,43 @@
+import pandas as pd
+
+from etapes import nbsi_op_mtn_payin
+from incremental import RapprochementIncremental
+
+SUCCES = 'Successfully Processed Transaction'
+
+
+def releve_operateur(identifiants, heures):
+    return pd.DataFrame({
+        'TransactionId': identifiants,
+        'MSISDN': '0700',
+        'ResponseMessage': SUCCES,
+        'StartDateTime': [f'2024-01-01 {heure}' for heure in heures],
+        'Montant': 100,
+    })
+
+
+def back_office(identifiants, heures):
+    return pd.DataFrame({
+        'ID PAIEMENT': identifiants,
+        'TELEPHONE': '0700',
+        'MONTANT': 100,
+        'CREATION': [f'2024-01-01 {heure}' for heure in heures],
+        'ETAT TRANSACTION': 'SUCCES',
+    })
+
+
+def test_occurrences_sans_partenaire_en_ecart():
+    # Trois paiements du même téléphone, un seul au Back Office : un rapproché, deux écarts
+    resultats = nbsi_op_mtn_payin(releve_operateur([1, 2, 3], ['10:00', '11:00', '12:00']), back_office(['P1'], ['10:00']))
+    assert resultats['internes']['TransactionId'].tolist() == [1]
+    assert resultats['ecarts']['TransactionId'].tolist() == [2, 3]
+
+
+def test_incremental_ne_rapproche_pas_deux_fois_une_ligne_back_office(tmp_path):
+    rapprochement = RapprochementIncremental('MTN_PAYIN', str(tmp_path))
+    bo = back_office(['P1', 'P2'], ['10:00', '11:00'])
+    rapprochement.executer(nbsi_op_mtn_payin, releve_operateur([1], ['10:00']), bo, un_a_un=True)
+    resultats, _ = rapprochement.executer(nbsi_op_mtn_payin, releve_operateur([1, 2, 3], ['10:00', '11:00', '12:00']), bo, un_a_un=True)
+    assert sorted(resultats['internes']['ID PAIEMENT']) == ['P1', 'P2']
+    assert resultats['ecarts']['TransactionId'].tolist() == [3]
+    assert '_empreinte_back_office' not in resultats['internes'].columns
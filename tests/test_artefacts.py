@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('streamlit')
+
+import artefacts as module_artefacts  # noqa: E402
+from artefacts import SourceEntree, deposer, deposer_resultats, recuperer  # noqa: E402
+from lecture import ColonnesManquantesError  # noqa: E402
+
+
+class Fichier:
+    # Fichier importé tel que le présente st.file_uploader
+    def __init__(self, file_id, name='releve.xlsx', size=100):
+        self.file_id = file_id
+        self.name = name
+        self.size = size
+
+
+@pytest.fixture(autouse=True)
+def session(monkeypatch):
+    depot = {}
+    monkeypatch.setattr(module_artefacts, 'artefacts', lambda: depot)
+    return depot
+
+
+def resultats_nbsi_op():
+    return {'ecarts': pd.DataFrame({'TransactionId': [1, 2], 'MSISDN': ['0701', '0702']}), 'statistiques': 'non déposé'}
+
+
+def test_resultats_redeposes_a_chaque_relance_gardent_leur_signature():
+    sources = [SourceEntree('MTN_PAYIN', 'NBSI_OP', 'operateur', fichier=Fichier('f1'))]
+    deposer_resultats('MTN_PAYIN', 'NBSI_OP', resultats_nbsi_op(), sources, appariement='un_a_un')
+    premier = recuperer('MTN_PAYIN', 'NBSI_OP', 'ecarts')
+    reprise = SourceEntree('MTN_PAYIN', 'NBSI_ECART', 'ecarts', artefact=premier)
+    signature = reprise.signature()
+
+    # Relance de la page : mêmes entrées, mêmes paramètres
+    deposer_resultats('MTN_PAYIN', 'NBSI_OP', resultats_nbsi_op(), sources, appariement='un_a_un')
+    assert recuperer('MTN_PAYIN', 'NBSI_OP', 'ecarts') is premier
+    assert SourceEntree('MTN_PAYIN', 'NBSI_ECART', 'ecarts', artefact=recuperer('MTN_PAYIN', 'NBSI_OP', 'ecarts')).signature() == signature
+    assert recuperer('MTN_PAYIN', 'NBSI_OP', 'statistiques') is None
+
+    # Nouveau fichier importé ou autre paramètre : nouvel artefact, nouvelle signature
+    for sources_relance, parametres in (([SourceEntree('MTN_PAYIN', 'NBSI_OP', 'operateur', fichier=Fichier('f2'))], {'appariement': 'un_a_un'}),
+                                        (sources, {'appariement': 'toutes'})):
+        deposer_resultats('MTN_PAYIN', 'NBSI_OP', resultats_nbsi_op(), sources_relance, **parametres)
+        nouveau = recuperer('MTN_PAYIN', 'NBSI_OP', 'ecarts')
+        assert nouveau is not premier
+        assert SourceEntree('MTN_PAYIN', 'NBSI_ECART', 'ecarts', artefact=nouveau).signature() != signature
+
+
+def test_entree_reprise_ne_garde_que_les_colonnes_lues_par_l_etape():
+    operateur = pd.DataFrame({'External Transaction Id': ['a'], 'Date': ['2024-01-05'], 'HEURE': ['10:00:00'], 'Montant': [100]})
+    artefact = deposer('MTN_PAYIN', 'NBSI_OP', 'operateur', operateur, module_artefacts.FICHIER_IMPORTE, provenance=('f1',))
+    assert artefact.convient('MTN_PAYIN', 'RECHERCHEV', 'operateur')
+
+    reprise = SourceEntree('MTN_PAYIN', 'RECHERCHEV', 'operateur', artefact=artefact).charger()
+    assert list(reprise.columns) == ['External Transaction Id', 'Date', 'HEURE']
+    # L'étape qui modifie son entrée ne modifie pas l'artefact
+    reprise['Date'] = 'modifiée'
+    assert artefact.df['Date'].tolist() == ['2024-01-05']
+
+
+def test_artefact_sans_les_colonnes_de_l_etape():
+    artefact = deposer('MTN_PAYIN', 'NBSI_OP', 'operateur', pd.DataFrame({'Date': ['2024-01-05']}), provenance=('f1',))
+    assert not artefact.convient('MTN_PAYIN', 'RECHERCHEV', 'operateur')
+    with pytest.raises(ColonnesManquantesError):
+        SourceEntree('MTN_PAYIN', 'RECHERCHEV', 'operateur', artefact=artefact).charger()
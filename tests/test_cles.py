@@ -0,0 +1,25 @@
+import pandas as pd
+
+from cles import BrancheCle, SpecCle
+
+
+def test_dates_a_minuit_gardent_leur_heure():
+    # La branche Orange ne contient que des dates à minuit : la clé doit rester celle de la f-string d'origine
+    df = pd.DataFrame({
+        'Operator': ['Orange_CI', 'MTN_CI'],
+        'Numéro': ['0700000001', '0500000002'],
+        'Date': pd.to_datetime(['2024-01-01 00:00:00', '2024-01-01 10:30:00']),
+        'Montant': [1000, 2500],
+    })
+    spec = SpecCle([
+        BrancheCle(['Numéro', 'Date', 'Montant'], si=('Operator', ['Orange_CI'])),
+        BrancheCle(['Numéro', 'Date', 'Montant']),
+    ])
+    attendu = [f"{ligne['Numéro']}_{ligne['Date']}_{ligne['Montant']}" for _, ligne in df.iterrows()]
+    assert spec.construire(df).tolist() == attendu
+    assert attendu[0] == '0700000001_2024-01-01 00:00:00_1000'
+
+
+def test_date_vide():
+    df = pd.DataFrame({'Numéro': ['1', '2'], 'Date': pd.to_datetime(['2024-01-01', None])})
+    assert SpecCle(BrancheCle(['Numéro', 'Date'])).construire(df).tolist() == ['1_2024-01-01 00:00:00', '2_NaT']
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+import cli
+from entrepot import entrepot
+
+
+@pytest.fixture(autouse=True)
+def sans_entrepot(monkeypatch):
+    # Les relevés de test ne sont pas rangés dans l'entrepôt Parquet du dépôt
+    monkeypatch.setattr(entrepot, 'dossier', '')
+
+
+def fichiers_mtn(dossier):
+    operateur = dossier / 'mtn.csv'
+    back_office = dossier / 'bo.csv'
+    pd.DataFrame({
+        'TransactionId': ['1', '2', '3'],
+        'MSISDN': ['0701', '0702', '0703'],
+        'ResponseMessage': 'Successfully Processed Transaction',
+        'StartDateTime': '2024-01-05 10:00',
+        'Montant': 100,
+    }).to_csv(operateur, index=False)
+    pd.DataFrame({
+        'ID PAIEMENT': ['P1', 'P2'],
+        'TELEPHONE': ['0701', '0702'],
+        'MONTANT': 100,
+        'CREATION': '2024-01-05 10:00',
+        'ETAT TRANSACTION': 'SUCCES',
+    }).to_csv(back_office, index=False)
+    return operateur, back_office
+
+
+def test_liste(capsys):
+    assert cli.main(['--liste']) == 0
+    assert 'MTN_PAYIN' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('arguments', [[], ['MTN_PAYIN'], ['MTN_PAYIN', 'INCONNUE'], ['INCONNU', 'NBSI_OP']])
+def test_operateur_ou_etape_manquant_ou_inconnu(arguments, capsys):
+    with pytest.raises(SystemExit) as erreur:
+        cli.main(arguments)
+    assert erreur.value.code == 2
+    assert '--liste' in capsys.readouterr().err
+
+
+def test_entrees_invalides_ou_manquantes(tmp_path, capsys):
+    operateur, _ = fichiers_mtn(tmp_path)
+    assert cli.main(['MTN_PAYIN', 'NBSI_OP', '--entree', 'operateur']) == 1
+    assert 'Entrée invalide' in capsys.readouterr().err
+    assert cli.main(['MTN_PAYIN', 'NBSI_OP', '--entree', f'operateur={operateur}']) == 1
+    assert 'Entrées manquantes pour MTN_PAYIN NBSI_OP : back_office' in capsys.readouterr().err
+
+
+def test_execution_en_csv(tmp_path, capsys):
+    operateur, back_office = fichiers_mtn(tmp_path)
+    sortie = tmp_path / 'resultats'
+    # Noms normalisés : casse, tirets et espaces
+    code = cli.main(['mtn-payin', 'nbsi op', '--entree', f'operateur={operateur}', '--entree', f'back_office={back_office}',
+                     '--sortie', str(sortie), '--format', 'csv'])
+    assert code == 0
+    assert sorted(chemin.name for chemin in sortie.iterdir()) == ['doublons_mtn.csv', 'ecarts_test_mtn.csv', 'transactions_internes.csv']
+    ecarts = pd.read_csv(sortie / 'ecarts_test_mtn.csv')
+    assert ecarts['TransactionId'].tolist() == [3]
+    assert 'MTN_PAYIN NBSI_OP terminé' in capsys.readouterr().out
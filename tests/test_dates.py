@@ -0,0 +1,49 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import dates
+from dates import CacheDates, canoniser_dates, convertir_dates
+
+
+def test_format_operateur_jour_avant_mois():
+    dates = convertir_dates(pd.Series(['01/06/2023', '02/06/2023']), 'ORANGE_MONEY_PAYIN', cache=CacheDates())
+    assert dates.tolist() == [pd.Timestamp('2023-06-01'), pd.Timestamp('2023-06-02')]
+
+
+def test_cache_garde_les_textes_hors_format_principal(monkeypatch):
+    cache = CacheDates()
+    # Le format de la colonne est reconnu sur ses premiers textes distincts
+    horodatages = [f'2024-01-05 10:{minute:02d}:{seconde:02d}' for minute in range(5) for seconde in range(60)]
+    serie = pd.Series(horodatages + ['05/01/2024 11:30', None])
+    premiere = convertir_dates(serie, 'MTN_PAYIN', cache=cache)
+    assert premiere.iloc[0] == pd.Timestamp('2024-01-05 10:00:00')
+    assert premiere.iloc[-2] == pd.Timestamp('2024-01-05 11:30')
+    assert pd.isna(premiere.iloc[-1])
+    # Seul le texte d'un autre format que celui de la colonne est gardé
+    assert len(cache) == 1
+
+    # Deuxième appel : le texte est lu dans le cache, sans nouvelle analyse
+    def analyse_inattendue(*args, **kwargs):
+        raise AssertionError("texte analysé de nouveau")
+    monkeypatch.setattr(dates, 'analyser_textes', analyse_inattendue)
+    pd.testing.assert_series_equal(convertir_dates(serie, 'MTN_PAYIN', cache=cache), premiere)
+
+
+def test_cache_borne():
+    cache = CacheDates(taille_max=2)
+    cache.ajouter(['a', 'b', 'c'], np.array([1, 2, 3], dtype='int64'))
+    assert len(cache) == 2
+    assert np.isnan(cache.chercher(['a'])[0])
+    assert cache.chercher(['c'])[0] == 3
+
+
+def test_canoniser_dates_colonne_mixte():
+    serie = pd.Series(['05/01/2024', 'abc', None, pd.Timestamp('2024-01-05 10:00'), datetime.date(2024, 1, 6), 12, '31/02/2024'], dtype=object)
+    assert canoniser_dates(serie).tolist() == ['2024-01-05', 'abc', None, '2024-01-05 10:00:00', '2024-01-06', 12, '31/02/2024']
+
+
+def test_canoniser_dates_colonne_de_textes():
+    serie = pd.Series(['2024-01-05 00:00:00', 'x', '2024-01-05 00:00:00'], dtype='string')
+    assert canoniser_dates(serie).tolist() == ['2024-01-05', 'x', '2024-01-05']
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from doublons import CRITERE_FENETRE, CRITERE_IDENTIFIANT, SOURCE_BACK_OFFICE, SOURCE_OPERATEUR, detecter_doublons
+
+
+def releve_mtn():
+    return pd.DataFrame({
+        'TransactionId': [101, 102, 101.0, 103],
+        'MSISDN': ['0701', '0702', '0703', '0704'],
+        'Montant': [1000, 2000, 3000, 4000],
+        'StartDateTime': ['2024-01-05 10:00:00', '2024-01-05 11:00:00', '2024-01-05 12:00:00', '2024-01-05 13:00:00'],
+    })
+
+
+def back_office_mtn():
+    return pd.DataFrame({
+        'ID PAIEMENT': ['P1', 'P2', 'P3', 'P4'],
+        'TELEPHONE': ['0701', '0701', '0701', '0702'],
+        'MONTANT': [500, 500, 500, 500],
+        # P1 et P2 à 90 s (même seau ou seaux voisins), P3 à plus de la fenêtre de P2
+        'CREATION': ['2024-01-05 10:00:00', '2024-01-05 10:01:30', '2024-01-05 10:05:00', '2024-01-05 10:00:10'],
+    })
+
+
+def test_meme_identifiant_dans_le_releve():
+    rapport = detecter_doublons('MTN_PAYIN', releve_mtn(), back_office_mtn().iloc[[0, 3]])
+    assert rapport['source'].tolist() == [SOURCE_OPERATEUR] * 2
+    assert rapport['critère'].tolist() == [CRITERE_IDENTIFIANT] * 2
+    # 101 et 101.0 sont le même identifiant une fois normalisé
+    assert rapport['ligne'].tolist() == [0, 2]
+    assert rapport['occurrences'].tolist() == [2, 2]
+    assert rapport['groupe'].nunique() == 1
+
+
+def test_double_credit_au_back_office():
+    rapport = detecter_doublons('MTN_PAYIN', releve_mtn().iloc[[0, 1, 3]], back_office_mtn(), fenetre=120)
+    assert (rapport['source'] == SOURCE_BACK_OFFICE).all()
+    assert (rapport['critère'] == CRITERE_FENETRE).all()
+    assert sorted(rapport['identifiant']) == ['P1', 'P2']
+    assert rapport['occurrences'].tolist() == [2, 2]
+    # Une fenêtre plus large relève aussi P3, à 210 s de P2
+    assert sorted(detecter_doublons('MTN_PAYIN', releve_mtn().iloc[[0]], back_office_mtn(), fenetre=300)['identifiant']) == ['P1', 'P2', 'P3']
+
+
+def test_masques_et_groupes_numerotes_a_la_suite():
+    rapport = detecter_doublons('MTN_PAYIN', releve_mtn(), back_office_mtn(), fenetre=120)
+    assert rapport['groupe'].tolist() == [0, 0, 1, 1]
+    # Hors des lignes retenues par les filtres de l'étape, le doublon n'est plus relevé
+    masque = pd.Series([True, True, False, True])
+    rapport = detecter_doublons('MTN_PAYIN', releve_mtn(), back_office_mtn(), masque_operateur=masque, fenetre=120)
+    assert (rapport['source'] == SOURCE_BACK_OFFICE).all()
+
+
+def test_operateur_sans_doublons_connus():
+    rapport = detecter_doublons('ORANGE_PENDING_PAYOUT', releve_mtn(), back_office_mtn())
+    assert rapport.empty
+    assert 'critère' in rapport.columns
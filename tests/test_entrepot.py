@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from entrepot import EntrepotParquet, typer_pour_parquet
+
+pytest.importorskip('pyarrow')
+
+
+def releve(jours, montants):
+    return pd.DataFrame({
+        'StartDateTime': jours,
+        'Montant': montants,
+        'MSISDN': ['0701'] * len(jours),
+        # Colonne mixte d'un export Excel : nombres et textes
+        'Référence': pd.Series([1234, 'A-12', None][:len(jours)], dtype=object),
+    })
+
+
+def test_typer_pour_parquet_colonnes_mixtes():
+    df = pd.DataFrame({
+        'Mixte': pd.Series([1, 'a', None, 2.5], dtype=object),
+        'Textes': pd.Series(['x', None, 'y', 'z'], dtype=object),
+        'Nombres': [1, 2, 3, 4],
+    })
+    type_ = typer_pour_parquet(df)
+    assert type_['Mixte'].tolist()[:2] == ['1', 'a'] and type_['Mixte'].tolist()[3] == '2.5'
+    assert pd.isna(type_['Mixte'].iloc[2])
+    # Les colonnes homogènes sont laissées telles quelles, et l'original n'est pas modifié
+    assert type_['Textes'].dtype == df['Textes'].dtype
+    assert type_['Nombres'].dtype == df['Nombres'].dtype
+    assert df['Mixte'].tolist()[:2] == [1, 'a']
+
+
+def test_aller_retour_et_manifeste(tmp_path):
+    entrepot = EntrepotParquet(str(tmp_path))
+    df = releve(['2024-01-05 10:00', '2024-01-07 11:00', '2024-01-06 09:00'], [100, 200, 300])
+    entree = entrepot.enregistrer('abc', df, operateur='MTN_PAYIN', type_source='operateur', nom_origine='mtn.xlsx')
+    assert (entree['date_min'], entree['date_max'], entree['lignes']) == ('2024-01-05', '2024-01-07', 3)
+
+    # Un nouvel objet relit le manifeste sur disque
+    entree = EntrepotParquet(str(tmp_path)).chercher('abc')
+    relu = entrepot.lire(entree)
+    assert relu.columns.tolist() == df.columns.tolist()
+    assert relu['Montant'].tolist() == [100, 200, 300]
+    assert relu['Référence'].tolist()[:2] == ['1234', 'A-12'] and pd.isna(relu['Référence'].iloc[2])
+    # Lecture partielle : les colonnes inconnues du relevé sont ignorées
+    assert entrepot.lire(entree, ['Montant', 'Absente']).columns.tolist() == ['Montant']
+    assert entrepot.chercher('inconnu') is None
+
+
+def test_charger_sur_une_periode(tmp_path):
+    entrepot = EntrepotParquet(str(tmp_path))
+    entrepot.enregistrer('janvier', releve(['2024-01-05', '2024-01-20'], [100, 200]), 'MTN_PAYIN', 'operateur')
+    entrepot.enregistrer('fevrier', releve(['2024-02-03'], [300]), 'MTN_PAYIN', 'operateur')
+    entrepot.enregistrer('bo', releve(['2024-01-05'], [400]), 'MTN_PAYIN', 'back_office')
+
+    assert entrepot.charger('MTN_PAYIN', 'operateur')['Montant'].tolist() == [100, 200, 300]
+    assert entrepot.charger('MTN_PAYIN', 'operateur', debut='2024-01-21', colonnes=['Montant'])['Montant'].tolist() == [300]
+    assert entrepot.charger('MTN_PAYIN', 'operateur', fin='2024-01-04').empty
+
+
+def test_entrepot_desactive():
+    assert EntrepotParquet('').enregistrer('abc', releve(['2024-01-05'], [100])) is None
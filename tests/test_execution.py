@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from execution import DUCKDB, POLARS, agreger, fusionner
+
+MODULES = {DUCKDB: 'duckdb', POLARS: 'polars'}
+
+
+@pytest.fixture(params=[DUCKDB, POLARS])
+def moteur(request):
+    # Moteurs facultatifs : le test est ignoré si la bibliothèque n'est pas installée
+    pytest.importorskip(MODULES[request.param])
+    return request.param
+
+
+def releves():
+    rng = np.random.default_rng(0)
+    gauche = pd.DataFrame({
+        'MSISDN': rng.choice(['0700', '0701', '0702', None], 300),
+        'Date': rng.choice(['2024-01-01', '2024-01-02'], 300),
+        'Montant': rng.integers(0, 5, 300),
+        'ID': np.arange(300),
+    })
+    droite = pd.DataFrame({
+        'TELEPHONE': rng.choice(['0700', '0702', '0703', None], 200),
+        'Date': rng.choice(['2024-01-01', '2024-01-03'], 200),
+        'Montant': rng.integers(0, 5, 200).astype(float),
+        'ID': np.arange(200),
+    })
+    return gauche, droite
+
+
+@pytest.mark.parametrize('how', ['inner', 'left'])
+def test_jointure_identique_a_pandas(moteur, how):
+    gauche, droite = releves()
+    attendu = pd.merge(gauche, droite, left_on='MSISDN', right_on='TELEPHONE', how=how, indicator=True)
+    resultat = fusionner(gauche, droite, left_on='MSISDN', right_on='TELEPHONE', how=how, indicator=True, moteur=moteur)
+    pd.testing.assert_frame_equal(resultat, attendu)
+
+
+@pytest.mark.parametrize('how', ['inner', 'left'])
+def test_jointure_multi_colonnes_identique_a_pandas(moteur, how):
+    gauche, droite = releves()
+    attendu = pd.merge(gauche, droite, on=['Date', 'Montant'], how=how)
+    resultat = fusionner(gauche, droite, on=['Date', 'Montant'], how=how, moteur=moteur)
+    pd.testing.assert_frame_equal(resultat, attendu)
+
+
+def test_agregation_identique_a_pandas(moteur):
+    gauche, _ = releves()
+    attendu = gauche['Montant'].groupby(gauche['Date']).agg(['count', 'sum'])
+    pd.testing.assert_frame_equal(agreger(gauche['Date'], gauche['Montant'], moteur=moteur), attendu, check_dtype=False)
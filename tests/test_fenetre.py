@@ -0,0 +1,68 @@
+import pandas as pd
+
+from etapes import nbsi_ecart_togo_money_payin
+from fenetre import COLONNE_ECART, fusionner_fenetre, remplir_fenetre
+
+
+def ecarts():
+    return pd.DataFrame({
+        'N° de Compte2': ['0701', '0702', '0703', '0704'],
+        'Crédit': [100, 200, 300, 400],
+        'Date': ['05/01/2024'] * 4,
+        'Heure': ['10:00:00', '10:00:00', '10:00:00', None],
+    })
+
+
+def en_echec():
+    return pd.DataFrame({
+        'TÉLÉPHONE': ['0701', '0702', '0703', '0704'],
+        'MONTANT': [100, 200, 999, 400],
+        'CREATION': ['2024-01-05'] * 4,
+        'heure': ['10:00:05', '10:00:06', '10:00:00', '10:00:00'],
+        'ID TRANSACTION': ['T1', 'T2', 'T3', 'T4'],
+    })
+
+
+def test_tolerance_incluse_et_depassee():
+    fusion = fusionner_fenetre(ecarts(), en_echec(), ['N° de Compte2', 'Crédit'], ['TÉLÉPHONE', 'MONTANT'], ('Date', 'Heure'), ('CREATION', 'heure'), 5)
+    assert len(fusion) == 4
+    # 5 s d'écart : dans la tolérance ; 6 s : au-delà ; montant différent : jamais rapproché
+    assert fusion['ID TRANSACTION'].iloc[0] == 'T1'
+    assert fusion[COLONNE_ECART].iloc[0] == 5
+    assert fusion['ID TRANSACTION'].iloc[1:3].isna().all()
+    assert fusion[COLONNE_ECART].iloc[1:3].isna().all()
+
+
+def test_sans_heure_l_horodatage_de_la_date_est_garde():
+    # Date sans heure : minuit, soit 10 h d'écart avec la transaction en échec
+    fusion = fusionner_fenetre(ecarts(), en_echec(), ['N° de Compte2', 'Crédit'], ['TÉLÉPHONE', 'MONTANT'], ('Date', 'Heure'), ('CREATION', 'heure'), 60)
+    assert pd.isna(fusion['ID TRANSACTION'].iloc[3])
+    fusion = fusionner_fenetre(ecarts(), en_echec(), ['N° de Compte2', 'Crédit'], ['TÉLÉPHONE', 'MONTANT'], ('Date', 'Heure'), ('CREATION', 'heure'), 36000)
+    assert fusion['ID TRANSACTION'].iloc[3] == 'T4'
+
+
+def test_transaction_la_plus_proche_retenue():
+    reference = pd.DataFrame({
+        'TELEPHONE': ['0701'] * 3,
+        'MONTANT': [100] * 3,
+        'DATE PAIEMENT': ['2024-01-05 09:59:58', '2024-01-05 10:00:01', '2024-01-05 10:00:09'],
+        'SITE_ID': ['S1', 'S2', 'S3'],
+        'ID TRANSACTION': ['T1', 'T2', 'T3'],
+    })
+    df = pd.DataFrame({'Receiver': ['0701', '0702'], 'Amount': [100, 100], 'Created At': ['2024-01-05 10:00:00'] * 2})
+    rempli = remplir_fenetre(df, reference, ['Receiver', 'Amount'], ['TELEPHONE', 'MONTANT'], ('Created At', None), ('DATE PAIEMENT', None), 10, ['SITE_ID', 'ID TRANSACTION'])
+    assert rempli['SITE_ID'].tolist() == ['S2', '']
+    assert rempli['ID TRANSACTION'].tolist() == ['T2', '']
+    assert rempli[COLONNE_ECART].iloc[0] == 1
+    assert pd.isna(rempli[COLONNE_ECART].iloc[1])
+
+
+def test_nbsi_ecart_tmoney_avec_tolerance():
+    ecarts_tmoney = pd.DataFrame({'Initiator': ['0701', '0702'], 'Date': ['2024-01-05 10:00:00', '2024-01-05 10:00:00']})
+    echecs = pd.DataFrame({'TÉLÉPHONE': ['0701', '0702'], 'CREATION': ['2024-01-05 10:00:02', '2024-01-05 10:01:00'],
+                           'ID TRANSACTION': ['T1', 'T2'], 'SITE_ID': ['S1', 'S2']})
+    assert nbsi_ecart_togo_money_payin(ecarts_tmoney.copy(), echecs.copy())['resultat']['ID TRANSACTION'].isna().all()
+    resultat = nbsi_ecart_togo_money_payin(ecarts_tmoney.copy(), echecs.copy(), tolerance_secondes=5)['resultat']
+    assert resultat['ID TRANSACTION'].iloc[0] == 'T1'
+    assert pd.isna(resultat['ID TRANSACTION'].iloc[1])
+    assert resultat[COLONNE_ECART].iloc[0] == 2
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from etapes import nbsi_op_mtn_payin
+from incremental import RapprochementIncremental
+
+SUCCES = 'Successfully Processed Transaction'
+
+
+def releve_operateur(identifiants, telephones, jour):
+    return pd.DataFrame({
+        'TransactionId': identifiants,
+        'MSISDN': telephones,
+        'ResponseMessage': SUCCES,
+        'StartDateTime': f'{jour} 10:00',
+        'Montant': 100,
+    })
+
+
+def back_office(telephones, jour):
+    return pd.DataFrame({
+        'ID PAIEMENT': [f'P{telephone}' for telephone in telephones],
+        'TELEPHONE': telephones,
+        'MONTANT': 100,
+        'CREATION': f'{jour} 10:00',
+        'ETAT TRANSACTION': 'SUCCES',
+    })
+
+
+def test_relance_sur_le_meme_releve_ne_retraite_que_les_ecarts(tmp_path):
+    rapprochement = RapprochementIncremental('MTN_PAYIN', str(tmp_path))
+    operateur = releve_operateur([1, 2, 3], ['0701', '0702', '0703'], '2024-01-05')
+    bo = back_office(['0701', '0702'], '2024-01-05')
+    premier, _ = rapprochement.executer(nbsi_op_mtn_payin, operateur, bo, un_a_un=True)
+    second, statistiques = rapprochement.executer(nbsi_op_mtn_payin, operateur, bo, un_a_un=True)
+
+    assert statistiques['lignes_traitees'] == 1
+    assert statistiques['lignes_ignorees'] == 2
+    for nom in ('ecarts', 'internes'):
+        pd.testing.assert_frame_equal(second[nom].sort_values('TransactionId', ignore_index=True),
+                                      premier[nom].sort_values('TransactionId', ignore_index=True))
+
+
+def test_changement_de_mois_oublie_les_transactions_du_mois_precedent(tmp_path):
+    rapprochement = RapprochementIncremental('MTN_PAYIN', str(tmp_path))
+    janvier, _ = rapprochement.executer(nbsi_op_mtn_payin, releve_operateur([1, 2], ['0701', '0702'], '2024-01-31'), back_office(['0799'], '2024-01-31'))
+    assert janvier['ecarts']['TransactionId'].tolist() == [1, 2]
+
+    fevrier, statistiques = rapprochement.executer(nbsi_op_mtn_payin, releve_operateur([3, 4], ['0703', '0704'], '2024-02-01'), back_office(['0704'], '2024-02-01'))
+    assert fevrier['ecarts']['TransactionId'].tolist() == [3]
+    assert fevrier['internes']['TransactionId'].tolist() == [4]
+    assert statistiques['date_max_vue'] == '2024-02-01T10:00:00'
+
+    _, index, empreintes_back_office, _ = rapprochement.charger_etat()
+    assert sorted(index['id']) == ['3', '4']
+    assert len(empreintes_back_office) == 1
@@ -0,0 +1,68 @@
+import pandas as pd
+
+from instrumentation import collecter, collecteur_courant, instrumente, mesurer
+
+
+@instrumente
+def etape_test(df_operateur, df_back_office):
+    with mesurer('filtrage', len(df_operateur)) as mesure:
+        filtre = df_operateur[df_operateur['Montant'] > 100]
+        mesure.lignes_sortie = len(filtre)
+        mesure.detail = 'cache'
+    with mesurer('allocation') as mesure:
+        mesure.lignes_sortie = len([0] * 500_000)
+    return {'ecarts': filtre, 'internes': df_back_office}
+
+
+def donnees():
+    return pd.DataFrame({'Montant': [50, 150, 250]}), pd.DataFrame({'MONTANT': [100, 200]})
+
+
+def test_tableau_des_phases_imbriquees():
+    with collecter('MTN PAYIN') as collecteur:
+        etape_test(*donnees())
+    assert collecteur_courant() is None
+
+    tableau = collecteur.tableau()
+    assert tableau['Phase'].tolist() == ['etape_test', '    filtrage', '    allocation']
+    assert tableau['Lignes en entrée'].tolist()[:2] == [5, 3]
+    assert tableau['Lignes en sortie'].tolist() == [4, 2, 500_000]
+    assert pd.isna(tableau['Lignes en entrée'].iloc[2])
+    assert tableau['Détail'].tolist() == ['', 'cache', '']
+    # Sans suivi de la mémoire, pas de pic relevé
+    assert tableau['Pic mémoire (Mo)'].isna().all()
+    assert (tableau['Durée (s)'] >= 0).all()
+
+
+def test_pic_memoire_remonte_a_la_phase_parente():
+    with collecter('MTN PAYIN', memoire=True) as collecteur:
+        etape_test(*donnees())
+    etape, _, allocation = collecteur.mesures
+    # Une liste de 500 000 éléments occupe environ 4 Mo
+    assert allocation.pic_octets > 3_000_000
+    assert etape.pic_octets >= allocation.pic_octets
+
+
+def test_hors_collecteur():
+    with mesurer('phase', 10) as mesure:
+        pass
+    assert mesure.lignes_entree == 10
+    assert etape_test(*donnees())['ecarts']['Montant'].tolist() == [150, 250]
+
+
+def test_journal_des_metriques(tmp_path):
+    chemin = str(tmp_path / 'metriques.csv')
+    for page in ('MTN PAYIN', 'TOGO MONEY PAYIN'):
+        with collecter(page) as collecteur:
+            etape_test(*donnees())
+        collecteur.enregistrer(chemin)
+    # Un collecteur sans mesure n'écrit rien
+    with collecter('vide') as collecteur:
+        pass
+    collecteur.enregistrer(chemin)
+
+    journal = pd.read_csv(chemin)
+    assert len(journal) == 6
+    assert journal['page'].unique().tolist() == ['MTN PAYIN', 'TOGO MONEY PAYIN']
+    assert journal['phase'].tolist()[:3] == ['etape_test', 'filtrage', 'allocation']
+    assert journal['niveau'].tolist()[:3] == [0, 1, 1]
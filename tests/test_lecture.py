@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+import lecture
+from entrepot import entrepot
+from lecture import CacheFichiers, ColonnesManquantesError, lire_fichier
+
+
+@pytest.fixture
+def analyses(monkeypatch, tmp_path):
+    # Sans entrepôt Parquet : seul le cache évite les analyses ; chaque analyse (en-tête compris) est comptée
+    monkeypatch.setattr(entrepot, 'dossier', '')
+    compteur = {'analyses': 0}
+    analyser = lecture.analyser_fichier
+
+    def analyser_compte(*args, **kwargs):
+        compteur['analyses'] += 1
+        return analyser(*args, **kwargs)
+
+    monkeypatch.setattr(lecture, 'analyser_fichier', analyser_compte)
+    chemin = tmp_path / 'releve.csv'
+    pd.DataFrame({'Date': ['2024-01-01', '2024-01-02'], 'Montant': [100, 200], 'MSISDN': ['0700', '0701']}).to_csv(chemin, index=False)
+    return compteur, str(chemin)
+
+
+def test_lecture_partielle_analysee_une_fois(analyses):
+    compteur, chemin = analyses
+    cache = CacheFichiers()
+    for _ in range(3):
+        df = lire_fichier(chemin, cache=cache, colonnes=['Date', 'Montant'], requises=['MSISDN'], compacter=False)
+    assert list(df.columns) == ['Date', 'Montant']
+    # En-tête puis corps à la première lecture, rien ensuite
+    assert compteur['analyses'] == 2
+    assert cache.statistiques()['hits'] == 2
+
+
+def test_lecture_partielle_servie_par_le_fichier_complet(analyses):
+    compteur, chemin = analyses
+    cache = CacheFichiers()
+    lire_fichier(chemin, cache=cache, compacter=False)
+    df = lire_fichier(chemin, cache=cache, colonnes=['Montant'], requises=['Date'], compacter=False)
+    assert list(df.columns) == ['Montant']
+    assert compteur['analyses'] == 1
+
+
+def test_colonne_requise_verifiee_sur_un_succes_du_cache(analyses):
+    _, chemin = analyses
+    cache = CacheFichiers()
+    lire_fichier(chemin, cache=cache, colonnes=['Date'], compacter=False)
+    with pytest.raises(ColonnesManquantesError):
+        lire_fichier(chemin, cache=cache, colonnes=['Date'], requises=['TELEPHONE'], compacter=False)
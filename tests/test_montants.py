@@ -0,0 +1,16 @@
+import pandas as pd
+
+from montants import MOTIF_ARRONDI, MOTIF_NON_NUMERIQUE, analyser_montants
+
+
+def test_ecritures_des_montants():
+    serie = pd.Series(['1,000', '5,000', '1,234,567', '-2,500', '1,000.00', '1 000', '1000', '1000,0', ' ', None])
+    montants, anomalies = analyser_montants(serie)
+    assert montants.tolist() == [1000, 5000, 1234567, -2500, 1000, 1000, 1000, 1000, pd.NA, pd.NA]
+    assert anomalies.empty
+
+
+def test_virgule_decimale_et_anomalies():
+    montants, anomalies = analyser_montants(pd.Series(['1000,5', '12,50', 'N/A']))
+    assert montants.tolist() == [1000, 12, pd.NA]
+    assert anomalies['motif'].tolist() == [MOTIF_ARRONDI, MOTIF_ARRONDI, MOTIF_NON_NUMERIQUE]
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from moteur import SpecRapprochement, rapprocher
+
+
+def fusion_pandas(gauche, droite, spec):
+    # Écarts tels que les produisait la page : fusion gauche avec indicateur, lignes 'left_only'
+    fusion = pd.merge(gauche, droite, left_on=spec.cles_operateur, right_on=spec.cles_back_office, how='left', indicator=True)
+    return fusion[fusion['_merge'] == 'left_only']
+
+
+def test_gabarit_fusion_reproduit_les_colonnes_d_une_fusion_pandas():
+    operateur = pd.DataFrame({'Référence': ['R1', 'R2', 'R3'], 'Montant': [100, 200, 300], 'Date': ['d1', 'd2', 'd3']})
+    back_office = pd.DataFrame({'ID PAIEMENT': ['R2'], 'Montant': [200], 'SITE_ID': ['S2']})
+    spec = SpecRapprochement('Référence', 'ID PAIEMENT', gabarit_fusion=True)
+
+    ecarts = rapprocher(spec, operateur, back_office)['ecarts']
+    attendu = fusion_pandas(operateur, back_office, spec)
+    assert list(ecarts.columns) == list(attendu.columns)
+    assert ecarts['Référence'].tolist() == ['R1', 'R3']
+    assert ecarts['Montant_x'].tolist() == [100, 300]
+    assert ecarts[['ID PAIEMENT', 'Montant_y', 'SITE_ID']].isna().all().all()
+    assert (ecarts['_merge'] == 'left_only').all()
+    assert list(ecarts['_merge'].cat.categories) == ['left_only', 'right_only', 'both']
+
+
+def test_gabarit_fusion_cle_de_meme_nom_non_dupliquee():
+    operateur = pd.DataFrame({'slug': ['a', 'b'], 'Amount': [1, 2]})
+    back_office = pd.DataFrame({'slug': ['b'], 'Traitant': ['x']})
+    spec = SpecRapprochement('slug', 'slug', gabarit_fusion=True)
+
+    ecarts = rapprocher(spec, operateur, back_office)['ecarts']
+    assert list(ecarts.columns) == list(fusion_pandas(operateur, back_office, spec).columns) == ['slug', 'Amount', 'Traitant', '_merge']
+    assert ecarts['slug'].tolist() == ['a']
+
+
+def test_sans_gabarit_les_ecarts_gardent_les_colonnes_operateur():
+    operateur = pd.DataFrame({'Transaction Id': [1, 2], 'Type': ['sell', 'buy'], 'State': ['Completed', 'Completed']})
+    back_office = pd.DataFrame({'ID PAIEMENT': [9], 'ETAT TRANSACTION': ['SUCCES']})
+    spec = SpecRapprochement('Transaction Id', 'ID PAIEMENT', filtre_operateur={'Type': 'sell', 'State': 'Completed'})
+
+    ecarts = rapprocher(spec, operateur, back_office)['ecarts']
+    assert list(ecarts.columns) == list(operateur.columns)
+    assert ecarts['Transaction Id'].tolist() == [1]
@@ -0,0 +1,65 @@
+import json
+
+import pandas as pd
+import pytest
+
+from agregats import agregats
+from entrepot import entrepot
+from parallele import charger_manifeste, executer_tous
+
+
+@pytest.fixture(autouse=True)
+def dossiers_temporaires(monkeypatch, tmp_path):
+    # Ni entrepôt Parquet ni agrégats du dépôt (les processus de travail héritent de ces attributs)
+    monkeypatch.setattr(entrepot, 'dossier', '')
+    monkeypatch.setattr(agregats, 'dossier', str(tmp_path / 'agregats'))
+
+
+def manifeste_mtn_et_togo(dossier):
+    pd.DataFrame({
+        'TransactionId': ['1', '2'],
+        'MSISDN': ['0701', '0702'],
+        'ResponseMessage': 'Successfully Processed Transaction',
+        'Date': ['2024-01-05', '2024-01-06'],
+        'Montant': [100, 200],
+    }).to_csv(dossier / 'mtn.csv', index=False)
+    pd.DataFrame({
+        'ID PAIEMENT': ['P1'],
+        'TELEPHONE': ['0701'],
+        'MONTANT': [100],
+        'ETAT TRANSACTION': 'SUCCES',
+    }).to_csv(dossier / 'bo.csv', index=False)
+    chemin = dossier / 'manifeste.json'
+    chemin.write_text(json.dumps({
+        'mtn_payin': {'operateur': 'mtn.csv', 'back_office': 'bo.csv'},
+        # Fichiers absents : les deux étapes de TMoney échouent
+        'TOGO_MONEY_PAYIN': {'operateur': 'absent.csv', 'back_office': 'bo.csv'},
+    }), encoding='utf-8')
+    return str(chemin)
+
+
+def test_manifeste_relatif_au_dossier(tmp_path):
+    manifeste = charger_manifeste(manifeste_mtn_et_togo(tmp_path))
+    assert sorted(manifeste) == ['MTN_PAYIN', 'TOGO_MONEY_PAYIN']
+    assert manifeste['MTN_PAYIN']['operateur'] == str(tmp_path / 'mtn.csv')
+
+
+def test_un_operateur_en_erreur_n_arrete_pas_les_autres(tmp_path):
+    manifeste = charger_manifeste(manifeste_mtn_et_togo(tmp_path))
+    resume = executer_tous(manifeste, str(tmp_path / 'resultats'), 'csv', processus=2)
+
+    mtn = resume[resume['Opérateur'] == 'MTN_PAYIN']
+    assert (mtn['Statut'] == 'OK').all()
+    assert mtn['Étape'].unique().tolist() == ['NBSI_OP', 'TCD']
+    assert dict(zip(mtn['Fichier'].map(lambda chemin: chemin.rsplit('/', 1)[-1]), mtn['Lignes'])) == {
+        'ecarts_test_mtn.csv': 1, 'transactions_internes.csv': 1, 'doublons_mtn.csv': 0, 'tcd_transactions_success_mtn.csv': 2}
+
+    togo = resume[resume['Opérateur'] == 'TOGO_MONEY_PAYIN']
+    assert togo['Étape'].tolist() == ['NBSI_OP', 'TCD']
+    assert togo['Statut'].str.startswith('Erreur : ').all()
+    assert togo['Fichier'].eq('').all()
+
+
+def test_operateur_inconnu(tmp_path):
+    with pytest.raises(ValueError, match='Opérateurs inconnus dans le manifeste : WAVE'):
+        executer_tous({'WAVE': {}}, str(tmp_path))
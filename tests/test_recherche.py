@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from recherche import DERNIER, ERREUR, CleEnDoubleError, IndexRecherche
+
+
+def reference():
+    return pd.DataFrame({
+        'ID': ['A', 'B', 'A', None, 'C'],
+        'SITE_ID': ['S1', 'S2', 'S3', 'S4', 'S5'],
+        'MONTANT': [10, 20, 30, 40, 50],
+    })
+
+
+def test_premier_comme_recherchev():
+    index = IndexRecherche(reference(), 'ID')
+    # Clé vide écartée, doublon réduit à sa première ligne
+    assert len(index) == 3
+    extrait = index.extraire(pd.Series(['A', 'C', 'Z'], index=[7, 8, 9]), ['SITE_ID'])
+    assert extrait.index.tolist() == [7, 8, 9]
+    assert extrait['SITE_ID'].tolist()[:2] == ['S1', 'S5']
+    assert pd.isna(extrait['SITE_ID'].iloc[2])
+
+
+def test_dernier():
+    index = IndexRecherche(reference(), 'ID', doublons=DERNIER)
+    assert index.extraire(pd.Series(['A']), {'SITE_ID': 'SITE'})['SITE'].tolist() == ['S3']
+
+
+def test_erreur_sur_cle_en_double():
+    with pytest.raises(CleEnDoubleError, match="2 lignes ont une clé 'ID' en double"):
+        IndexRecherche(reference(), 'ID', doublons=ERREUR)
+    # Sans doublon, le mode erreur se comporte comme les autres
+    assert len(IndexRecherche(reference().iloc[[0, 1, 4]], 'ID', doublons=ERREUR)) == 3
+    with pytest.raises(ValueError, match='Mode de doublons inconnu'):
+        IndexRecherche(reference(), 'ID', doublons='aucun')
+
+
+def test_remplir_et_joindre():
+    df = pd.DataFrame({'Référence': ['B', 'Z', 'A'], 'MONTANT': [1, 2, 3]})
+    index = IndexRecherche(reference(), 'ID')
+
+    rempli = index.remplir(df.copy(), 'Référence', {'SITE_ID': 'SITE'})
+    assert rempli['SITE'].tolist() == ['S2', '', 'S1']
+
+    joint = index.joindre(df, 'Référence', ['SITE_ID', 'MONTANT'])
+    assert len(joint) == len(df)
+    assert joint.columns.tolist() == ['Référence', 'MONTANT_x', 'SITE_ID', 'MONTANT_y']
+    assert joint['MONTANT_x'].tolist() == [1, 2, 3]
+    assert joint['MONTANT_y'].tolist()[0] == 20 and pd.isna(joint['MONTANT_y'].iloc[1])
+
+
+def test_reference_vide():
+    index = IndexRecherche(reference().iloc[[3]], 'ID')
+    assert len(index) == 0
+    assert index.remplir(pd.DataFrame({'Référence': ['A']}), 'Référence', ['SITE_ID'])['SITE_ID'].tolist() == ['']
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from instrumentation import mesurer
+from taches import ANNULEE, ECHOUEE, TERMINEE, GestionnaireTaches
+
+
+def attendre(tache):
+    # Les travailleurs sont des threads : la tâche est terminée quand son futur l'est
+    for _ in range(500):
+        if tache.terminee():
+            return tache
+        threading.Event().wait(0.01)
+    raise AssertionError(f"tâche {tache.libelle} toujours {tache.etat}")
+
+
+def etape_en_deux_phases(premiere_commencee, reprendre):
+    with mesurer('première phase'):
+        premiere_commencee.set()
+        reprendre.wait(5)
+    with mesurer('seconde phase'):
+        return 'résultat'
+
+
+def test_tache_terminee_retourne_son_resultat_et_sert_d_estimation():
+    gestionnaire = GestionnaireTaches(travailleurs=1)
+    reprendre = threading.Event()
+    reprendre.set()
+    tache = attendre(gestionnaire.soumettre('étape', etape_en_deux_phases, (threading.Event(), reprendre)))
+    assert tache.etat == TERMINEE
+    assert tache.resultat == 'résultat'
+    assert tache.progression() == 1.0
+    assert tache.args == ()
+    # La prochaine exécution de la même étape connaît son nombre de phases
+    assert gestionnaire.soumettre('étape', etape_en_deux_phases, (threading.Event(), reprendre)).phases_prevues == 2
+
+
+def test_annulation_prend_effet_a_la_phase_suivante():
+    gestionnaire = GestionnaireTaches(travailleurs=1)
+    premiere_commencee, reprendre = threading.Event(), threading.Event()
+    tache = gestionnaire.soumettre('étape', etape_en_deux_phases, (premiere_commencee, reprendre))
+    assert premiere_commencee.wait(5)
+    tache.annuler()
+    reprendre.set()
+    attendre(tache)
+    assert tache.etat == ANNULEE
+    assert tache.phase == 'première phase'
+    assert tache.resultat is None
+
+
+def test_tache_annulee_avant_son_tour_ne_s_execute_pas():
+    gestionnaire = GestionnaireTaches(travailleurs=1)
+    premiere_commencee, reprendre = threading.Event(), threading.Event()
+    occupante = gestionnaire.soumettre('occupante', etape_en_deux_phases, (premiere_commencee, reprendre))
+    assert premiere_commencee.wait(5)
+    executee = threading.Event()
+    en_attente = gestionnaire.soumettre('en attente', executee.set)
+    assert gestionnaire.position(en_attente) == 0
+    gestionnaire.oublier(en_attente.identifiant)
+    reprendre.set()
+    attendre(occupante)
+    attendre(en_attente)
+    assert en_attente.etat == ANNULEE
+    assert not executee.is_set()
+    assert gestionnaire.tache(en_attente.identifiant) is None
+
+
+def test_tache_en_echec_garde_son_exception():
+    def echoue():
+        raise ValueError("colonne absente")
+    tache = attendre(GestionnaireTaches(travailleurs=1).soumettre('étape', echoue))
+    assert tache.etat == ECHOUEE
+    with pytest.raises(ValueError, match="colonne absente"):
+        raise tache.exception
@@ -0,0 +1,60 @@
+import pandas as pd
+
+from types_colonnes import CATEGORIE, IDENTIFIANT, MONTANT, TELEPHONE, economie, harmoniser_cles, optimiser_types
+
+
+def releve_mtn(nombre=10):
+    return pd.DataFrame({
+        'TransactionId': pd.Series(['1,234,567', '89'] * (nombre // 2), dtype=object),
+        'MSISDN': pd.Series(['2250701', '2250702'] * (nombre // 2), dtype=object),
+        'TELEPHONE': pd.Series(['0701', '0702'] * (nombre // 2), dtype=object),
+        'ResponseMessage': pd.Series(['Successfully Processed Transaction', 'Failed'] * (nombre // 2), dtype=object),
+        'Montant': [1000.0, 2500.0] * (nombre // 2),
+        'Autre': pd.Series(['a', 'b'] * (nombre // 2), dtype=object),
+    })
+
+
+def test_conversions_du_schema_mtn():
+    df = releve_mtn()
+    compact, rapport = optimiser_types(df, 'MTN_PAYIN')
+    assert rapport['colonnes'] == {'ResponseMessage': CATEGORIE, 'Montant': MONTANT, 'TransactionId': IDENTIFIANT, 'MSISDN': TELEPHONE}
+    assert compact['TransactionId'].tolist()[:2] == [1234567, 89]
+    assert compact['MSISDN'].dtype == 'int64'
+    assert compact['Montant'].tolist()[:2] == [1000, 2500] and compact['Montant'].dtype == 'int64'
+    assert isinstance(compact['ResponseMessage'].dtype, pd.CategoricalDtype)
+    # Un numéro commençant par 0 perdrait son zéro : il reste du texte ; les colonnes hors schéma aussi
+    assert compact['TELEPHONE'].tolist()[:2] == ['0701', '0702']
+    assert compact['Autre'].dtype == df['Autre'].dtype
+    # L'original n'est pas modifié
+    assert df['TransactionId'].iloc[0] == '1,234,567'
+    assert rapport['octets_apres'] < rapport['octets_avant']
+    assert economie(rapport).startswith('types compacts : 4 colonne(s)')
+
+
+def test_conversions_refusees_si_une_valeur_changerait():
+    df = pd.DataFrame({
+        'TransactionId': pd.Series(['12', 'ABC'], dtype=object),
+        'Montant': [1000.5, 2000.0],
+        'Amount': [1000.0, None],
+        # Trop de valeurs distinctes pour une catégorie
+        'ResponseMessage': pd.Series(['a', 'b'], dtype=object),
+    })
+    compact, rapport = optimiser_types(df, 'MTN_PAYIN')
+    assert rapport['colonnes'] == {}
+    assert economie(rapport) == 'types inchangés'
+    pd.testing.assert_frame_equal(compact, df)
+
+
+def test_operateur_sans_schema_propre():
+    compact, rapport = optimiser_types(releve_mtn(), 'TOGO_MONEY_PAYIN')
+    assert sorted(rapport['colonnes']) == ['Montant', 'ResponseMessage']
+    assert compact['TransactionId'].dtype == object
+
+
+def test_harmoniser_cles():
+    entiers = pd.Series([701, 702])
+    textes = pd.Series(['701', '0703'])
+    gauche, droite = harmoniser_cles(entiers, textes)
+    assert gauche.tolist() == ['701', '702'] and droite is textes
+    gauche, droite = harmoniser_cles(entiers, pd.Series([703]))
+    assert gauche is entiers
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('streamlit')
+
+from visionneuse import extraire_page  # noqa: E402
+
+
+def resultat():
+    return pd.DataFrame({
+        'Référence': [f'R{numero:03d}' for numero in range(1, 121)],
+        'Opérateur': ['Orange_CI', 'MTN'] * 60,
+        'Montant': [numero * 10 for numero in range(1, 121)],
+    })
+
+
+def test_pagination():
+    page, lignes = extraire_page(resultat(), numero=2, taille_page=50)
+    assert lignes == 120
+    assert page['Référence'].tolist()[0] == 'R051'
+    assert len(page) == 50
+    # Numéro hors bornes : dernière (ou première) page
+    derniere, _ = extraire_page(resultat(), numero=10, taille_page=50)
+    assert derniere['Référence'].tolist() == [f'R{numero:03d}' for numero in range(101, 121)]
+    assert extraire_page(resultat(), numero=0, taille_page=50)[0]['Référence'].iloc[0] == 'R001'
+
+
+def test_recherche_et_filtre_sans_casse():
+    page, lignes = extraire_page(resultat(), recherche='r11', colonne_filtre='Opérateur', valeur_filtre='orange')
+    assert lignes == 5
+    assert page['Référence'].tolist() == ['R111', 'R113', 'R115', 'R117', 'R119']
+    # La recherche porte sur toutes les colonnes, valeurs écrites en texte
+    assert extraire_page(resultat(), recherche='1200')[1] == 1
+    vide, lignes = extraire_page(resultat(), recherche='introuvable')
+    assert lignes == 0 and vide.empty
+
+
+def test_tri_stable_vides_a_la_fin():
+    df = pd.DataFrame({'Montant': [300, None, 100, 300, 200], 'Ordre': [1, 2, 3, 4, 5]})
+    page, _ = extraire_page(df, tri='Montant', croissant=False)
+    assert page['Ordre'].tolist() == [1, 4, 5, 3, 2]
+    page, _ = extraire_page(df, tri='Montant')
+    assert page['Ordre'].tolist() == [3, 5, 1, 4, 2]
+
+
+def test_tri_colonne_mixte_sur_le_texte():
+    df = pd.DataFrame({'Valeur': pd.Series([10, 'b', 2, 'a'], dtype=object)})
+    page, _ = extraire_page(df, tri='Valeur')
+    assert page['Valeur'].tolist() == [10, 2, 'a', 'b']
@@ -0,0 +1,164 @@
+"""
+Types compacts des colonnes des relevés chargés.
+
+La lecture Excel/CSV produit des colonnes objet : une chaîne Python par cellule, même pour
+une colonne d'état qui ne prend que deux ou trois valeurs, ou pour un identifiant numérique.
+Après l'analyse, chaque colonne connue reçoit un type plus compact, d'après un schéma
+(nom de colonne -> genre) :
+  - 'categorie' : colonne à peu de valeurs distinctes (état, type, opérateur...), stockée
+    en codes entiers ; les filtres `==` / `isin` comparent alors des codes ;
+  - 'identifiant' : identifiant numérique, éventuellement écrit avec des séparateurs de
+    milliers ('1,234,567'), converti en int64 ;
+  - 'telephone' : numéro de téléphone en int64, seulement si la conversion est sans perte
+    (un numéro commençant par 0 reste du texte) ;
+  - 'montant' : montant en virgule fixe sans décimale (les francs CFA n'ont pas de
+    sous-unité), int64 quand toutes les valeurs sont entières.
+
+Une conversion n'est appliquée que si elle ne change aucune valeur : une colonne qui ne
+s'y prête pas garde son type d'origine.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORIE = 'categorie'
+IDENTIFIANT = 'identifiant'
+TELEPHONE = 'telephone'
+MONTANT = 'montant'
+
+# Colonnes communes à tous les relevés
+SCHEMA_COMMUN = {
+    'ResponseMessage': CATEGORIE,
+    'ETAT TRANSACTION': CATEGORIE,
+    'Traitant': CATEGORIE,
+    'Operator': CATEGORIE,
+    'Opérateur': CATEGORIE,
+    'Type': CATEGORIE,
+    'State': CATEGORIE,
+    'Montant': MONTANT,
+    'MONTANT': MONTANT,
+    'Amount': MONTANT,
+    'Crédit': MONTANT,
+}
+
+# Colonnes propres à un opérateur
+SCHEMAS_OPERATEUR = {
+    'MTN_PAYIN': {'TransactionId': IDENTIFIANT, 'MSISDN': TELEPHONE, 'TELEPHONE': TELEPHONE},
+    'ORANGE_PAYIN': {'Receiver': TELEPHONE},
+}
+
+# Une colonne n'est catégorisée que si ses valeurs distinctes sont rares par rapport aux lignes
+PROPORTION_MAX_CATEGORIES = 0.5
+
+# Plus grand entier représentable sans perte en int64 : 18 chiffres
+CHIFFRES_MAX = 18
+
+
+def schema(operateur=None):
+    return dict(SCHEMA_COMMUN, **SCHEMAS_OPERATEUR.get(operateur, {}))
+
+
+def est_texte(serie):
+    return serie.dtype == object or pd.api.types.is_string_dtype(serie)
+
+
+def en_categorie(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype) or not est_texte(serie):
+        return None
+    if pd.api.types.infer_dtype(serie, skipna=True) != 'string':
+        return None
+    if serie.nunique() > PROPORTION_MAX_CATEGORIES * len(serie):
+        return None
+    return serie.astype('category')
+
+
+def flottants_entiers(serie):
+    # Colonne flottante sans valeur vide et sans décimale -> int64
+    valeurs = serie.to_numpy()
+    if np.isnan(valeurs).any() or not (valeurs == np.round(valeurs)).all() or np.abs(valeurs).max(initial=0) >= 2 ** 63:
+        return None
+    return serie.astype('int64')
+
+
+def textes_entiers(serie, separateurs=''):
+    """
+    Convertit une colonne de textes numériques en int64. Sans `separateurs`, la conversion
+    doit être sans perte : le texte de l'entier doit redonner exactement la valeur d'origine.
+    """
+    if pd.api.types.infer_dtype(serie, skipna=False) != 'string':
+        return None
+    textes = serie.astype(str).str.strip()
+    for separateur in separateurs:
+        textes = textes.str.replace(separateur, '', regex=False)
+    if not textes.str.fullmatch(r'[1-9]\d{0,%d}|0' % (CHIFFRES_MAX - 1)).all():
+        return None
+    entiers = textes.astype('int64')
+    if not separateurs and not (entiers.astype(str).to_numpy() == serie.to_numpy()).all():
+        return None
+    return entiers
+
+
+def en_entiers(serie, separateurs=''):
+    if pd.api.types.is_integer_dtype(serie):
+        return None
+    if pd.api.types.is_float_dtype(serie):
+        return flottants_entiers(serie)
+    if est_texte(serie):
+        return textes_entiers(serie, separateurs)
+    return None
+
+
+CONVERSIONS = {
+    CATEGORIE: en_categorie,
+    IDENTIFIANT: lambda serie: en_entiers(serie, separateurs=', '),
+    TELEPHONE: en_entiers,
+    MONTANT: lambda serie: flottants_entiers(serie) if pd.api.types.is_float_dtype(serie) else None,
+}
+
+
+def memoire(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def optimiser_types(df, operateur=None):
+    """
+    Applique le schéma de l'opérateur aux colonnes présentes et retourne (df, rapport),
+    le rapport donnant la mémoire avant / après et le genre retenu pour chaque colonne convertie.
+    Le DataFrame d'origine n'est pas modifié.
+    """
+    octets_avant = memoire(df)
+    converties = {}
+    colonnes = {}
+    for colonne, genre in schema(operateur).items():
+        if colonne not in df.columns or isinstance(df[colonne], pd.DataFrame) or len(df) == 0:
+            continue
+        serie = CONVERSIONS[genre](df[colonne])
+        if serie is not None:
+            colonnes[colonne] = serie
+            converties[colonne] = genre
+    if colonnes:
+        df = df.assign(**colonnes)
+    rapport = {'octets_avant': octets_avant, 'octets_apres': memoire(df) if colonnes else octets_avant, 'colonnes': converties}
+    return df, rapport
+
+
+def economie(rapport):
+    # Résumé lisible de la mémoire économisée
+    gain = rapport['octets_avant'] - rapport['octets_apres']
+    if not rapport['colonnes']:
+        return 'types inchangés'
+    pourcentage = 100 * gain / rapport['octets_avant'] if rapport['octets_avant'] else 0
+    return f"types compacts : {len(rapport['colonnes'])} colonne(s), -{gain / 1024 ** 2:.1f} Mo ({pourcentage:.0f} %)"
+
+
+def harmoniser_cles(gauche, droite):
+    """
+    Deux colonnes clés de types différents (entier d'un côté, texte de l'autre, selon ce que
+    chaque relevé a permis de convertir) sont ramenées au texte pour rester comparables.
+    """
+    entier_gauche = pd.api.types.is_integer_dtype(gauche)
+    entier_droite = pd.api.types.is_integer_dtype(droite)
+    if entier_gauche and not entier_droite:
+        return gauche.astype(str), droite
+    if entier_droite and not entier_gauche:
+        return gauche, droite.astype(str)
+    return gauche, droite
@@ -0,0 +1,147 @@
+"""
+Affichage paginé des résultats, calculé côté serveur.
+
+`st.write(df)` sérialise toutes les lignes du résultat (en Arrow) et les envoie au
+navigateur à chaque relance : sur une fusion de plusieurs centaines de milliers de lignes,
+la sérialisation coûte plus que le rapprochement et l'onglet se fige. La visionneuse
+n'envoie qu'un résumé (lignes, colonnes, mémoire) et une page de lignes. La recherche,
+le filtre et le tri sont faits par pandas sur le serveur et ne portent que sur des
+positions : seule la page affichée est extraite du résultat, quelle que soit sa taille.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# En deçà de ce nombre de lignes, le résultat est affiché en entier, sans les commandes de la visionneuse
+SEUIL_LIGNES_PAGINATION = 100
+
+TAILLES_PAGE = [25, 50, 100, 500]
+
+# Compteur des visionneuses de la relance en cours (voir nouvelle_relance)
+CLE_COMPTEUR = '_visionneuses_affichees'
+
+
+def masque_contient(serie, texte):
+    """
+    Lignes dont la valeur, écrite en texte, contient `texte` (sans distinction de casse).
+    Seules les valeurs distinctes de la colonne sont converties et comparées.
+    """
+    codes, distinctes = pd.factorize(serie)
+    textes = pd.Series(pd.Index(distinctes).astype(str), dtype='string')
+    trouvees = np.append(textes.str.contains(texte, case=False, regex=False).to_numpy(dtype=bool, na_value=False), False)
+    return trouvees[codes]
+
+
+def positions_filtrees(df, recherche=None, colonne=None, valeur=None):
+    """
+    Positions des lignes contenant `recherche` dans l'une des colonnes et, si `colonne` est
+    donnée, `valeur` dans cette colonne.
+    """
+    masque = np.ones(len(df), dtype=bool)
+    if recherche:
+        trouvees = np.zeros(len(df), dtype=bool)
+        for position in range(df.shape[1]):
+            trouvees |= masque_contient(df.iloc[:, position], recherche)
+        masque &= trouvees
+    if colonne is not None and valeur:
+        masque &= masque_contient(df[colonne], valeur)
+    return np.flatnonzero(masque)
+
+
+def trier_positions(df, positions, colonne, croissant=True):
+    # Positions réordonnées selon la colonne (tri stable, valeurs vides à la fin)
+    valeurs = df[colonne].iloc[positions].reset_index(drop=True)
+    try:
+        ordre = valeurs.sort_values(ascending=croissant, kind='stable', na_position='last').index
+    except TypeError:
+        # Colonne mêlant nombres et textes : tri sur le texte
+        ordre = valeurs.astype(str).where(valeurs.notna()).sort_values(ascending=croissant, kind='stable', na_position='last').index
+    return positions[ordre.to_numpy()]
+
+
+def nombre_pages(lignes, taille_page):
+    return max(1, -(-lignes // taille_page))
+
+
+def extraire_page(df, numero=1, taille_page=TAILLES_PAGE[0], recherche=None, colonne_filtre=None, valeur_filtre=None, tri=None, croissant=True):
+    """
+    Retourne (page, lignes retenues) : les lignes de la page `numero` (à partir de 1) du résultat
+    filtré puis trié. Seules les lignes de la page sont copiées.
+    """
+    positions = positions_filtrees(df, recherche, colonne_filtre, valeur_filtre)
+    if tri is not None:
+        positions = trier_positions(df, positions, tri, croissant)
+    numero = min(max(1, numero), nombre_pages(len(positions), taille_page))
+    debut = (numero - 1) * taille_page
+    return df.iloc[positions[debut:debut + taille_page]], len(positions)
+
+
+def statistiques_colonnes(df):
+    # Résumé par colonne : type, valeurs renseignées, valeurs distinctes, minimum et maximum des colonnes numériques
+    lignes = []
+    for position in range(df.shape[1]):
+        serie = df.iloc[:, position]
+        numerique = pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie)
+        lignes.append({
+            'Colonne': str(df.columns[position]),
+            'Type': str(serie.dtype),
+            'Renseignées': int(serie.notna().sum()),
+            'Distinctes': int(serie.nunique()),
+            'Minimum': serie.min() if numerique else None,
+            'Maximum': serie.max() if numerique else None,
+        })
+    return pd.DataFrame(lignes)
+
+
+def nouvelle_relance():
+    # À appeler au début de chaque relance : les visionneuses sont numérotées dans l'ordre d'affichage
+    st.session_state[CLE_COMPTEUR] = 0
+
+
+def cle_visionneuse(df):
+    # Clé stable d'une relance à l'autre : rang d'affichage et colonnes du résultat
+    rang = st.session_state.get(CLE_COMPTEUR, 0)
+    st.session_state[CLE_COMPTEUR] = rang + 1
+    colonnes = hashlib.sha1(repr(list(map(str, df.columns))).encode()).hexdigest()[:8]
+    return f"visionneuse_{rang}_{colonnes}"
+
+
+def libelle_colonne(colonne):
+    return '—' if colonne is None else colonne
+
+
+def afficher_resultat(df, cle=None):
+    """
+    Affiche un résultat : en entier s'il est petit, sinon un résumé et une page de lignes,
+    avec recherche, filtre sur une colonne et tri calculés côté serveur.
+    """
+    if not isinstance(df, pd.DataFrame) or len(df) <= SEUIL_LIGNES_PAGINATION:
+        st.dataframe(df)
+        return
+    cle = cle or cle_visionneuse(df)
+    colonnes = [str(colonne) for colonne in df.columns]
+    if len(set(colonnes)) < len(colonnes):
+        # Noms de colonnes en double : le filtre et le tri par nom seraient ambigus
+        df = df.set_axis([f"{colonne} ({position})" for position, colonne in enumerate(colonnes)], axis=1)
+    else:
+        df = df.set_axis(colonnes, axis=1)
+
+    st.caption(f"{len(df):,} ligne(s) × {df.shape[1]} colonne(s), {df.memory_usage(index=True).sum() / 1024 ** 2:.1f} Mo".replace(',', ' '))
+    recherche_col, filtre_col, valeur_col = st.columns([2, 1, 1])
+    recherche = recherche_col.text_input("Rechercher", key=f"{cle}_recherche")
+    colonne_filtre = filtre_col.selectbox("Filtrer la colonne", [None] + list(df.columns), format_func=libelle_colonne, key=f"{cle}_colonne_filtre")
+    valeur_filtre = valeur_col.text_input("contenant", key=f"{cle}_valeur_filtre", disabled=colonne_filtre is None)
+    tri_col, sens_col, taille_col, page_col = st.columns(4)
+    tri = tri_col.selectbox("Trier par", [None] + list(df.columns), format_func=libelle_colonne, key=f"{cle}_tri")
+    croissant = sens_col.selectbox("Ordre", ["Croissant", "Décroissant"], key=f"{cle}_ordre") == "Croissant"
+    taille_page = taille_col.selectbox("Lignes par page", TAILLES_PAGE, key=f"{cle}_taille")
+    numero = page_col.number_input("Page", min_value=1, value=1, step=1, key=f"{cle}_page")
+
+    page, retenues = extraire_page(df, int(numero), taille_page, recherche, colonne_filtre, valeur_filtre, tri, croissant)
+    pages = nombre_pages(retenues, taille_page)
+    st.dataframe(page)
+    st.caption(f"Page {min(int(numero), pages)} / {pages} — {retenues:,} ligne(s) retenue(s)".replace(',', ' '))
+    if st.checkbox("Statistiques par colonne", key=f"{cle}_statistiques"):
+        st.dataframe(statistiques_colonnes(df))